@@ -22,29 +22,119 @@ Usage:
     contacts.py social remove <id> <service>
     contacts.py photo set <id> <url_or_path>
     contacts.py photo clear <id>
+    
+    contacts.py import <file.vcf|file.csv> [--batch-size 200] [--dry-run]
+    contacts.py export [--format vcf|ndjson|csv] [--where ...] [--photos] [-o <file>]
+    contacts.py batch < commands.jsonl
 
 Field names for --where queries: id, firstName, lastName, middleName, nickname,
 organization, jobTitle, department, photo, thumbnail, url, number, address
 Virtual fields: has_photo=true/false, no_photo=true (checks both photo and thumbnail)
 Phone numbers are auto-normalized to include country code (+1 for US by default).
 Reads use SQLite (fast). Writes use AppleScript (reliable, syncs with iCloud).
+Timing: --profile (or CONTACTS_PROFILE=1) adds a "_timing" object to the JSON;
+--profile-dump (or CONTACTS_PROFILE=dump) also writes a cProfile file to skills-data.
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import argparse
+import concurrent.futures
+import contextlib
+import functools
 import glob
 import json
 import os
+import queue
 import sqlite3
 import subprocess
 import sys
+import threading
+from array import array
 from dataclasses import dataclass, field, asdict
-from typing import Optional
+from typing import Iterable, Iterator, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+PROFILE_DIR = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'apple-contacts', 'profiles')
+
+# =============================================================================
+# Timing (--profile)
+# =============================================================================
+# Off by default and near-free when off: phase() hands back a shared no-op
+# context. When on, every SQLite query (per source), osascript call and the
+# JSON encoding is recorded, and output_json() appends the "_timing" report.
+
+class Timings:
+    """Per-phase wall-clock timings, safe to record from worker threads."""
+
+    def __init__(self):
+        self.enabled = False
+        self.import_ms = 0.0
+        self.dump_path = None
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._calls = []
+
+    def enable(self, import_ms: float = 0.0, dump_path: Optional[str] = None) -> None:
+        self.enabled = True
+        self.import_ms = import_ms
+        self.dump_path = dump_path
+
+    def phase(self, name: str, **detail):
+        """Context manager timing one call; yields a dict for extra detail (e.g. rows)."""
+        if not self.enabled:
+            return contextlib.nullcontext({})
+        return self._timed(name, detail)
+
+    @contextlib.contextmanager
+    def _timed(self, name: str, detail: dict):
+        start = time.perf_counter()
+        try:
+            yield detail
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, **detail)
+
+    def record(self, name: str, ms: float, **detail) -> None:
+        with self._lock:
+            phase = self._phases.setdefault(name, {"count": 0, "ms": 0.0})
+            phase["count"] += 1
+            phase["ms"] += ms
+            if detail:
+                self._calls.append({"phase": name, **detail, "ms": round(ms, 3)})
+
+    def report(self) -> dict:
+        with self._lock:
+            report = {
+                "totalMs": round((time.perf_counter() - _IMPORT_START) * 1000, 3),
+                "importMs": round(self.import_ms, 3),
+                "phases": {name: {"count": p["count"], "ms": round(p["ms"], 3)}
+                           for name, p in self._phases.items()},
+                "calls": list(self._calls),
+            }
+        if self.dump_path:
+            report["profileDump"] = self.dump_path
+        return report
+
+TIMINGS = Timings()
+
+def _source_name(db_path: str) -> str:
+    return os.path.basename(os.path.dirname(db_path))
+
+def _query_label(sql: str) -> str:
+    label = " ".join(sql.split())
+    return label if len(label) <= 80 else label[:77] + "..."
 
 # =============================================================================
 # Dataclasses (Schema)
 # =============================================================================
+# slots=True: no per-instance __dict__, so bulk imports/exports of 100k+
+# records stay small and attribute access stays fast. dataclass() only takes
+# slots on Python 3.10+; the stock macOS python3 (3.9) gets plain classes.
+DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Phone:
     number: str
     label: str = "mobile"
@@ -75,22 +165,22 @@ def normalize_phone(number: str, default_country: str = "+1") -> str:
         # Short number (local/extension), return as-is
         return number
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Email:
     address: str
     label: str = "home"
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Social:
     service: str
     username: str
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class URL:
     url: str
     label: str = "homepage"
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Contact:
     id: str = ""
     firstName: str = ""
@@ -166,6 +256,160 @@ def applescript_prop(field: str) -> str:
         return SCHEMA[field]["applescript"]
     return field
 
+# =============================================================================
+# Columnar Storage (bulk exports, dedupe)
+# =============================================================================
+# One Contact object per record is fine for CRUD, but bulk work over a whole
+# address book wants parallel arrays instead: one list per scalar field, and
+# each relation flattened into value/label arrays with per-contact offsets
+# (CSR layout). Labels repeat constantly ("mobile", "home", "_$!<Work>!$_"),
+# so they are interned once into a shared table and stored as small ints.
+
+SCALAR_FIELDS = ("id", "firstName", "lastName", "middleName", "nickname",
+                 "organization", "jobTitle", "department", "note")
+
+# relation -> (record type, value attribute, label attribute)
+RELATION_TYPES = {
+    "phones":  (Phone, "number", "label"),
+    "emails":  (Email, "address", "label"),
+    "urls":    (URL, "url", "label"),
+    "socials": (Social, "username", "service"),
+}
+
+class _RelationColumn:
+    """Flattened one-to-many relation: values[start[i]:start[i+1]] belong to row i."""
+    __slots__ = ("start", "values", "labels")
+
+    def __init__(self):
+        self.start = array("I", [0])
+        self.values: list[str] = []
+        self.labels = array("I")
+
+class ContactColumns:
+    """Columnar contact container: parallel arrays of IDs, names and interned labels.
+
+    Rows are appended in order; row i is rebuilt on demand with contact(i).
+    """
+    __slots__ = ("columns", "relations", "labels", "_label_index")
+
+    def __init__(self):
+        self.columns: dict[str, list[str]] = {name: [] for name in SCALAR_FIELDS}
+        self.relations = {name: _RelationColumn() for name in RELATION_TYPES}
+        self.labels: list[str] = []
+        self._label_index: dict[str, int] = {}
+
+    @classmethod
+    def from_contacts(cls, contacts: Iterable[Contact]) -> "ContactColumns":
+        cols = cls()
+        for contact in contacts:
+            cols.append(contact)
+        return cols
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def __iter__(self) -> Iterator[Contact]:
+        for i in range(len(self)):
+            yield self.contact(i)
+
+    def intern(self, label: str) -> int:
+        """Return the label-table index for a label, adding it if new."""
+        idx = self._label_index.get(label)
+        if idx is None:
+            idx = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return idx
+
+    def append_row(self, scalars: Iterable, relations: dict) -> int:
+        """Append one row from raw values (SQLite fast path, no Contact objects).
+
+        scalars: values in SCALAR_FIELDS order (None becomes "")
+        relations: {"phones": [(value, label), ...], ...}
+        """
+        for name, value in zip(SCALAR_FIELDS, scalars):
+            self.columns[name].append(value or "")
+        for name, column in self.relations.items():
+            for value, label in relations.get(name, ()):
+                column.values.append(value or "")
+                column.labels.append(self.intern(label or ""))
+            column.start.append(len(column.values))
+        return len(self) - 1
+
+    def append(self, contact: Contact) -> int:
+        """Append a Contact; returns its row index."""
+        relations = {}
+        for name, (_, value_attr, label_attr) in RELATION_TYPES.items():
+            relations[name] = [(getattr(item, value_attr), getattr(item, label_attr))
+                               for item in getattr(contact, name)]
+        return self.append_row((getattr(contact, f) for f in SCALAR_FIELDS), relations)
+
+    def related(self, name: str, row: int) -> list[tuple[str, str]]:
+        """(value, label) pairs of one relation for one row."""
+        column = self.relations[name]
+        lo, hi = column.start[row], column.start[row + 1]
+        labels = self.labels
+        return [(column.values[k], labels[column.labels[k]]) for k in range(lo, hi)]
+
+    def contact(self, row: int) -> Contact:
+        """Rebuild row as a Contact."""
+        contact = Contact(**{f: self.columns[f][row] for f in SCALAR_FIELDS})
+        for name, (record_type, value_attr, label_attr) in RELATION_TYPES.items():
+            getattr(contact, name).extend(
+                record_type(**{value_attr: value, label_attr: label})
+                for value, label in self.related(name, row)
+            )
+        return contact
+
+    def dedupe_keys(self, row: int) -> set[str]:
+        """Identity keys for a row (see contact_dedupe_keys)."""
+        return _dedupe_keys(
+            (v for v, _ in self.related("phones", row)),
+            (v for v, _ in self.related("emails", row)),
+        )
+
+    def duplicates(self) -> list[list[int]]:
+        """Group rows sharing a phone number or email address (union-find).
+
+        Returns groups of row indices with more than one member.
+        """
+        parent = list(range(len(self)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first_seen: dict[str, int] = {}
+        for row in range(len(self)):
+            for key in self.dedupe_keys(row):
+                other = first_seen.setdefault(key, row)
+                if other != row:
+                    parent[find(row)] = find(other)
+
+        groups: dict[int, list[int]] = {}
+        for row in range(len(self)):
+            groups.setdefault(find(row), []).append(row)
+        return [g for g in groups.values() if len(g) > 1]
+
+def _dedupe_keys(numbers: Iterable[str], addresses: Iterable[str]) -> set[str]:
+    keys = set()
+    for number in numbers:
+        digits = ''.join(c for c in number if c.isdigit())
+        if len(digits) >= 7:
+            # Last 10 digits: "+1 (512) 555-1234" and "5125551234" match
+            keys.add("phone:" + digits[-10:])
+    for address in addresses:
+        address = address.strip().lower()
+        if address:
+            keys.add("email:" + address)
+    return keys
+
+def contact_dedupe_keys(contact: Contact) -> set[str]:
+    """Identity keys used for dedupe: "phone:<last 10 digits>", "email:<lowercase>"."""
+    return _dedupe_keys((p.number for p in contact.phones),
+                        (e.address for e in contact.emails))
+
 # =============================================================================
 # Unified Social Services Registry
 # =============================================================================
@@ -397,23 +641,106 @@ def get_contact_databases() -> list[str]:
     pattern = os.path.expanduser(
         "~/Library/Application Support/AddressBook/Sources/*/AddressBook-v22.abcddb"
     )
-    return glob.glob(pattern)
+    return _glob_sources(pattern)
+
+@functools.lru_cache(maxsize=None)
+def _glob_sources(pattern: str) -> list[str]:
+    # Sources only change when an account is added; one glob per process
+    with TIMINGS.phase("discovery"):
+        return glob.glob(pattern)
+
+_connections = threading.local()
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """Shared connection to a source database (one per thread, reused across queries)."""
+    cache = getattr(_connections, "by_path", None)
+    if cache is None:
+        cache = _connections.by_path = {}
+    conn = cache.get(db_path)
+    if conn is None:
+        conn = cache[db_path] = sqlite3.connect(db_path)
+    return conn
 
 def query_contacts(sql: str, params: tuple = ()) -> list[dict]:
     """Query all contact databases and aggregate results."""
     results = []
     for db_path in get_contact_databases():
         try:
-            conn = sqlite3.connect(db_path)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute(sql, params)
-            for row in cursor:
-                results.append(dict(row))
-            conn.close()
+            with TIMINGS.phase("sqlite", source=_source_name(db_path), query=_query_label(sql)) as detail:
+                cursor = connect(db_path).execute(sql, params)
+                # Plain tuples + one column list per query (cheaper than sqlite3.Row)
+                columns = [d[0] for d in cursor.description]
+                before = len(results)
+                results.extend(dict(zip(columns, row)) for row in cursor)
+                detail["rows"] = len(results) - before
         except sqlite3.Error:
             continue
     return results
 
+def load_contact_columns() -> ContactColumns:
+    """Load every person from all sources into a ContactColumns.
+
+    Reads records and each relation table as plain tuples ordered by owner,
+    then merges them in one pass - no per-row dicts or Contact objects.
+    Notes are not in these tables (use `get` for the note).
+    """
+    scalar_sql = ", ".join(
+        f'r.{SCHEMA[f]["sql"]}' if f in SCHEMA else "NULL" for f in SCALAR_FIELDS
+    )
+    cols = ContactColumns()
+    for db_path in get_contact_databases():
+        try:
+            with TIMINGS.phase("sqlite", source=_source_name(db_path), query="load all persons") as detail:
+                rows_before = len(cols)
+                _load_source_columns(db_path, cols, scalar_sql)
+                detail["rows"] = len(cols) - rows_before
+        except sqlite3.Error:
+            continue
+    return cols
+
+def _load_source_columns(db_path: str, cols: ContactColumns, scalar_sql: str) -> None:
+    conn = sqlite3.connect(db_path)
+    try:
+        records = conn.execute(f"""
+            SELECT r.Z_PK, {scalar_sql}
+            FROM ZABCDRECORD r
+            WHERE r.{sql_column("id")} LIKE '%:ABPerson'
+            ORDER BY r.Z_PK
+        """)
+        relations = {}
+        for name, (_, value_attr, label_attr) in RELATION_TYPES.items():
+            config = SCHEMA_RELATIONS[name]
+            relations[name] = _peekable(conn.execute(f"""
+                SELECT ZOWNER, {config["fields"][value_attr]}, {config["fields"][label_attr]}
+                FROM {config["table"]}
+                WHERE ZOWNER IS NOT NULL
+                ORDER BY ZOWNER, Z_PK
+            """))
+        for pk, *scalars in records:
+            related = {}
+            for name, rows in relations.items():
+                items = []
+                while rows.head is not None and rows.head[0] <= pk:
+                    owner, value, label = rows.next()
+                    if owner == pk:
+                        items.append((value, label))
+                related[name] = items
+            cols.append_row(scalars, related)
+    finally:
+        conn.close()
+
+class _peekable:
+    """Cursor wrapper exposing the next row as .head (None when exhausted)."""
+    __slots__ = ("_it", "head")
+
+    def __init__(self, iterable):
+        self._it = iter(iterable)
+        self.head = next(self._it, None)
+
+    def next(self):
+        row, self.head = self.head, next(self._it, None)
+        return row
+
 def search_by_name(query: str) -> list[dict]:
     """Search contacts by name or organization."""
     select_fields = sql_select(["id", "firstName", "lastName", "organization", "jobTitle"])
@@ -488,20 +815,9 @@ def translate_where(where_clause: str) -> str:
     
     return result
 
-def search_where(where_clause: str, limit: int = 50) -> list[dict]:
-    """
-    Search contacts with custom WHERE clause using our field names.
-    
-    Examples:
-        search_where("photo IS NULL")
-        search_where("firstName LIKE 'J%' AND organization IS NOT NULL")
-        search_where("photo IS NULL AND url LIKE '%instagram%'")
-    """
-    select_fields = sql_select(["id", "firstName", "lastName", "organization", "jobTitle"])
-    translated_where = translate_where(where_clause)
+def where_joins(where_clause: str) -> str:
+    """LEFT JOINs for the relation tables a WHERE clause references (aliases p/e/u/s)."""
     where_lower = where_clause.lower()
-    
-    # Build JOINs based on which relation fields are referenced
     joins = []
     if "url" in where_lower:
         joins.append(f'LEFT JOIN {SCHEMA_RELATIONS["urls"]["table"]} u ON u.ZOWNER = r.Z_PK')
@@ -511,8 +827,20 @@ def search_where(where_clause: str, limit: int = 50) -> list[dict]:
         joins.append(f'LEFT JOIN {SCHEMA_RELATIONS["emails"]["table"]} e ON e.ZOWNER = r.Z_PK')
     if "service" in where_lower or "username" in where_lower:
         joins.append(f'LEFT JOIN {SCHEMA_RELATIONS["socials"]["table"]} s ON s.ZOWNER = r.Z_PK')
+    return "\n            ".join(joins)
+
+def search_where(where_clause: str, limit: int = 50) -> list[dict]:
+    """
+    Search contacts with custom WHERE clause using our field names.
     
-    join_clause = "\n            ".join(joins) if joins else ""
+    Examples:
+        search_where("photo IS NULL")
+        search_where("firstName LIKE 'J%' AND organization IS NOT NULL")
+        search_where("photo IS NULL AND url LIKE '%instagram%'")
+    """
+    select_fields = sql_select(["id", "firstName", "lastName", "organization", "jobTitle"])
+    translated_where = translate_where(where_clause)
+    join_clause = where_joins(where_clause)
     
     sql = f"""
         SELECT DISTINCT {select_fields}
@@ -538,19 +866,16 @@ def get_photo_info(contact_id: str) -> list[dict]:
     
     for db_path in get_contact_databases():
         try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    length(ZIMAGEDATA) as image_size,
-                    length(ZTHUMBNAILIMAGEDATA) as thumb_size
-                FROM ZABCDRECORD 
-                WHERE ZUNIQUEID = ?
-            """, (contact_id,))
-            
-            row = cursor.fetchone()
-            conn.close()
+            with TIMINGS.phase("sqlite", source=_source_name(db_path), query="photo sizes"):
+                cursor = connect(db_path).execute("""
+                    SELECT 
+                        length(ZIMAGEDATA) as image_size,
+                        length(ZTHUMBNAILIMAGEDATA) as thumb_size
+                    FROM ZABCDRECORD 
+                    WHERE ZUNIQUEID = ?
+                """, (contact_id,))
+                
+                row = cursor.fetchone()
             
             if not row or (row[0] is None and row[1] is None):
                 continue
@@ -721,15 +1046,110 @@ def get_contact_details(contact_id: str) -> Optional[dict]:
 # AppleScript Helpers
 # =============================================================================
 
+_applescript_worker = None  # set by run_batch()
+
 def run_applescript(script: str) -> tuple[bool, str]:
     """Run AppleScript and return (success, output)."""
-    result = subprocess.run(
-        ["osascript", "-e", script],
-        capture_output=True,
-        text=True
-    )
+    if _applescript_worker is not None:
+        return _applescript_worker.run(script)
+    return _osascript(script)
+
+def _osascript(script: str) -> tuple[bool, str]:
+    # Script goes in via stdin: batched scripts can exceed the argv size limit
+    with TIMINGS.phase("osascript", bytes=len(script)) as detail:
+        result = subprocess.run(
+            ["osascript", "-"],
+            input=script,
+            capture_output=True,
+            text=True
+        )
+        detail["ok"] = result.returncode == 0
     return result.returncode == 0, result.stdout.strip()
 
+class AppleScriptWorker:
+    """Single thread that owns every osascript call in batch mode.
+    
+    Scripts submitted at about the same time (from parallel commands) are
+    coalesced: each becomes a handler in one combined script, so a group of
+    N writes costs one osascript launch instead of N.
+    """
+    SEPARATOR = "\x1e"  # ASCII record separator
+
+    def __init__(self, max_scripts: int = 50, linger: float = 0.01):
+        self.max_scripts = max_scripts
+        self.linger = linger
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def run(self, script: str) -> tuple[bool, str]:
+        future = concurrent.futures.Future()
+        self._queue.put((script, future))
+        return future.result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            deadline = time.monotonic() + self.linger
+            while len(items) < self.max_scripts:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)  # finish this round, then stop
+                    break
+                items.append(nxt)
+            try:
+                results = self._run_many([script for script, _ in items])
+            except Exception as e:
+                results = [(False, str(e))] * len(items)
+            for (_, future), result in zip(items, results):
+                future.set_result(result)
+
+    def _run_many(self, scripts: list[str]) -> list[tuple[bool, str]]:
+        if len(scripts) == 1:
+            return [_osascript(scripts[0])]
+        handlers, calls = [], []
+        for i, script in enumerate(scripts, start=1):
+            handlers.append(f"on cmd{i}()\n{script}\nend cmd{i}")
+            calls.append(f'''
+                try
+                    set r to my cmd{i}()
+                    try
+                        set end of results to "ok:::" & (r as text)
+                    on error
+                        set end of results to "ok:::"
+                    end try
+                on error errMsg
+                    set end of results to "err:::" & errMsg
+                end try''')
+        combined = "\n".join(handlers) + f'''
+            set results to {{}}
+            {"".join(calls)}
+            set AppleScript's text item delimiters to (character id 30)
+            return results as text
+        '''
+        success, output = _osascript(combined)
+        if not success:
+            # Each call traps its own errors, so this is a compile failure and
+            # nothing ran yet: fall back to one call each
+            return [_osascript(script) for script in scripts]
+        parts = output.split(self.SEPARATOR)
+        if len(parts) != len(scripts):
+            # The scripts did run; running them again would repeat the writes
+            error = f"ran, but returned {len(parts)} results for {len(scripts)} scripts"
+            return [(False, error)] * len(scripts)
+        return [(part.startswith("ok:::"), part[5:].strip() if part.startswith("ok:::") else part[6:].strip())
+                for part in parts]
+
 def escape_applescript(s: str) -> str:
     """Escape string for AppleScript."""
     return s.replace("\\", "\\\\").replace('"', '\\"')
@@ -787,8 +1207,8 @@ def get_socials_applescript(first: str, last: str) -> list[dict]:
 # AppleScript Commands (WRITE)
 # =============================================================================
 
-def create_contact_applescript(contact: Contact) -> tuple[bool, str]:
-    """Create a new contact via AppleScript."""
+def person_commands(contact: Contact, var: str = "newPerson") -> str:
+    """AppleScript lines that make a person (with phones, emails, URLs) as `var`."""
     props = []
     if contact.firstName:
         props.append(f'first name:"{escape_applescript(contact.firstName)}"')
@@ -817,7 +1237,7 @@ def create_contact_applescript(contact: Contact) -> tuple[bool, str]:
         # Normalize phone number to include country code
         number = normalize_phone(number)
         phone_cmds += f'''
-            make new phone at end of phones of newPerson with properties {{label:"{label}", value:"{escape_applescript(number)}"}}
+            make new phone at end of phones of {var} with properties {{label:"{escape_applescript(label)}", value:"{escape_applescript(number)}"}}
         '''
     
     # Build email additions
@@ -826,7 +1246,7 @@ def create_contact_applescript(contact: Contact) -> tuple[bool, str]:
         label = email.label if isinstance(email, Email) else email.get("label", "home")
         address = email.address if isinstance(email, Email) else email.get("address", "")
         email_cmds += f'''
-            make new email at end of emails of newPerson with properties {{label:"{label}", value:"{escape_applescript(address)}"}}
+            make new email at end of emails of {var} with properties {{label:"{escape_applescript(label)}", value:"{escape_applescript(address)}"}}
         '''
     
     # Build URL additions
@@ -843,21 +1263,63 @@ def create_contact_applescript(contact: Contact) -> tuple[bool, str]:
                 if service_info:
                     label = service_info["name"]
         url_cmds += f'''
-            make new url at end of urls of newPerson with properties {{label:"{escape_applescript(label)}", value:"{escape_applescript(url)}"}}
+            make new url at end of urls of {var} with properties {{label:"{escape_applescript(label)}", value:"{escape_applescript(url)}"}}
         '''
     
-    script = f'''
-        tell application "Contacts"
-            set newPerson to make new person with properties {{{props_str}}}
+    return f'''
+            set {var} to make new person with properties {{{props_str}}}
             {phone_cmds}
             {email_cmds}
             {url_cmds}
+    '''
+
+def create_contact_applescript(contact: Contact) -> tuple[bool, str]:
+    """Create a new contact via AppleScript."""
+    script = f'''
+        tell application "Contacts"
+            {person_commands(contact)}
             save
             return id of newPerson
         end tell
     '''
     return run_applescript(script)
 
+def create_contacts_applescript(contacts: list[Contact]) -> tuple[bool, list[str]]:
+    """Create many contacts in a single osascript call with one save.
+    
+    Returns (success, results) where results has one entry per contact, in
+    order: the new contact ID, or "error:::<message>" if that contact failed.
+    Results are joined with AppleScriptWorker.SEPARATOR, since an error
+    message can span lines.
+    """
+    blocks = []
+    for contact in contacts:
+        blocks.append(f'''
+            try
+                {person_commands(contact)}
+                set end of newIds to (id of newPerson) as text
+            on error errMsg
+                set end of newIds to "error:::" & errMsg
+            end try
+        ''')
+    
+    script = f'''
+        tell application "Contacts"
+            set newIds to {{}}
+            {"".join(blocks)}
+            save
+        end tell
+        set AppleScript's text item delimiters to (character id 30)
+        return newIds as text
+    '''
+    success, output = run_applescript(script)
+    if not success:
+        return False, [f"error:::{output or 'osascript failed'}"] * len(contacts)
+    results = output.split(AppleScriptWorker.SEPARATOR) if output else []
+    if len(results) != len(contacts):
+        return False, [f"error:::unexpected output ({len(results)} results for {len(contacts)} contacts)"] * len(contacts)
+    return True, results
+
 def update_contact_applescript(contact_id: str, updates: dict) -> tuple[bool, str]:
     """Update contact fields via AppleScript."""
     # First get current name for lookup
@@ -1254,19 +1716,738 @@ def fix_contact(contact_id: str) -> tuple[bool, str, list[str]]:
     return True, "Contact fixed", migrated
 
 
+# =============================================================================
+# Import (vCard / CSV)
+# =============================================================================
+# Parsers are generators over lines, so a 10k-row export is never held in
+# memory. Contacts are deduped against the SQLite index and created in
+# batches: one osascript call (and one save) per batch instead of per contact.
+
+IMPORT_BATCH_SIZE = 200
+
+VCARD_LABELS = {"cell": "mobile", "mobile": "mobile", "iphone": "iPhone", "home": "home",
+                "work": "work", "main": "main", "fax": "work fax", "pager": "pager",
+                "internet": None, "pref": None, "voice": None}
+
+def _vcard_unescape(value: str) -> str:
+    out, i = [], 0
+    while i < len(value):
+        c = value[i]
+        if c == "\\" and i + 1 < len(value):
+            nxt = value[i + 1]
+            out.append("\n" if nxt in "nN" else nxt)
+            i += 2
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+def _vcard_split(value: str, sep: str = ";") -> list[str]:
+    """Split on unescaped separators (N, ORG), then unescape each part."""
+    parts, current, i = [], [], 0
+    while i < len(value):
+        c = value[i]
+        if c == "\\" and i + 1 < len(value):
+            current.append(value[i:i + 2])
+            i += 2
+            continue
+        if c == sep:
+            parts.append(_vcard_unescape("".join(current)))
+            current = []
+        else:
+            current.append(c)
+        i += 1
+    parts.append(_vcard_unescape("".join(current)))
+    return parts
+
+def _vcard_label(params: list[str], default: str) -> str:
+    """Map TYPE params (TYPE=CELL, TYPE=WORK,VOICE, bare CELL) to a Contacts label."""
+    for param in params:
+        key, _, value = param.partition("=")
+        types = value.split(",") if value else [key]
+        if value and key.upper() != "TYPE":
+            continue
+        for t in types:
+            t = t.strip().strip('"').lower()
+            if t in VCARD_LABELS:
+                if VCARD_LABELS[t]:
+                    return VCARD_LABELS[t]
+            elif t and not t.startswith("x-"):
+                return t
+    return default
+
+def _apple_label(label: str) -> str:
+    """Strip Apple's internal label wrapper: _$!<HomePage>!$_ -> HomePage."""
+    if label.startswith("_$!<") and label.endswith(">!$_"):
+        return label[4:-4]
+    return label
+
+def _unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join RFC 6350 folded lines (continuations start with space or tab)."""
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+def parse_vcards(lines: Iterable[str]) -> Iterator[Contact]:
+    """Stream Contacts out of vCard 2.1/3.0/4.0 text."""
+    import quopri
+    contact = None
+    group_labels: dict[str, str] = {}
+    grouped: list[tuple[str, object, str]] = []  # (group, record, label attribute)
+
+    for line in _unfold(lines):
+        if ":" not in line:
+            continue
+        head, value = line.split(":", 1)
+        params = head.split(";")
+        group, _, name = params[0].rpartition(".")
+        name = name.upper()
+        params = params[1:]
+
+        if name == "BEGIN" and value.strip().upper() == "VCARD":
+            contact, group_labels, grouped = Contact(), {}, []
+            continue
+        if contact is None:
+            continue
+        if name == "END":
+            for item_group, record, attr in grouped:
+                if item_group in group_labels:
+                    setattr(record, attr, group_labels[item_group])
+            yield contact
+            contact = None
+            continue
+
+        if any(p.upper() in ("ENCODING=QUOTED-PRINTABLE", "QUOTED-PRINTABLE") for p in params):
+            value = quopri.decodestring(value.encode()).decode("utf-8", errors="replace")
+
+        if name == "N":
+            parts = _vcard_split(value) + [""] * 3
+            contact.lastName, contact.firstName, contact.middleName = parts[0], parts[1], parts[2]
+        elif name == "FN" and not (contact.firstName or contact.lastName):
+            fn = _vcard_unescape(value).strip()
+            first, _, last = fn.partition(" ")
+            contact.firstName, contact.lastName = first, last
+        elif name == "NICKNAME":
+            contact.nickname = _vcard_unescape(value)
+        elif name == "ORG":
+            parts = _vcard_split(value) + [""]
+            contact.organization, contact.department = parts[0], parts[1]
+        elif name == "TITLE":
+            contact.jobTitle = _vcard_unescape(value)
+        elif name == "NOTE":
+            contact.note = _vcard_unescape(value)
+        elif name == "TEL" and value.strip():
+            number = value.strip()
+            if number.lower().startswith("tel:"):
+                number = number[4:]
+            record = Phone(number=number, label=_vcard_label(params, "mobile"))
+            contact.phones.append(record)
+            grouped.append((group, record, "label"))
+        elif name == "EMAIL" and value.strip():
+            record = Email(address=value.strip(), label=_vcard_label(params, "home"))
+            contact.emails.append(record)
+            grouped.append((group, record, "label"))
+        elif name == "URL" and value.strip():
+            record = URL(url=_vcard_unescape(value.strip()), label=_vcard_label(params, "homepage"))
+            contact.urls.append(record)
+            grouped.append((group, record, "label"))
+        elif name == "X-ABLABEL" and group:
+            group_labels[group] = _apple_label(_vcard_unescape(value))
+
+# CSV header aliases (lowercased). Google/Outlook/CRM exports all differ.
+CSV_COLUMNS = {
+    "firstName":    ("first name", "first", "firstname", "given name"),
+    "lastName":     ("last name", "last", "lastname", "family name", "surname"),
+    "middleName":   ("middle name", "middle", "additional name"),
+    "nickname":     ("nickname",),
+    "organization": ("organization", "organization 1 - name", "company", "org", "account name"),
+    "jobTitle":     ("job title", "title", "organization 1 - title"),
+    "department":   ("department", "organization 1 - department"),
+    "note":         ("note", "notes"),
+}
+
+def _csv_label(header: str, default: str) -> str:
+    h = header.lower()
+    for word, label in (("mobile", "mobile"), ("cell", "mobile"), ("work", "work"),
+                        ("business", "work"), ("home", "home"), ("main", "main")):
+        if word in h:
+            return label
+    return default
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Contact]:
+    """Stream Contacts out of a CSV export (Google, Outlook, generic CRM columns).
+
+    Multi-value cells use Google's " ::: " separator. "X - Value" columns take
+    their label from the matching "X - Type"/"X - Label" column when present.
+    """
+    import csv
+    reader = csv.reader(lines)
+    headers = next(reader, None)
+    if not headers:
+        return
+    lowered = [h.strip().lower() for h in headers]
+
+    scalar_idx = {}
+    for field_name, aliases in CSV_COLUMNS.items():
+        for i, h in enumerate(lowered):
+            if h in aliases:
+                scalar_idx[field_name] = i
+                break
+
+    def label_column(i: int) -> Optional[int]:
+        h = lowered[i]
+        if not h.endswith(" - value"):
+            return None
+        stem = h[:-len(" - value")]
+        for suffix in (" - type", " - label"):
+            if stem + suffix in lowered:
+                return lowered.index(stem + suffix)
+        return None
+
+    multi = {"phones": [], "emails": [], "urls": []}
+    for i, h in enumerate(lowered):
+        if h.endswith(" - type") or h.endswith(" - label") or h.endswith(" type"):
+            continue
+        if "e-mail" in h or "email" in h:
+            multi["emails"].append((i, label_column(i), _csv_label(h, "home")))
+        elif "phone" in h or h in ("mobile", "cell", "fax"):
+            multi["phones"].append((i, label_column(i), _csv_label(h, "mobile")))
+        elif "website" in h or h in ("url", "web page", "web site"):
+            multi["urls"].append((i, label_column(i), "homepage"))
+
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        
+        def cell(i: Optional[int]) -> str:
+            return row[i].strip() if i is not None and i < len(row) else ""
+        
+        contact = Contact(**{f: cell(i) for f, i in scalar_idx.items()})
+        for relation, columns in multi.items():
+            record_type, value_attr, label_attr = RELATION_TYPES[relation]
+            for value_i, label_i, default_label in columns:
+                # Google marks the primary value as "* Mobile"
+                label = _apple_label(cell(label_i).lstrip("* ")) or default_label
+                if relation != "urls":
+                    label = label.lower()
+                for value in cell(value_i).split(" ::: "):
+                    value = value.strip()
+                    if value and (relation != "emails" or "@" in value):
+                        getattr(contact, relation).append(record_type(**{value_attr: value, label_attr: label}))
+        yield contact
+
+def normalize_phones(contacts: list[Contact]) -> None:
+    """Normalize every phone of a batch in place (memoized normalize_phone)."""
+    seen: dict[str, str] = {}
+    for contact in contacts:
+        for phone in contact.phones:
+            normalized = seen.get(phone.number)
+            if normalized is None:
+                normalized = seen[phone.number] = normalize_phone(phone.number)
+            phone.number = normalized
+
+def _name_key(first: str, last: str, org: str) -> str:
+    return "name:" + " ".join(f"{first} {last}".split()).lower() + "|" + org.strip().lower()
+
+def import_dedupe_keys(contact: Contact) -> tuple[set[str], str]:
+    """(match keys, name key) for an incoming contact.
+    
+    Phone/email keys decide when present; contacts with neither are matched
+    by name+org instead. The name key is always indexed so later name-only
+    rows can match.
+    """
+    name_key = _name_key(contact.firstName, contact.lastName, contact.organization)
+    return contact_dedupe_keys(contact) or {name_key}, name_key
+
+def existing_dedupe_keys() -> set[str]:
+    """Dedupe keys (phones, emails, name+org) for every contact in the SQLite index."""
+    cols = load_contact_columns()
+    keys = set()
+    first, last, org = (cols.columns[f] for f in ("firstName", "lastName", "organization"))
+    for row in range(len(cols)):
+        keys |= cols.dedupe_keys(row)
+        keys.add(_name_key(first[row], last[row], org[row]))
+    return keys
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_contacts(contacts: Iterable[Contact], batch_size: int = IMPORT_BATCH_SIZE,
+                    dedupe: bool = True, dry_run: bool = False) -> dict:
+    """Dedupe and create contacts in batched AppleScript calls.
+
+    Returns a summary: parsed, created, skipped (duplicates), invalid, failed,
+    plus new IDs and per-contact errors.
+    """
+    index = existing_dedupe_keys() if dedupe else set()
+    summary = {"success": True, "parsed": 0, "created": 0, "skipped": 0, "invalid": 0, "failed": 0,
+               "ids": [], "errors": []}
+
+    def fresh(stream):
+        for contact in stream:
+            summary["parsed"] += 1
+            if not (contact.firstName or contact.lastName or contact.organization
+                    or contact.phones or contact.emails):
+                summary["invalid"] += 1
+                continue
+            if dedupe:
+                keys, name_key = import_dedupe_keys(contact)
+                if keys & index:
+                    summary["skipped"] += 1
+                    continue
+                index.update(keys)  # also dedupes within the file
+                index.add(name_key)
+            yield contact
+
+    for batch in _batched(fresh(contacts), batch_size):
+        normalize_phones(batch)
+        if dry_run:
+            summary["created"] += len(batch)
+            continue
+        _, results = create_contacts_applescript(batch)
+        for contact, result in zip(batch, results):
+            if result.startswith("error:::"):
+                summary["failed"] += 1
+                name = f"{contact.firstName} {contact.lastName}".strip() or contact.organization
+                summary["errors"].append({"name": name, "error": result[8:]})
+            else:
+                summary["created"] += 1
+                summary["ids"].append(result)
+
+    summary["success"] = summary["failed"] == 0
+    if dry_run:
+        summary["dryRun"] = True
+    return summary
+
+
+# =============================================================================
+# Export (vCard / NDJSON / CSV)
+# =============================================================================
+# Straight from SQLite: one query per source, with each relation folded into
+# a JSON array by a correlated subquery, so every contact arrives as a single
+# row. Records are written as they are read; photos are copied out of the
+# BLOB columns in chunks, never loaded whole.
+
+EXPORT_FORMATS = ("vcf", "ndjson", "csv")
+PHOTO_CHUNK = 54 * 1024     # multiple of 54 bytes = whole 72-char base64 lines
+
+# Contacts label -> vCard TYPE
+VCARD_TYPES = {
+    "phones": {"mobile": "CELL", "iphone": "IPHONE", "home": "HOME", "work": "WORK", "main": "MAIN",
+               "home fax": "HOME,FAX", "work fax": "WORK,FAX", "pager": "PAGER", "other": "OTHER"},
+    "emails": {"home": "HOME", "work": "WORK", "other": "OTHER"},
+    "urls":   {"homepage": "HOME", "home": "HOME", "work": "WORK"},
+}
+
+def _export_sql(where_clause: Optional[str], has_notes: bool) -> str:
+    relation_cols = []
+    for name, (_, value_attr, label_attr) in RELATION_TYPES.items():
+        config = SCHEMA_RELATIONS[name]
+        value_col, label_col = config["fields"][value_attr], config["fields"][label_attr]
+        relation_cols.append(f"""(
+                SELECT json_group_array(json_array(v, l)) FROM (
+                    SELECT {value_col} AS v, {label_col} AS l FROM {config["table"]}
+                    WHERE ZOWNER = r.Z_PK ORDER BY Z_PK
+                )
+            ) AS {name}""")
+    note_col = "(SELECT ZTEXT FROM ZABCDNOTE n WHERE n.ZCONTACT = r.Z_PK)" if has_notes else "NULL"
+    scalars = ", ".join(
+        f'r.{SCHEMA[f]["sql"]}' if f in SCHEMA else note_col for f in SCALAR_FIELDS
+    )
+    where = f'r.{sql_column("id")} LIKE \'%:ABPerson\''
+    if where_clause:
+        where += f"""
+            AND r.Z_PK IN (
+                SELECT r.Z_PK FROM ZABCDRECORD r
+                {where_joins(where_clause)}
+                WHERE {translate_where(where_clause)}
+            )"""
+    return f"""
+        SELECT r.Z_PK, {scalars},
+            {", ".join(relation_cols)},
+            length(r.{sql_column("photo")}), length(r.{sql_column("thumbnail")})
+        FROM ZABCDRECORD r
+        WHERE {where}
+        ORDER BY r.Z_PK
+    """
+
+def iter_export_rows(where_clause: Optional[str] = None) -> Iterator[tuple]:
+    """Yield (conn, pk, Contact, photo_column) for every person in every source.
+
+    photo_column is the BLOB column holding an embedded photo (full image
+    preferred over thumbnail), or None. conn stays open while the row is
+    being handled, so the caller can stream the photo out of it.
+
+    A source that can't be read is skipped; one that fails after rows were
+    yielded raises, since the export would otherwise end up silently short.
+    If every source fails (e.g. a bad where_clause), the last error is raised.
+    """
+    failure, readable = None, False
+    for db_path in get_contact_databases():
+        conn, yielded = None, False
+        try:
+            conn = sqlite3.connect(db_path)
+            has_notes = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ZABCDNOTE'"
+            ).fetchone() is not None
+            cursor = conn.execute(_export_sql(where_clause, has_notes))
+            for row in cursor:
+                pk = row[0]
+                scalars = row[1:1 + len(SCALAR_FIELDS)]
+                related = row[1 + len(SCALAR_FIELDS):-2]
+                image_size, thumb_size = row[-2:]
+
+                contact = Contact(**{f: v or "" for f, v in zip(SCALAR_FIELDS, scalars)})
+                for (name, (record_type, value_attr, label_attr)), items in zip(RELATION_TYPES.items(), related):
+                    for value, label in json.loads(items or "[]"):
+                        if value:
+                            getattr(contact, name).append(
+                                record_type(**{value_attr: value, label_attr: _apple_label(label or "")})
+                            )
+
+                # < 100 bytes is an iCloud reference, not image data
+                photo_column = None
+                if image_size and image_size >= 100:
+                    photo_column = sql_column("photo")
+                elif thumb_size and thumb_size >= 100:
+                    photo_column = sql_column("thumbnail")
+                yield conn, pk, contact, photo_column
+                yielded = True
+            readable = True
+        except sqlite3.Error as e:
+            if yielded:
+                raise
+            failure = e
+        finally:
+            if conn is not None:
+                conn.close()
+    if failure is not None and not readable:
+        raise failure
+
+def iter_photo_chunks(conn: sqlite3.Connection, pk: int, column: str) -> Iterator[bytes]:
+    """Read a photo BLOB in PHOTO_CHUNK pieces (incremental BLOB I/O where available)."""
+    if hasattr(conn, "blobopen"):  # Python 3.11+
+        with conn.blobopen("ZABCDRECORD", column, pk, readonly=True) as blob:
+            first = True
+            while chunk := blob.read(PHOTO_CHUNK):
+                if first:
+                    chunk, first = _strip_photo_prefix(chunk), False
+                yield chunk
+        return
+    offset, first = 1, True
+    while True:
+        (chunk,) = conn.execute(
+            f"SELECT substr({column}, ?, ?) FROM ZABCDRECORD WHERE Z_PK = ?", (offset, PHOTO_CHUNK, pk)
+        ).fetchone()
+        if not chunk:
+            return
+        if first:
+            chunk, first = _strip_photo_prefix(chunk), False
+        yield chunk
+        offset += PHOTO_CHUNK
+
+def _strip_photo_prefix(chunk: bytes) -> bytes:
+    # Contacts stores some images with a one-byte 0x01 marker before the JPEG header
+    return chunk[1:] if chunk[:3] == b"\x01\xff\xd8" else chunk
+
+def _photo_mime(first_chunk: bytes) -> str:
+    return "image/png" if first_chunk.startswith(b"\x89PNG") else "image/jpeg"
+
+def _b64_chunks(chunks: Iterator[bytes]) -> Iterator[str]:
+    """Base64-encode a byte stream piecewise (carrying remainders to stay 3-byte aligned)."""
+    import base64
+    carry = b""
+    for chunk in chunks:
+        chunk = carry + chunk
+        cut = len(chunk) - len(chunk) % 3
+        carry = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut]).decode("ascii")
+    if carry:
+        yield base64.b64encode(carry).decode("ascii")
+
+def _vcard_escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def _vcard_fold(line: str) -> str:
+    """Fold a content line at 75 characters (RFC 6350 §3.2)."""
+    if len(line) <= 75:
+        return line + "\r\n"
+    parts = [line[:75]]
+    parts.extend(" " + line[i:i + 74] for i in range(75, len(line), 74))
+    return "\r\n".join(parts) + "\r\n"
+
+def write_vcard(out, contact: Contact, photo: Optional[Iterator[bytes]] = None) -> None:
+    """Write one vCard 3.0 record (photo streamed as folded base64 lines)."""
+    esc = _vcard_escape
+    lines = ["BEGIN:VCARD", "VERSION:3.0"]
+    lines.append(f"N:{esc(contact.lastName)};{esc(contact.firstName)};{esc(contact.middleName)};;")
+    fn = " ".join(p for p in (contact.firstName, contact.middleName, contact.lastName) if p) or contact.organization
+    lines.append(f"FN:{esc(fn)}")
+    if contact.nickname:
+        lines.append(f"NICKNAME:{esc(contact.nickname)}")
+    if contact.organization or contact.department:
+        lines.append(f"ORG:{esc(contact.organization)};{esc(contact.department)}")
+    if contact.jobTitle:
+        lines.append(f"TITLE:{esc(contact.jobTitle)}")
+
+    item = 0
+    for name, prop, value_attr in (("phones", "TEL", "number"), ("emails", "EMAIL", "address"), ("urls", "URL", "url")):
+        for record in getattr(contact, name):
+            value = getattr(record, value_attr)
+            if prop != "URL":
+                value = esc(value)
+            params = ["TYPE=INTERNET"] if prop == "EMAIL" else []
+            vcard_type = VCARD_TYPES[name].get(record.label.lower())
+            if vcard_type:
+                params.append(f"TYPE={vcard_type}")
+            head = ";".join([prop] + params)
+            if vcard_type or not record.label:
+                lines.append(f"{head}:{value}")
+            else:
+                # Custom label: Apple-style item group
+                item += 1
+                lines.append(f"item{item}.{head}:{value}")
+                lines.append(f"item{item}.X-ABLabel:{esc(record.label)}")
+    for social in contact.socials:
+        profile = get_profile_url(social.service, social.username) or social.username
+        lines.append(f"X-SOCIALPROFILE;TYPE={esc(social.service.lower())}:{profile}")
+    if contact.note:
+        lines.append(f"NOTE:{esc(contact.note)}")
+    if contact.id:
+        lines.append(f"UID:{contact.id}")
+    out.write("".join(_vcard_fold(line) for line in lines))
+
+    if photo is not None:
+        first = next(photo, b"")
+        if first:
+            out.write(f"PHOTO;ENCODING=b;TYPE={_photo_mime(first).split('/')[1].upper()}:\r\n")
+            for encoded in _b64_chunks(_chain_first(first, photo)):
+                for i in range(0, len(encoded), 72):
+                    out.write(" " + encoded[i:i + 72] + "\r\n")
+    out.write("END:VCARD\r\n")
+
+def _chain_first(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest
+
+def contact_record(contact: Contact) -> dict:
+    """Contact as a JSON-ready dict (the NDJSON export shape)."""
+    record = {f: getattr(contact, f) for f in SCALAR_FIELDS}
+    for name, (_, value_attr, label_attr) in RELATION_TYPES.items():
+        record[name] = [{value_attr: getattr(r, value_attr), label_attr: getattr(r, label_attr)}
+                        for r in getattr(contact, name)]
+    return record
+
+def write_ndjson(out, contact: Contact, photo: Optional[Iterator[bytes]] = None) -> None:
+    """Write one JSON line; the photo's base64 is streamed into the line in pieces."""
+    encoded = json.dumps(contact_record(contact), ensure_ascii=False)
+    first = next(photo, b"") if photo is not None else b""
+    if not first:
+        out.write(encoded + "\n")
+        return
+    out.write(encoded[:-1] + f', "photo": {{"mimeType": "{_photo_mime(first)}", "data": "')
+    for chunk in _b64_chunks(_chain_first(first, photo)):
+        out.write(chunk)
+    out.write('"}}\n')
+
+CSV_EXPORT_HEADER = ["ID", "First Name", "Last Name", "Middle Name", "Nickname", "Organization",
+                     "Job Title", "Department", "Notes", "Phone", "E-mail", "Website"]
+
+def export_contacts(out, fmt: str = "vcf", where_clause: Optional[str] = None,
+                    photos: bool = False) -> int:
+    """Stream every matching contact to `out` as vcf, ndjson or csv. Returns the count.
+
+    CSV is for spreadsheets: multi-values are joined with " ::: " (re-importable
+    with `import`) and labels/photos are left out. Use vcf or ndjson for backups.
+    """
+    import csv
+    writer = csv.writer(out, lineterminator="\n") if fmt == "csv" else None
+    if writer:
+        writer.writerow(CSV_EXPORT_HEADER)
+
+    count = 0
+    for conn, pk, contact, photo_column in iter_export_rows(where_clause):
+        photo = iter_photo_chunks(conn, pk, photo_column) if photos and photo_column else None
+        if fmt == "vcf":
+            write_vcard(out, contact, photo)
+        elif fmt == "ndjson":
+            write_ndjson(out, contact, photo)
+        else:
+            writer.writerow([getattr(contact, f) for f in SCALAR_FIELDS] + [
+                " ::: ".join(p.number for p in contact.phones),
+                " ::: ".join(e.address for e in contact.emails),
+                " ::: ".join(u.url for u in contact.urls),
+            ])
+        count += 1
+    return count
+
+# =============================================================================
+# Batch Mode (JSONL commands on stdin)
+# =============================================================================
+# One process for many commands: SQLite connections, the source list and an
+# AppleScript worker are shared. Consecutive reads run in parallel; consecutive
+# writes run concurrently too, so their scripts coalesce into one osascript
+# call. A write group never touches the same contact twice, which keeps the
+# result identical to running the commands one by one.
+
+BATCH_WORKERS = 8
+BATCH_GROUP_SIZE = 50
+READ_COMMANDS = {"search", "get", "export"}
+# Run in a group of their own: import's create scripts return many results
+# each, so they're never merged with other writes
+SOLO_COMMANDS = {"import"}
+
+class _BatchArgumentParser(argparse.ArgumentParser):
+    """Argument errors raise instead of exiting, so one bad line can't end the batch."""
+    def error(self, message):
+        raise ValueError(message)
+
+def _parse_batch_line(line: str, parser: argparse.ArgumentParser) -> tuple[object, Optional[argparse.Namespace], Optional[str]]:
+    """Return (request id, parsed args, error). Lines are ["search", "John"] or {"id": .., "args": [..]}."""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, None, f"invalid JSON: {e}"
+    request_id = None
+    if isinstance(request, dict):
+        request_id, request = request.get("id"), request.get("args")
+    if not isinstance(request, list) or not all(isinstance(a, str) for a in request):
+        return request_id, None, "expected a JSON array of arguments or {\"args\": [...]}"
+    try:
+        return request_id, parser.parse_args(request), None
+    except ValueError as e:
+        return request_id, None, f"invalid arguments: {e}"
+    except SystemExit:
+        return request_id, None, "invalid arguments"
+
+def _run_captured(args: argparse.Namespace, parser: argparse.ArgumentParser) -> tuple[bool, object]:
+    """Run one command with output_json() captured; returns (ok, result)."""
+    _local.sink = sink = []
+    ok = True
+    try:
+        run_command(args, parser)
+    except SystemExit as e:
+        ok = not e.code
+    except ValueError as e:
+        ok, sink[:] = False, [{"success": False, "error": f"invalid arguments: {e}"}]
+    except Exception as e:
+        ok, sink[:] = False, [{"success": False, "error": str(e)}]
+    finally:
+        _local.sink = None
+    result = sink[0] if len(sink) == 1 else sink
+    return ok, result
+
+def run_batch(lines: Iterable[str], out, workers: int = BATCH_WORKERS,
+              group_size: int = BATCH_GROUP_SIZE) -> None:
+    """Execute JSONL commands and write one JSONL result per input line, in order.
+    
+    Output lines: {"id": <request id, if given>, "ok": true|false, "result": <command JSON>}
+    """
+    global _applescript_worker
+    parser = build_parser(_BatchArgumentParser)
+    _applescript_worker = AppleScriptWorker()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    def flush(group):
+        futures = [pool.submit(_run_captured, args, parser) if args is not None else None
+                   for _, args, _ in group]
+        for (request_id, args, error), future in zip(group, futures):
+            if future is None:
+                ok, result = False, {"success": False, "error": error}
+            else:
+                ok, result = future.result()
+            line = {"ok": ok, "result": result}
+            if request_id is not None:
+                line = {"id": request_id, **line}
+            with TIMINGS.phase("jsonEncode"):
+                text = json.dumps(line, default=str)
+            out.write(text + "\n")
+        out.flush()
+
+    try:
+        group, group_kind, group_ids = [], None, set()
+        for raw in lines:
+            if not raw.strip():
+                continue
+            request_id, args, error = _parse_batch_line(raw, parser)
+            if args is not None and args.command == "batch":
+                args, error = None, "batch can't be nested"
+            kind = "read" if args is not None and args.command in READ_COMMANDS else "write"
+            if args is not None and args.command in SOLO_COMMANDS:
+                kind = "solo"
+            contact_id = getattr(args, "id", None) if kind == "write" else None
+
+            if group and (kind != group_kind or kind == "solo" or len(group) >= group_size
+                          or (contact_id is not None and contact_id in group_ids)):
+                flush(group)
+                group, group_ids = [], set()
+            group_kind = kind
+            group.append((request_id, args, error))
+            if contact_id is not None:
+                group_ids.add(contact_id)
+        if group:
+            flush(group)
+        output_timing(out)
+    finally:
+        pool.shutdown()
+        _applescript_worker.close()
+        _applescript_worker = None
+
 # =============================================================================
 # CLI
 # =============================================================================
 
+_local = threading.local()
+
 def output_json(data):
-    """Output data as formatted JSON."""
-    print(json.dumps(data, indent=2, default=str))
+    """Output data as formatted JSON (captured per thread in batch mode)."""
+    sink = getattr(_local, "sink", None)
+    if sink is not None:
+        sink.append(data)
+        return
+    if not TIMINGS.enabled:
+        print(json.dumps(data, indent=2, default=str))
+        return
+    start = time.perf_counter()
+    text = json.dumps(data, indent=2, default=str)
+    TIMINGS.record("jsonEncode", (time.perf_counter() - start) * 1000)
+    timing = json.dumps(TIMINGS.report(), indent=2, default=str)
+    if isinstance(data, dict) and data:
+        # Splice into the encoded object rather than encoding the payload twice
+        text = text[:-2] + ',\n  "_timing": ' + timing.replace("\n", "\n  ") + "\n}"
+    else:
+        print(json.dumps({"_timing": json.loads(timing)}), file=sys.stderr)
+    print(text)
 
-def main():
-    parser = argparse.ArgumentParser(
+def output_timing(out=None) -> None:
+    """Write the "_timing" report on its own line (batch mode, export to stdout)."""
+    if TIMINGS.enabled:
+        print(json.dumps({"_timing": TIMINGS.report()}, default=str), file=out or sys.stderr)
+
+def build_parser(parser_class=argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser = parser_class(
         description="Contacts CLI - CRUD interface for macOS Contacts.app",
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
+    parser.add_argument("--profile", action="store_true", help="Add per-phase \"_timing\" to the JSON output")
+    parser.add_argument("--profile-dump", action="store_true", help="Also write a cProfile dump to skills-data (implies --profile)")
     subparsers = parser.add_subparsers(dest="command", required=True)
     
     # search
@@ -1362,9 +2543,56 @@ def main():
     photo_clear = photo_sub.add_parser("clear", help="Remove photo")
     photo_clear.add_argument("id", help="Contact ID")
     
-    args = parser.parse_args()
+    # export
+    export_parser = subparsers.add_parser("export", help="Export contacts from SQLite (vCard, NDJSON or CSV)")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS, default="vcf", help="Output format (default: vcf)")
+    export_parser.add_argument("--where", help="Only export contacts matching this WHERE clause (same fields as search --where)")
+    export_parser.add_argument("--output", "-o", help="Write to this file instead of stdout")
+    export_parser.add_argument("--photos", action="store_true", help="Include embedded photos (vcf, ndjson)")
+    
+    # import
+    import_parser = subparsers.add_parser("import", help="Import contacts from a vCard or CSV file")
+    import_parser.add_argument("file", help="Path to .vcf or .csv file (- for stdin)")
+    import_parser.add_argument("--format", choices=["vcf", "csv"], help="Input format (default: from file extension)")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help=f"Contacts per AppleScript call (default: {IMPORT_BATCH_SIZE})")
+    import_parser.add_argument("--no-dedupe", action="store_true", help="Create every record, even if it matches an existing contact")
+    import_parser.add_argument("--dry-run", action="store_true", help="Parse and dedupe only, don't create anything")
     
-    # Execute command
+    # batch
+    batch_parser = subparsers.add_parser("batch", help="Run JSONL commands from stdin in one process")
+    batch_parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help=f"Parallel workers per group (default: {BATCH_WORKERS})")
+    batch_parser.add_argument("--group-size", type=int, default=BATCH_GROUP_SIZE, help=f"Max commands per group (default: {BATCH_GROUP_SIZE})")
+    
+    return parser
+
+def main():
+    import_ms = (time.perf_counter() - _IMPORT_START) * 1000
+    parser = build_parser()
+    args = parser.parse_args()
+    env = os.environ.get("CONTACTS_PROFILE", "").lower()
+    dump = args.profile_dump or env == "dump"
+    if not (args.profile or dump or env in ("1", "true", "yes")):
+        run_command(args, parser)
+        return
+    
+    import cProfile
+    dump_path = None
+    if dump:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        dump_path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{args.command}.prof")
+    TIMINGS.enable(import_ms, dump_path)
+    profiler = cProfile.Profile() if dump_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        run_command(args, parser)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(dump_path)
+
+def run_command(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """Execute a parsed command; results go through output_json(), failures sys.exit(1)."""
     if args.command == "search":
         if args.phone:
             results = search_by_phone(args.phone)
@@ -1502,6 +2730,62 @@ def main():
         else:
             output_json({"success": False, "error": result})
             sys.exit(1)
+    
+    elif args.command == "export":
+        if args.output:
+            try:
+                with open(args.output, "w", encoding="utf-8", newline="") as out:
+                    count = export_contacts(out, args.format, args.where, args.photos)
+            except sqlite3.Error as e:
+                output_json({"success": False, "error": f"Export failed: {e}", "output": args.output})
+                sys.exit(1)
+            output_json({"success": True, "count": count, "format": args.format, "output": args.output})
+        elif getattr(_local, "sink", None) is not None:
+            output_json({"success": False, "error": "export in batch mode needs --output"})
+            sys.exit(1)
+        else:
+            try:
+                count = export_contacts(sys.stdout, args.format, args.where, args.photos)
+            except sqlite3.Error as e:
+                # stdout is the export itself
+                sys.stdout.flush()
+                print(json.dumps({"success": False, "error": f"Export failed: {e}"}), file=sys.stderr)
+                sys.exit(1)
+            sys.stdout.flush()
+            output_timing()
+    
+    elif args.command == "import":
+        if args.file == "-" and getattr(_local, "sink", None) is not None:
+            output_json({"success": False, "error": "import in batch mode needs a file (stdin is the batch)"})
+            sys.exit(1)
+        
+        fmt = args.format
+        if not fmt:
+            ext = os.path.splitext(args.file)[1].lower()
+            fmt = {".vcf": "vcf", ".vcard": "vcf", ".csv": "csv"}.get(ext)
+        if not fmt:
+            parser.error("Can't tell the format from the file name; pass --format vcf|csv")
+        if args.file != "-" and not os.path.exists(args.file):
+            output_json({"success": False, "error": f"File not found: {args.file}"})
+            sys.exit(1)
+        
+        stream = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8-sig", errors="replace")
+        try:
+            contacts = parse_vcards(stream) if fmt == "vcf" else parse_csv(stream)
+            summary = import_contacts(contacts, batch_size=max(1, args.batch_size),
+                                      dedupe=not args.no_dedupe, dry_run=args.dry_run)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        output_json(summary)
+        if not summary["success"]:
+            sys.exit(1)
+    
+    elif args.command == "batch":
+        if getattr(_local, "sink", None) is not None:
+            output_json({"success": False, "error": "batch can't be nested"})
+            sys.exit(1)
+        run_batch(sys.stdin, sys.stdout, workers=max(1, args.workers), group_size=max(1, args.group_size))
 
 if __name__ == "__main__":
     main()
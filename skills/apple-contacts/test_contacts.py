@@ -899,6 +899,514 @@ def test_photo_from_service_url():
     print("✅ Photo from service URL test complete!", flush=True)
     print("=" * 40 + "\n", flush=True)
 
+def make_test_addressbook(home: str, contacts: list[dict]) -> str:
+    """Create a minimal AddressBook SQLite source under a fake $HOME.
+
+    Each contact dict: {"id", "first", "last", "org", "phones": [(number, label)],
+    "emails": [(address, label)], "urls": [(url, label)], "note", "thumbnail"}
+    """
+    import os
+    import sqlite3
+    source = os.path.join(home, "Library/Application Support/AddressBook/Sources/TEST-SOURCE")
+    os.makedirs(source, exist_ok=True)
+    db_path = os.path.join(source, "AddressBook-v22.abcddb")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE ZABCDRECORD (Z_PK INTEGER PRIMARY KEY, ZUNIQUEID TEXT, ZFIRSTNAME TEXT,
+            ZLASTNAME TEXT, ZMIDDLENAME TEXT, ZNICKNAME TEXT, ZORGANIZATION TEXT, ZJOBTITLE TEXT,
+            ZDEPARTMENT TEXT, ZIMAGEDATA BLOB, ZTHUMBNAILIMAGEDATA BLOB);
+        CREATE TABLE ZABCDPHONENUMBER (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZFULLNUMBER TEXT,
+            ZLABEL TEXT, ZLASTFOURDIGITS TEXT);
+        CREATE TABLE ZABCDEMAILADDRESS (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZADDRESS TEXT, ZLABEL TEXT);
+        CREATE TABLE ZABCDURLADDRESS (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZURL TEXT, ZLABEL TEXT);
+        CREATE TABLE ZABCDSOCIALPROFILE (Z_PK INTEGER PRIMARY KEY, ZOWNER INTEGER, ZSERVICENAME TEXT, ZUSERNAME TEXT);
+        CREATE TABLE ZABCDNOTE (Z_PK INTEGER PRIMARY KEY, ZCONTACT INTEGER, ZTEXT TEXT);
+    """)
+    for pk, c in enumerate(contacts, start=1):
+        conn.execute(
+            "INSERT INTO ZABCDRECORD (Z_PK, ZUNIQUEID, ZFIRSTNAME, ZLASTNAME, ZORGANIZATION, ZTHUMBNAILIMAGEDATA) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (pk, c["id"], c.get("first"), c.get("last"), c.get("org"), c.get("thumbnail")),
+        )
+        for number, label in c.get("phones", []):
+            digits = ''.join(ch for ch in number if ch.isdigit())
+            conn.execute("INSERT INTO ZABCDPHONENUMBER (ZOWNER, ZFULLNUMBER, ZLABEL, ZLASTFOURDIGITS) VALUES (?, ?, ?, ?)",
+                         (pk, number, label, digits[-4:]))
+        for address, label in c.get("emails", []):
+            conn.execute("INSERT INTO ZABCDEMAILADDRESS (ZOWNER, ZADDRESS, ZLABEL) VALUES (?, ?, ?)", (pk, address, label))
+        for url, label in c.get("urls", []):
+            conn.execute("INSERT INTO ZABCDURLADDRESS (ZOWNER, ZURL, ZLABEL) VALUES (?, ?, ?)", (pk, url, label))
+        if c.get("note"):
+            conn.execute("INSERT INTO ZABCDNOTE (ZCONTACT, ZTEXT) VALUES (?, ?)", (pk, c["note"]))
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_contact_columns():
+    """Test slot-based records and the ContactColumns bulk container."""
+    print("\n=== Columnar Contacts Test ===\n", flush=True)
+
+    import os
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from contacts import (
+        Contact, Phone, Email, URL, ContactColumns, load_contact_columns, contact_dedupe_keys
+    )
+
+    print("1. TEST slot-based records", flush=True)
+    phone = Phone(number="+15550001234")
+    if sys.version_info >= (3, 10):
+        assert not hasattr(phone, "__dict__"), "Phone should use __slots__"
+        assert not hasattr(Contact(), "__dict__"), "Contact should use __slots__"
+        print("    ✓ Records have no per-instance __dict__", flush=True)
+    else:
+        assert Contact(firstName="Ada").firstName == "Ada"
+        print("    ✓ Python < 3.10: plain dataclasses (no slots=)", flush=True)
+
+    print("\n2. TEST round trip through columns", flush=True)
+    contacts = [
+        Contact(id="A:ABPerson", firstName="Ada", lastName="Lovelace",
+                phones=[Phone("+15125551234", "mobile")], emails=[Email("ada@example.com", "work")]),
+        Contact(id="B:ABPerson", firstName="Alan", lastName="Turing",
+                urls=[URL("https://github.com/alan", "GitHub")]),
+        Contact(id="C:ABPerson", firstName="Ada", lastName="L.",
+                phones=[Phone("(512) 555-1234", "mobile")]),
+        Contact(id="D:ABPerson", organization="Acme", emails=[Email("ADA@example.com", "home")]),
+    ]
+    cols = ContactColumns.from_contacts(contacts)
+    assert len(cols) == 4, f"Expected 4 rows, got {len(cols)}"
+    assert list(cols) == contacts, "Round trip changed contacts"
+    assert cols.columns["firstName"] == ["Ada", "Alan", "Ada", ""]
+    print("    ✓ Contacts rebuilt unchanged from parallel arrays", flush=True)
+
+    assert sorted(cols.labels) == ["GitHub", "home", "mobile", "work"], f"Labels not interned: {cols.labels}"
+    print(f"    ✓ Labels interned once: {cols.labels}", flush=True)
+
+    print("\n3. TEST duplicates", flush=True)
+    assert contact_dedupe_keys(contacts[0]) == {"phone:5125551234", "email:ada@example.com"}
+    groups = cols.duplicates()
+    assert groups == [[0, 2, 3]], f"Wrong duplicate groups: {groups}"
+    print(f"    ✓ Duplicate groups by phone/email: {groups}", flush=True)
+
+    print("\n4. TEST load_contact_columns from SQLite", flush=True)
+    with tempfile.TemporaryDirectory() as home:
+        make_test_addressbook(home, [
+            {"id": "P1:ABPerson", "first": "Grace", "last": "Hopper",
+             "phones": [("+15550001111", "work"), ("+15550002222", "mobile")]},
+            {"id": "G1:ABGroup", "first": "Friends"},
+            {"id": "P2:ABPerson", "first": "Linus", "emails": [("linus@example.com", "work")]},
+        ])
+        old_home = os.environ.get("HOME")
+        os.environ["HOME"] = home
+        try:
+            loaded = load_contact_columns()
+        finally:
+            os.environ["HOME"] = old_home
+    assert len(loaded) == 2, f"Expected 2 persons (groups skipped), got {len(loaded)}"
+    grace = loaded.contact(0)
+    assert [p.number for p in grace.phones] == ["+15550001111", "+15550002222"]
+    assert loaded.contact(1).emails == [Email("linus@example.com", "work")]
+    print("    ✓ Records and relations merged per owner", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Columnar contacts test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+def test_import_parsing():
+    """Test streaming vCard/CSV parsing and dedupe for `import` (no writes)."""
+    print("\n=== Import Parsing Test ===\n", flush=True)
+
+    import io
+    import os
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from contacts import parse_vcards, parse_csv, import_contacts
+
+    print("1. TEST vCard parsing", flush=True)
+    vcf = io.StringIO(
+        "BEGIN:VCARD\r\n"
+        "VERSION:3.0\r\n"
+        "N:Doe;John;Q;;\r\n"
+        "FN:John Q Doe\r\n"
+        "ORG:Acme\\, Inc.;Engineering\r\n"
+        "TITLE:Engineer\r\n"
+        "TEL;TYPE=CELL:(512) 555-1234\r\n"
+        "TEL;TYPE=WORK,VOICE:+44 20 7946 0000\r\n"
+        "EMAIL;TYPE=INTERNET,WORK:john@acme.com\r\n"
+        "item1.URL:https://github.com/johndoe\r\n"
+        "item1.X-ABLabel:_$!<HomePage>!$_\r\n"
+        "NOTE:Line one\\nLine two that is folded\r\n"
+        "  across lines\r\n"
+        "END:VCARD\r\n"
+        "BEGIN:VCARD\r\n"
+        "VERSION:2.1\r\n"
+        "FN:Jane Roe\r\n"
+        "TEL;CELL:5125550000\r\n"
+        "END:VCARD\r\n"
+    )
+    contacts = list(parse_vcards(vcf))
+    assert len(contacts) == 2, f"Expected 2 vCards, got {len(contacts)}"
+    john, jane = contacts
+    assert (john.firstName, john.lastName, john.middleName) == ("John", "Doe", "Q")
+    assert (john.organization, john.department) == ("Acme, Inc.", "Engineering")
+    assert [(p.number, p.label) for p in john.phones] == [("(512) 555-1234", "mobile"), ("+44 20 7946 0000", "work")]
+    assert [(e.address, e.label) for e in john.emails] == [("john@acme.com", "work")]
+    assert [(u.url, u.label) for u in john.urls] == [("https://github.com/johndoe", "HomePage")]
+    assert john.note == "Line one\nLine two that is folded across lines", f"Bad note: {john.note!r}"
+    assert (jane.firstName, jane.lastName, jane.phones[0].label) == ("Jane", "Roe", "mobile")
+    print("    ✓ N/ORG/TEL/EMAIL/URL, folding, escapes and item labels parsed", flush=True)
+
+    print("\n2. TEST CSV parsing", flush=True)
+    csv_text = io.StringIO(
+        "First Name,Last Name,Organization 1 - Name,E-mail 1 - Value,Phone 1 - Type,Phone 1 - Value,Website 1 - Value\n"
+        "Ada,Lovelace,Engines,ada@example.com ::: ada@work.com,* Mobile,512-555-9999,https://ada.dev\n"
+        ",,,,,,\n"
+        "Alan,Turing,,alan@example.com,Work,,\n"
+    )
+    contacts = list(parse_csv(csv_text))
+    assert len(contacts) == 2, f"Expected 2 rows (blank skipped), got {len(contacts)}"
+    ada = contacts[0]
+    assert (ada.firstName, ada.lastName, ada.organization) == ("Ada", "Lovelace", "Engines")
+    assert [e.address for e in ada.emails] == ["ada@example.com", "ada@work.com"]
+    assert [(p.number, p.label) for p in ada.phones] == [("512-555-9999", "mobile")]
+    assert [u.url for u in ada.urls] == ["https://ada.dev"]
+    print("    ✓ Google-style columns, ::: multi-values and type columns parsed", flush=True)
+
+    print("\n3. TEST dedupe + normalization (dry run)", flush=True)
+    incoming = io.StringIO(
+        "First Name,Last Name,Mobile Phone,Email\n"
+        "Grace,Hopper,(555) 000-1111,\n"            # matches existing phone
+        "Linus,T,,LINUS@example.com\n"               # matches existing email
+        "New,Person,555 000 3333,\n"
+        "New,Person Again,+1 555-000-3333,\n"        # duplicate within the file
+        "Solo,Name,,\n"
+        "Grace,Hopper,,\n"                           # name-only match
+    )
+    with tempfile.TemporaryDirectory() as home:
+        make_test_addressbook(home, [
+            {"id": "P1:ABPerson", "first": "Grace", "last": "Hopper", "phones": [("+15550001111", "work")]},
+            {"id": "P2:ABPerson", "first": "Linus", "emails": [("linus@example.com", "work")]},
+        ])
+        old_home = os.environ.get("HOME")
+        os.environ["HOME"] = home
+        try:
+            summary = import_contacts(parse_csv(incoming), batch_size=2, dry_run=True)
+        finally:
+            os.environ["HOME"] = old_home
+    assert summary["parsed"] == 6, summary
+    assert summary["skipped"] == 4, summary
+    assert summary["created"] == 2, summary
+    print(f"    ✓ {summary['parsed']} parsed, {summary['skipped']} duplicates skipped, {summary['created']} to create", flush=True)
+
+    print("\n4. TEST batched create results with multi-line errors", flush=True)
+    import contacts as contacts_module
+    scripts = []
+    def fake_osascript(script):
+        scripts.append(script)
+        return True, "NEW1:ABPerson\x1eerror:::Can't make person.\nInvalid value.\x1eNEW3:ABPerson"
+    original = contacts_module._osascript
+    contacts_module._osascript = fake_osascript
+    try:
+        ok, results = contacts_module.create_contacts_applescript(
+            [contacts_module.Contact(firstName=name) for name in ("A", "B", "C")])
+    finally:
+        contacts_module._osascript = original
+    assert ok and len(scripts) == 1 and "character id 30" in scripts[0]
+    assert results == ["NEW1:ABPerson", "error:::Can't make person.\nInvalid value.", "NEW3:ABPerson"], results
+    print("    ✓ A newline in one error doesn't shift the other results", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Import parsing test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+def test_export():
+    """Test streaming export from SQLite (vcf, ndjson, csv) against a fake source."""
+    print("\n=== Export Test ===\n", flush=True)
+
+    import base64
+    import io
+    import os
+    import tempfile
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import sqlite3
+    from contacts import export_contacts, parse_vcards, parse_csv, run_batch
+
+    jpeg = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 600 + b"\xff\xd9"
+    with tempfile.TemporaryDirectory() as home:
+        make_test_addressbook(home, [
+            {"id": "P1:ABPerson", "first": "Grace", "last": "Hopper", "org": "Navy; R&D",
+             "phones": [("+15550001111", "_$!<Mobile>!$_"), ("+15550002222", "Lab")],
+             "emails": [("grace@example.com", "_$!<Work>!$_")],
+             "urls": [("https://github.com/grace", "GitHub")],
+             "note": "Invented the compiler,\nfound a moth", "thumbnail": b"\x01" + jpeg},
+            {"id": "G1:ABGroup", "first": "Friends"},
+            {"id": "P2:ABPerson", "first": "Linus", "thumbnail": b"x" * 38},
+        ])
+        old_home = os.environ.get("HOME")
+        os.environ["HOME"] = home
+        try:
+            vcf, ndjson, csv_out, filtered = io.StringIO(), io.StringIO(), io.StringIO(), io.StringIO()
+            count = export_contacts(vcf, "vcf", photos=True)
+            export_contacts(ndjson, "ndjson", photos=True)
+            export_contacts(csv_out, "csv")
+            filtered_count = export_contacts(filtered, "ndjson", where_clause="number LIKE '%2222'")
+
+            # The export cursor fails after its first row, like a read error mid-file
+            class FailingConnection:
+                def __init__(self, conn):
+                    self.conn = conn
+                def execute(self, sql, *args):
+                    cursor = self.conn.execute(sql, *args)
+                    if "json_group_array" not in sql:
+                        return cursor
+                    def rows():
+                        yield next(cursor)
+                        raise sqlite3.DatabaseError("database disk image is malformed")
+                    return rows()
+                def __getattr__(self, name):
+                    return getattr(self.conn, name)
+
+            connect, opened = sqlite3.connect, []
+            sqlite3.connect = lambda *a, **k: opened.append(connect(*a, **k)) or FailingConnection(opened[-1])
+            partial = io.StringIO()
+            try:
+                export_contacts(partial, "ndjson")
+                assert False, "A failure part-way through the cursor should raise"
+            except sqlite3.Error:
+                pass
+            finally:
+                sqlite3.connect = connect
+
+            try:
+                export_contacts(io.StringIO(), "ndjson", where_clause="firstName = = 'x'")
+                assert False, "A --where every source rejects should raise"
+            except sqlite3.Error:
+                pass
+            batch_out = io.StringIO()
+            output_path = os.path.join(home, "bad.ndjson")
+            run_batch(io.StringIO(json.dumps(["export", "-o", output_path, "--where", "firstName = = 'x'"])),
+                      batch_out, workers=1)
+            bad_where = json.loads(batch_out.getvalue().splitlines()[0])
+        finally:
+            os.environ["HOME"] = old_home
+
+    print("1. TEST vCard export round trip", flush=True)
+    assert count == 2, f"Expected 2 persons exported, got {count}"
+    text = vcf.getvalue()
+    assert all(len(line) <= 75 for line in text.split("\r\n")), "vCard lines not folded"
+    grace, linus = list(parse_vcards(io.StringIO(text)))
+    assert (grace.firstName, grace.lastName, grace.organization) == ("Grace", "Hopper", "Navy; R&D")
+    assert [(p.number, p.label) for p in grace.phones] == [("+15550001111", "mobile"), ("+15550002222", "Lab")]
+    assert [(e.address, e.label) for e in grace.emails] == [("grace@example.com", "work")]
+    assert grace.note == "Invented the compiler,\nfound a moth"
+    assert "PHOTO;ENCODING=b;TYPE=JPEG:" in text and text.count("PHOTO") == 1, "Reference photo should be skipped"
+    print("    ✓ vCard re-imports with labels, escapes and notes intact", flush=True)
+
+    print("\n2. TEST NDJSON export with streamed photo", flush=True)
+    lines = [json.loads(line) for line in ndjson.getvalue().splitlines()]
+    assert [r["id"] for r in lines] == ["P1:ABPerson", "P2:ABPerson"]
+    assert lines[0]["phones"][0] == {"number": "+15550001111", "label": "Mobile"}
+    photo = lines[0]["photo"]
+    assert photo["mimeType"] == "image/jpeg" and base64.b64decode(photo["data"]) == jpeg, "Photo bytes differ"
+    assert "photo" not in lines[1]
+    print(f"    ✓ {len(jpeg)}-byte photo streamed intact (0x01 marker stripped)", flush=True)
+
+    print("\n3. TEST CSV export and --where", flush=True)
+    rows = list(parse_csv(io.StringIO(csv_out.getvalue())))
+    assert [p.number for p in rows[0].phones] == ["+15550001111", "+15550002222"]
+    assert filtered_count == 1 and json.loads(filtered.getvalue())["firstName"] == "Grace"
+    print("    ✓ CSV re-imports; --where filters through relation joins", flush=True)
+
+    print("\n4. TEST failure mid-export raises and closes the source", flush=True)
+    assert json.loads(partial.getvalue())["firstName"] == "Grace"
+    assert opened, "Export should have opened a source"
+    for conn in opened:
+        try:
+            conn.execute("SELECT 1")
+            assert False, "Source connection left open"
+        except sqlite3.ProgrammingError:
+            pass
+    print("    ✓ Error surfaces after the rows already written; connection closed", flush=True)
+
+    print("\n5. TEST invalid --where fails the export", flush=True)
+    assert not bad_where["ok"] and "Export failed" in bad_where["result"]["error"], bad_where
+    print("    ✓ 0 contacts from a rejected query is an error, not an empty export", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Export test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+def test_batch():
+    """Test JSONL batch mode: ordered results, parallel reads, coalesced AppleScript."""
+    print("\n=== Batch Mode Test ===\n", flush=True)
+
+    import io
+    import os
+    import tempfile
+    import threading
+    import time
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import contacts
+
+    with tempfile.TemporaryDirectory() as home:
+        make_test_addressbook(home, [
+            {"id": "P1:ABPerson", "first": "Grace", "last": "Hopper",
+             "phones": [("+15550001111", "_$!<Mobile>!$_")]},
+            {"id": "P2:ABPerson", "first": "Linus", "last": "Torvalds"},
+        ])
+        old_home = os.environ.get("HOME")
+        os.environ["HOME"] = home
+        try:
+            commands = "\n".join([
+                json.dumps(["search", "Grace"]),
+                json.dumps({"id": "q2", "args": ["search", "--phone", "0001111"]}),
+                "",
+                "not json",
+                json.dumps(["search", "--bogus"]),
+                json.dumps(["batch"]),
+                json.dumps(["import", "-", "--format", "vcf"]),
+                json.dumps({"id": 7, "args": ["search", "Linus"]}),
+            ]) + "\n"
+            out = io.StringIO()
+            contacts.run_batch(io.StringIO(commands), out, workers=4)
+        finally:
+            os.environ["HOME"] = old_home
+
+    print("1. TEST ordered JSONL results", flush=True)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(results) == 7, f"Expected 7 results (blank line skipped), got {len(results)}"
+    assert results[0]["ok"] and results[0]["result"]["contacts"][0]["firstName"] == "Grace"
+    assert results[1]["id"] == "q2" and results[1]["result"]["contacts"][0]["id"] == "P1:ABPerson"
+    assert not results[2]["ok"] and "invalid JSON" in results[2]["result"]["error"]
+    assert not results[3]["ok"] and "invalid arguments" in results[3]["result"]["error"]
+    assert not results[4]["ok"] and "nested" in results[4]["result"]["error"]
+    assert not results[5]["ok"] and "needs a file" in results[5]["result"]["error"]
+    assert results[6]["id"] == 7 and results[6]["result"]["contacts"][0]["lastName"] == "Torvalds"
+    print("    ✓ Results in input order; bad lines reported without stopping the batch", flush=True)
+
+    print("\n2. TEST concurrent scripts coalesce into one osascript call", flush=True)
+    calls = []
+    original = contacts._osascript
+    def fake_osascript(script):
+        calls.append(script)
+        if script.count("on cmd") > 1:
+            return True, "ok:::a\x1eerr:::boom\x1eok:::c"
+        return True, "single"
+    contacts._osascript = fake_osascript
+    worker = contacts.AppleScriptWorker(linger=0.2)
+    try:
+        results = [None] * 3
+        def submit(i):
+            results[i] = worker.run(f'return "{i}"')
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        alone = worker.run('return "x"')
+    finally:
+        worker.close()
+        contacts._osascript = original
+    assert results == [(True, "a"), (False, "boom"), (True, "c")], results
+    assert alone == (True, "single")
+    assert len(calls) == 2, f"Expected 2 osascript launches, got {len(calls)}"
+    print("    ✓ 3 parallel scripts ran as one combined osascript call", flush=True)
+
+    print("\n3. TEST combined results that can't be matched are not re-run", flush=True)
+    calls.clear()
+    def run_group(output):
+        def fake(script):
+            calls.append(script)
+            return output if script.count("on cmd") > 1 else (True, "single")
+        contacts._osascript = fake
+        try:
+            return contacts.AppleScriptWorker()._run_many(['return "1"', 'return "2"'])
+        finally:
+            contacts._osascript = original
+    results = run_group((True, "ok:::a\x1eextra\x1eok:::b"))
+    assert len(calls) == 1 and all(not ok and "ran, but" in error for ok, error in results), results
+    calls.clear()
+    results = run_group((False, "syntax error"))
+    assert len(calls) == 3 and results == [(True, "single")] * 2, "Compile failure should fall back"
+    print("    ✓ Mismatch reported once; only a failed combined script falls back", flush=True)
+
+    print("\n4. TEST import runs in a group of its own", flush=True)
+    spans = []
+    def fake_run_captured(args, parser):
+        start = time.monotonic()
+        time.sleep(0.05)
+        spans.append((args.command, start, time.monotonic()))
+        return True, {}
+    original_run = contacts._run_captured
+    contacts._run_captured = fake_run_captured
+    try:
+        commands = "\n".join(json.dumps(line) for line in [
+            ["phone", "add", "A:ABPerson", "+15550001111"],
+            ["import", "contacts.vcf"],
+            ["email", "add", "B:ABPerson", "b@example.com"],
+        ])
+        contacts.run_batch(io.StringIO(commands), io.StringIO(), workers=4)
+    finally:
+        contacts._run_captured = original_run
+    [(_, import_start, import_end)] = [span for span in spans if span[0] == "import"]
+    assert all(end <= import_start or start >= import_end for command, start, end in spans if command != "import"), spans
+    print("    ✓ Writes before and after import don't overlap it", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Batch mode test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+def test_profile_timing():
+    """Test --profile: per-phase _timing in the JSON and the cProfile dump."""
+    print("\n=== Profile Timing Test ===\n", flush=True)
+
+    import os
+    import subprocess
+    import tempfile
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contacts.py")
+
+    with tempfile.TemporaryDirectory() as home:
+        make_test_addressbook(home, [{"id": "P1:ABPerson", "first": "Grace", "last": "Hopper"}])
+        env = {**os.environ, "HOME": home}
+        plain = subprocess.run([sys.executable, script, "search", "Grace"],
+                               capture_output=True, text=True, env=env)
+        profiled = subprocess.run([sys.executable, script, "--profile-dump", "search", "Grace"],
+                                  capture_output=True, text=True, env=env)
+        env["CONTACTS_PROFILE"] = "1"
+        from_env = subprocess.run([sys.executable, script, "search", "Grace"],
+                                  capture_output=True, text=True, env=env)
+
+    print("1. TEST no _timing unless asked", flush=True)
+    assert plain.returncode == 0, plain.stderr
+    assert "_timing" not in json.loads(plain.stdout)
+    print("    ✓ Default output unchanged", flush=True)
+
+    print("\n2. TEST _timing breakdown", flush=True)
+    assert profiled.returncode == 0, profiled.stderr
+    result = json.loads(profiled.stdout)
+    timing = result["_timing"]
+    assert result["count"] == 1
+    assert {"discovery", "sqlite", "jsonEncode"} <= set(timing["phases"]), timing["phases"]
+    sqlite_calls = [c for c in timing["calls"] if c["phase"] == "sqlite"]
+    assert sqlite_calls and sqlite_calls[0]["source"] == "TEST-SOURCE" and sqlite_calls[0]["rows"] == 1
+    assert timing["importMs"] > 0 and timing["totalMs"] >= timing["importMs"]
+    print(f"    ✓ Phases: {sorted(timing['phases'])}", flush=True)
+
+    print("\n3. TEST cProfile dump and env var", flush=True)
+    dump = timing["profileDump"]
+    try:
+        import pstats
+        stats = pstats.Stats(dump)
+        assert any(func[2] == "search_by_name" for func in stats.stats), "search_by_name missing from dump"
+    finally:
+        os.remove(dump)
+    assert "_timing" in json.loads(from_env.stdout)
+    print("    ✓ Dump written to skills-data and readable by pstats; CONTACTS_PROFILE=1 works", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Profile timing test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
 if __name__ == "__main__":
     test_crud_lifecycle()
     test_url_operations()
@@ -907,6 +1415,11 @@ if __name__ == "__main__":
     test_phone_normalization()
     test_unified_services()
     test_photo_from_service_url()
+    test_contact_columns()
+    test_import_parsing()
+    test_export()
+    test_batch()
+    test_profile_timing()
     test_fix_migration()
     
     print("\n" + "=" * 50, flush=True)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Asyncio client for the Gmail, Drive and Docs endpoints the skills use.
+
+googleapiclient is synchronous, so concurrency there means threads. This layer
+speaks the same REST calls directly on one event loop: thousands of requests
+can be in flight from a single thread, sharing a pooled keep-alive connection
+per host. It reuses auth.py's delegated credentials and token cache, quota
+token buckets, retry/backoff and REQUEST_LOG, and raises googleapiclient's
+HttpError, so callers handle errors exactly as with the sync services.
+
+    async with AsyncGoogleClient() as client:
+        page = await client.list_messages('user@example.com', query='is:unread')
+        messages = await asyncio.gather(*(
+            client.get_message('user@example.com', stub['id'], format='metadata')
+            for stub in page.get('messages', [])))
+
+httpx is optional (`pip install "httpx[http2]"`): with it, requests are sent
+natively on the loop (HTTP/2 when h2 is installed, otherwise HTTP/1.1
+keep-alive); without it, they run on auth.py's shared connection pool in a
+small thread pool, so the API is the same either way.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.errors import HttpError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from auth import (API_ROOT_ENV, DOCS_SCOPES, DRIVE_SCOPES, GMAIL_MODIFY_SCOPES, GMAIL_SCOPES, MAX_RETRIES, POOL_MAXSIZE,
+                  REQUEST_LOG, RequestHttp, backoff_delay, get_credentials, get_limiter, get_transport,
+                  is_idempotent, is_retryable, request_cost)
+
+# Where each API lives (a root_url passed to AsyncGoogleClient, or GOOGLE_API_ROOT,
+# replaces all three, e.g. for a local stand-in server)
+ROOT_URLS = {
+    'gmail': 'https://gmail.googleapis.com/',
+    'drive': 'https://www.googleapis.com/',
+    'docs': 'https://docs.googleapis.com/',
+}
+# Requests awaiting a response at once (the rest queue); connections per host
+MAX_IN_FLIGHT = 500
+CONNECTIONS_PER_HOST = POOL_MAXSIZE
+REQUEST_TIMEOUT = 60
+
+
+class HttpxPool:
+    """httpx.AsyncClient pooling keep-alive connections per host (HTTP/2 when h2 is installed)."""
+
+    def __init__(self, connections_per_host=CONNECTIONS_PER_HOST, timeout=REQUEST_TIMEOUT):
+        try:
+            import h2  # noqa: F401 - httpx needs it for http2=True
+            http2 = True
+        except ImportError:
+            http2 = False
+        self.client = httpx.AsyncClient(http2=http2, timeout=timeout, limits=httpx.Limits(
+            max_connections=connections_per_host * len(ROOT_URLS),
+            max_keepalive_connections=connections_per_host * len(ROOT_URLS)))
+
+    async def request(self, method, url, headers, body=None):
+        """
+        Returns:
+            (status, headers with lower-case names, decoded body bytes)
+        """
+        response = await self.client.request(method, url, headers=headers, content=body)
+        response_headers = {k.lower(): v for k, v in response.headers.items()}
+        return response.status_code, response_headers, response.content
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ThreadedPool:
+    """
+    Fallback without httpx: sends on auth.py's shared PooledTransport from a
+    thread pool sized like that connection pool, awaiting the result.
+    """
+
+    def __init__(self, connections_per_host=CONNECTIONS_PER_HOST, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=connections_per_host, thread_name_prefix='google-async')
+
+    async def request(self, method, url, headers, body=None):
+        """
+        Returns:
+            (status, headers with lower-case names, decoded body bytes)
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, get_transport().send, method, url, body, headers, self.timeout)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def open_pool():
+    """HttpxPool when httpx is installed, else ThreadedPool."""
+    return HttpxPool() if httpx is not None else ThreadedPool()
+
+
+class AsyncGoogleClient:
+    """
+    Gmail/Drive/Docs REST calls as coroutines. Use as `async with`, inside one event loop.
+
+    Every call takes the user to impersonate; credentials are loaded (from the
+    token cache when possible) once per (user, scopes) and refreshed off-loop.
+    """
+
+    def __init__(self, root_url=None, max_in_flight=MAX_IN_FLIGHT):
+        root_url = root_url or os.environ.get(API_ROOT_ENV)
+        # A stand-in server gets no real credentials
+        self.anonymous = bool(root_url)
+        if root_url:
+            root_url = root_url.rstrip('/') + '/'
+        self.root_urls = {api: root_url for api in ROOT_URLS} if root_url else dict(ROOT_URLS)
+        self.max_in_flight = max_in_flight
+        self._credentials = {}
+        self._token_locks = {}
+        self._pool = None
+        self._in_flight = None
+
+    async def __aenter__(self):
+        self._pool = open_pool()
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    # --- Core ------------------------------------------------------------------
+
+    async def _authorize(self, user_email, scopes, headers):
+        if self.anonymous:
+            return
+        key = (user_email, tuple(scopes))
+        credentials = self._credentials.get(key)
+        if credentials is None or not credentials.valid:
+            lock = self._token_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                credentials = self._credentials.get(key)
+                if credentials is None or not credentials.valid:
+                    # Token exchange is blocking google-auth code: keep it off the loop
+                    credentials = await asyncio.to_thread(_load_credentials, user_email, scopes)
+                    self._credentials[key] = credentials
+        credentials.apply(headers)
+
+    async def request(self, api, user_email, scopes, method, path, params=None, body=None):
+        """
+        One API call, paced by the (api, user) quota bucket and retried like
+        the sync transport.
+
+        Args:
+            api: 'gmail', 'drive' or 'docs' (picks the host and quota bucket)
+            user_email: Email address to impersonate
+            scopes: OAuth scopes for the call
+            method: HTTP method
+            path: Path under the API root (e.g. 'gmail/v1/users/me/messages')
+            params: Query parameters (lists repeat the parameter; None values are dropped)
+            body: JSON-serializable request body
+
+        Returns:
+            Parsed JSON, or the raw bytes for non-JSON responses (exports, media)
+
+        Raises:
+            HttpError: For error statuses, after retries
+        """
+        query = urlencode({k: v for k, v in (params or {}).items() if v is not None}, doseq=True)
+        uri = self.root_urls[api] + path + (f'?{query}' if query else '')
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'accept-encoding': 'gzip, deflate'}
+        if payload is not None:
+            headers['content-type'] = 'application/json'
+        limiter = get_limiter(api, user_email)
+        cost = request_cost(api, method, uri)
+        idempotent = is_idempotent(method, uri)
+
+        for attempt in range(MAX_RETRIES + 1):
+            await self._authorize(user_email, scopes, headers)
+            wait = limiter.reserve(cost)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async with self._in_flight:
+                start = time.perf_counter()
+                status, response_headers, content = await self._pool.request(method, uri, headers, payload)
+            if REQUEST_LOG.enabled:
+                REQUEST_LOG.record(method, uri, status, (time.perf_counter() - start) * 1000,
+                                   len(content), response_headers.get('content-encoding'))
+            if status == 401 and attempt == 0:
+                # Token revoked/expired early: drop it and fetch a new one
+                self._credentials.pop((user_email, tuple(scopes)), None)
+                continue
+            if status < 400:
+                if 'json' in response_headers.get('content-type', '') and content:
+                    return json.loads(content)
+                return content
+            if attempt >= MAX_RETRIES or not is_retryable(status, content, idempotent):
+                break
+            delay = backoff_delay(attempt, response_headers.get('retry-after'))
+            REQUEST_LOG.count_retry(delay)
+            await asyncio.sleep(delay)
+        raise HttpError(httplib2.Response({**response_headers, 'status': str(status)}), content, uri=uri)
+
+    # --- Gmail -----------------------------------------------------------------
+
+    async def list_messages(self, user_email, query=None, max_results=100, page_token=None,
+                            fields='messages(id,threadId),nextPageToken'):
+        """One messages.list page."""
+        return await self.request('gmail', user_email, GMAIL_SCOPES, 'GET', 'gmail/v1/users/me/messages', {
+            'q': query, 'maxResults': max_results, 'pageToken': page_token, 'fields': fields})
+
+    async def iter_message_ids(self, user_email, query=None, max_results=100):
+        """Yield message stubs across pages, up to max_results."""
+        page_token, remaining = None, max_results
+        while remaining > 0:
+            page = await self.list_messages(user_email, query, min(remaining, 500), page_token)
+            messages = page.get('messages', [])[:remaining]
+            for stub in messages:
+                yield stub
+            remaining -= len(messages)
+            page_token = page.get('nextPageToken')
+            if not page_token or not messages:
+                return
+
+    async def get_message(self, user_email, message_id, format='full', metadata_headers=None, fields=None):
+        """messages.get."""
+        return await self.request('gmail', user_email, GMAIL_SCOPES, 'GET',
+                                  f'gmail/v1/users/me/messages/{message_id}', {
+                                      'format': format, 'metadataHeaders': metadata_headers, 'fields': fields})
+
+    async def batch_modify(self, user_email, message_ids, add_label_ids=None, remove_label_ids=None):
+        """messages.batchModify (at most 1000 IDs per call)."""
+        return await self.request('gmail', user_email, GMAIL_MODIFY_SCOPES, 'POST',
+                                  'gmail/v1/users/me/messages/batchModify', body={
+                                      'ids': list(message_ids),
+                                      'addLabelIds': add_label_ids or [],
+                                      'removeLabelIds': remove_label_ids or []})
+
+    async def create_draft(self, user_email, raw_message, fields='id,message(id,threadId)'):
+        """drafts.create from a base64url-encoded MIME message (see gmail.build_raw_message)."""
+        return await self.request('gmail', user_email, GMAIL_SCOPES, 'POST', 'gmail/v1/users/me/drafts',
+                                  {'fields': fields}, body={'message': {'raw': raw_message}})
+
+    # --- Drive / Docs ----------------------------------------------------------
+
+    async def list_files(self, user_email, query=None, page_size=20, page_token=None, order_by=None,
+                         fields='nextPageToken, files(id, name, mimeType, modifiedTime, size, parents, webViewLink)'):
+        """files.list."""
+        return await self.request('drive', user_email, DRIVE_SCOPES, 'GET', 'drive/v3/files', {
+            'q': query, 'pageSize': page_size, 'pageToken': page_token, 'orderBy': order_by, 'fields': fields})
+
+    async def get_file(self, user_email, file_id, fields='id, name, mimeType, size'):
+        """files.get (metadata)."""
+        return await self.request('drive', user_email, DRIVE_SCOPES, 'GET', f'drive/v3/files/{file_id}',
+                                  {'fields': fields})
+
+    async def get_media(self, user_email, file_id):
+        """files.get?alt=media: the file's bytes."""
+        return await self.request('drive', user_email, DRIVE_SCOPES, 'GET', f'drive/v3/files/{file_id}',
+                                  {'alt': 'media'})
+
+    async def export_file(self, user_email, file_id, mime_type):
+        """files.export: a Google Workspace file converted to mime_type, as bytes."""
+        return await self.request('drive', user_email, DRIVE_SCOPES, 'GET', f'drive/v3/files/{file_id}/export',
+                                  {'mimeType': mime_type})
+
+    async def get_document(self, user_email, document_id, fields=None):
+        """documents.get."""
+        return await self.request('docs', user_email, DOCS_SCOPES, 'GET', f'v1/documents/{document_id}',
+                                  {'fields': fields})
+
+
+def _load_credentials(user_email, scopes):
+    """Delegated credentials with a usable token (from the cache, else a token exchange)."""
+    credentials = get_credentials(user_email, scopes)
+    if not credentials.valid:
+        credentials.refresh(google_auth_httplib2.Request(RequestHttp()))
+    return credentials
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Content-addressed attachment store for the Gmail skill.
+
+Files live under user/skills-data/gmail/attachments/<sha256[:2]>/<sha256>, so
+the same PDF sent in 30 threads is stored once. A small index remembers which
+(message, part) produced which file, so a second `attachments --download` of a
+message doesn't fetch anything. The store is readable only by its owner
+(see storage.py).
+"""
+import base64
+import hashlib
+import itertools
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+
+from storage import private_dir, private_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+ATTACHMENTS_DIR = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'gmail', 'attachments')
+
+# base64 characters decoded and written per step (multiple of 4)
+DECODE_CHUNK = 256 * 1024
+
+
+def blob_path(sha256):
+    """Where the file with this hash is stored."""
+    return os.path.join(ATTACHMENTS_DIR, sha256[:2], sha256)
+
+
+def store_base64(data):
+    """
+    Decode base64url data to the store in chunks, hashing as it goes.
+
+    Args:
+        data: base64url string (Gmail body.data), or an iterable of str/bytes
+            pieces of one as they arrive (a streamed attachments.get response)
+
+    Returns:
+        (sha256, path, size, already_stored)
+    """
+    if isinstance(data, (str, bytes)):
+        data = [data]
+    private_dir(ATTACHMENTS_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=ATTACHMENTS_DIR, prefix='.incoming-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pending = b''
+            for piece in data:
+                if isinstance(piece, str):
+                    piece = piece.encode('ascii')
+                for start in range(0, len(piece), DECODE_CHUNK):
+                    pending += piece[start:start + DECODE_CHUNK]
+                    # Decode whole 4-character groups; the rest waits for the next piece
+                    cut = len(pending) - len(pending) % 4
+                    raw = base64.urlsafe_b64decode(pending[:cut])
+                    pending = pending[cut:]
+                    digest.update(raw)
+                    f.write(raw)
+                    size += len(raw)
+            if pending:
+                raw = base64.urlsafe_b64decode(pending + b'=' * (-len(pending) % 4))  # Gmail drops padding
+                digest.update(raw)
+                f.write(raw)
+                size += len(raw)
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return sha256, path, size, True
+        private_dir(os.path.dirname(path))
+        # mkstemp made the file 0600; the rename keeps that
+        os.replace(tmp_path, path)
+        return sha256, path, size, False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def json_string_chunks(chunks, key):
+    """
+    Yield a top-level JSON string value piece by piece from a streamed body.
+
+    Only for values without escapes, such as base64 data: the value ends at
+    the first quote after it starts.
+
+    Args:
+        chunks: Iterator of response body bytes
+        key: Field name, e.g. 'data'
+    """
+    pattern = re.compile(rb'"' + re.escape(key.encode()) + rb'"\s*:\s*"')
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        match = pattern.search(head)
+        if match:
+            break
+        head = head[-64:]  # enough to find a key split across two chunks
+    else:
+        raise ValueError(f"Response has no {key!r} field")
+    for chunk in itertools.chain([head[match.end():]], chunks):
+        end = chunk.find(b'"')
+        if end >= 0:
+            yield chunk[:end]
+            return
+        yield chunk
+    raise ValueError(f"Response ended inside {key!r}")
+
+
+def _index():
+    private_dir(ATTACHMENTS_DIR)
+    conn = sqlite3.connect(private_file(os.path.join(ATTACHMENTS_DIR, 'index.sqlite')), timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parts (
+            message_id TEXT,
+            part_id TEXT,
+            sha256 TEXT,
+            size INTEGER,
+            PRIMARY KEY (message_id, part_id)
+        )
+    """)
+    return conn
+
+
+def lookup(message_id, part_id):
+    """Stored (sha256, path, size) for a message part, or None if not downloaded yet."""
+    conn = _index()
+    try:
+        row = conn.execute("SELECT sha256, size FROM parts WHERE message_id = ? AND part_id = ?",
+                           (message_id, part_id)).fetchone()
+    finally:
+        conn.close()
+    if row is None or not os.path.exists(blob_path(row[0])):
+        return None
+    return row[0], blob_path(row[0]), row[1]
+
+
+def remember(message_id, part_id, sha256, size):
+    """Record which file a message part was stored as."""
+    conn = _index()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO parts (message_id, part_id, sha256, size) VALUES (?, ?, ?, ?)",
+                         (message_id, part_id, sha256, size))
+    finally:
+        conn.close()
+
+
+def export_copy(path, output_dir, filename):
+    """
+    Copy a stored file into output_dir under its original name.
+
+    Returns:
+        The path written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.basename(filename) or os.path.basename(path)
+    target = os.path.join(output_dir, name)
+    root, ext = os.path.splitext(target)
+    n = 1
+    while os.path.exists(target):
+        target = f"{root} ({n}){ext}"
+        n += 1
+    # A copy, not a link: editing the exported file mustn't change the store
+    shutil.copyfile(path, target)
+    return target
@@ -2,21 +2,60 @@
 """
 Shared Google Workspace authentication module.
 Uses service account with domain-wide delegation for Gmail and Drive APIs.
+Access tokens are cached on disk per (user, scopes) and shared across runs.
+Discovery documents come from the copies bundled with googleapiclient (no
+network fetch), and built services are reused per (api, user) within a process.
+All services share one pooled keep-alive HTTP transport (HTTP/2 if httpx is installed).
+Every request goes through RequestHttp, which waits on a per-(api, user) quota
+token bucket, retries 429/5xx with backoff, asks for gzip and, when REQUEST_LOG
+is enabled (--profile / GOOGLE_PROFILE=1), records its size and time.
 """
+import contextlib
+import functools
+import json
 import os
+import random
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import parse_qs, urlsplit
+import google_auth_httplib2
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC
 
 # Path to service account key (relative to project root)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
 SERVICE_ACCOUNT_FILE = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'google-workspace', 'service-account-key.json')
+TOKEN_CACHE_FILE = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'google-workspace', 'token-cache.json')
+
+# Point every service at a local stand-in server instead of Google (e.g.
+# GOOGLE_API_ROOT=http://127.0.0.1:8765/ with gmail/mock_server.py). No real
+# credentials are loaded or sent then.
+API_ROOT_ENV = 'GOOGLE_API_ROOT'
+
+# A cached token is only reused with at least this many seconds left;
+# closer to expiry it's refreshed up front instead of failing mid-run
+TOKEN_REFRESH_MARGIN = 300
 
 # All scopes used by Google Workspace skills
 GMAIL_SCOPES = [
     'https://www.googleapis.com/auth/gmail.readonly',
     'https://www.googleapis.com/auth/gmail.compose'
 ]
+# Label changes (gmail.py modify) only; requested separately so read-only
+# setups that never granted it keep working
+GMAIL_MODIFY_SCOPES = [
+    'https://www.googleapis.com/auth/gmail.modify'
+]
 
 DRIVE_SCOPES = [
     'https://www.googleapis.com/auth/drive.readonly'
@@ -29,6 +68,477 @@ DOCS_SCOPES = [
 ALL_SCOPES = GMAIL_SCOPES + DRIVE_SCOPES + DOCS_SCOPES
 
 
+_token_lock = threading.Lock()
+_credentials_lock = threading.Lock()
+_credentials = {}
+# Services are built once per (api, version, user, scopes) and shared by all
+# threads (the pooled transport is thread-safe)
+_services_lock = threading.Lock()
+_services = {}
+
+
+# Per-user quotas as token buckets: (units per second, burst). Gmail allows 250
+# units/second per user; Drive 12,000 queries/minute; Docs 300 reads/minute.
+QUOTA_RATES = {
+    'gmail': (250, 250),
+    'drive': (200, 200),
+    'docs': (5, 300),
+}
+# Gmail quota units per method, matched on (HTTP method, path suffix); other
+# Gmail calls cost GMAIL_DEFAULT_COST and Drive/Docs calls cost 1
+GMAIL_COSTS = [
+    ('POST', re.compile(r'/messages/batch(Modify|Delete)$'), 50),
+    ('POST', re.compile(r'/messages/send$'), 100),
+    ('POST', re.compile(r'/drafts$'), 10),
+    ('GET', re.compile(r'/threads(/[^/]+)?$'), 10),
+    ('GET', re.compile(r'/history$'), 2),
+    ('GET', re.compile(r'/(labels|profile)$'), 1),
+]
+GMAIL_DEFAULT_COST = 5
+# Sub-requests inside a batch body ("GET /gmail/v1/users/me/messages/ID?... HTTP/1.1")
+BATCH_PART_RE = re.compile(rb'^(GET|POST|PUT|PATCH|DELETE) (\S+) HTTP/1\.1', re.MULTILINE)
+
+# Shared connection pool: hosts kept and connections per host. Sized for
+# --users fan-out x --parallel workers; extra threads wait for a free connection.
+POOL_HOSTS = 10
+POOL_MAXSIZE = 32
+
+# Bytes read per step when a response body is streamed
+STREAM_CHUNK = 64 * 1024
+
+# Retries of throttled/transient responses: exponential backoff (1, 2, 4, ... s
+# plus up to 1 s of jitter, capped at MAX_BACKOFF), or what Retry-After says
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+MAX_BACKOFF = 32
+# A 5xx doesn't say whether the request was carried out. Requests that end in
+# the same state when repeated are retried on it; others (drafts.create and
+# messages.send) only when throttled, so they're never doubled.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE'}
+IDEMPOTENT_POST_RE = re.compile(r'/(modify|batchModify|batchDelete|trash|untrash)$')
+
+
+class RequestLog:
+    """Per-request timing and response sizes, for profiling output, plus retry/throttle counters."""
+
+    def __init__(self):
+        self.enabled = os.environ.get('GOOGLE_PROFILE', '') not in ('', '0')
+        self.calls = []
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def record(self, method, uri, status, ms, response_bytes, encoding):
+        url = urlsplit(uri)
+        call = {
+            'method': method,
+            'path': url.path,
+            'status': status,
+            'ms': round(ms, 3),
+            'bytes': response_bytes,
+            'gzip': encoding == 'gzip',
+        }
+        fields = parse_qs(url.query).get('fields')
+        if fields:
+            call['fields'] = fields[0]
+        with self._lock:
+            self.calls.append(call)
+
+    def count_retry(self, delay):
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += delay
+
+    def count_throttle(self, delay):
+        with self._lock:
+            self.throttled += 1
+            self.throttle_wait += delay
+
+    def rate_report(self):
+        """Retries and time spent waiting on backoff and on the quota limiter."""
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'retryWaitMs': round(self.retry_wait * 1000, 3),
+                'throttled': self.throttled,
+                'throttleWaitMs': round(self.throttle_wait * 1000, 3),
+            }
+
+    def report(self):
+        """Totals, requests and bytes per HTTP method, and one entry per request (bytes are the decoded body)."""
+        with self._lock:
+            calls = list(self.calls)
+        by_method = {}
+        for call in calls:
+            totals = by_method.setdefault(call['method'], {'requests': 0, 'responseBytes': 0})
+            totals['requests'] += 1
+            totals['responseBytes'] += call['bytes']
+        return {
+            'totalMs': round((time.perf_counter() - self._start) * 1000, 3),
+            'requests': len(calls),
+            'responseBytes': sum(call['bytes'] for call in calls),
+            'byMethod': by_method,
+            **self.rate_report(),
+            'calls': calls,
+        }
+
+
+REQUEST_LOG = RequestLog()
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until the cost fits the rate."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost):
+        """
+        Take `cost` tokens now and return how long to wait before using them.
+
+        The balance may go negative, so concurrent callers queue up in order
+        instead of all waking at once. Async callers sleep on the result.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            REQUEST_LOG.count_throttle(wait)
+        return wait
+
+    def acquire(self, cost):
+        """
+        Take `cost` tokens, sleeping if the bucket is short.
+
+        Returns:
+            Seconds waited
+        """
+        wait = self.reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_limiters_lock = threading.Lock()
+_limiters = {}
+
+
+def get_limiter(api, user_email):
+    """The token bucket shared by every thread calling `api` as `user_email`."""
+    with _limiters_lock:
+        limiter = _limiters.get((api, user_email))
+        if limiter is None:
+            rate, capacity = QUOTA_RATES.get(api, (10, 10))
+            limiter = _limiters[(api, user_email)] = TokenBucket(rate, capacity)
+        return limiter
+
+
+def request_cost(api, method, uri, body=None):
+    """Quota units a request uses; a batch costs the sum of its parts."""
+    path = urlsplit(uri).path
+    if path.startswith('/batch') and body:
+        raw = body.encode() if isinstance(body, str) else body
+        return sum(request_cost(api, part_method.decode(), part_uri.decode())
+                   for part_method, part_uri in BATCH_PART_RE.findall(raw)) or 1
+    if api != 'gmail':
+        return 1
+    for cost_method, pattern, cost in GMAIL_COSTS:
+        if method == cost_method and pattern.search(path):
+            return cost
+    return GMAIL_DEFAULT_COST
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (0-based).
+
+    Honors a Retry-After value (seconds or HTTP date) when the server sent one.
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(retry_after)
+                return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    return min(MAX_BACKOFF, 2 ** attempt) + random.random()
+
+
+def is_idempotent(method, uri, body=None):
+    """Whether repeating a request is harmless; a batch is if all its parts are."""
+    path = urlsplit(uri).path
+    if path.startswith('/batch') and body:
+        raw = body.encode() if isinstance(body, str) else body
+        return all(is_idempotent(part_method.decode(), part_uri.decode())
+                   for part_method, part_uri in BATCH_PART_RE.findall(raw))
+    return method in IDEMPOTENT_METHODS or (method == 'POST' and bool(IDEMPOTENT_POST_RE.search(path)))
+
+
+def is_retryable(status, content=b'', idempotent=True):
+    """
+    Throttled: 429, or a 403 rate-limit error (Gmail and Drive send those too).
+    Transient 5xx errors count too, but only for idempotent requests.
+    """
+    if status == 429 or (idempotent and status in RETRYABLE_STATUSES):
+        return True
+    return status == 403 and b'ateLimitExceeded' in (content or b'')
+
+
+class PooledTransport:
+    """
+    One process-wide, thread-safe HTTP connection pool for all Google services.
+
+    Connections are kept alive and reused across services, APIs and threads,
+    so parallel modes don't pay a TLS handshake per worker. Uses HTTP/2 via
+    httpx when httpx and h2 are installed, otherwise a requests Session.
+    """
+
+    def __init__(self, max_connections=POOL_MAXSIZE):
+        # Imported here, not at module load, to keep startup fast
+        try:
+            import h2  # noqa: F401 - httpx needs it for http2=True
+            import httpx
+        except ImportError:
+            httpx = None
+        self.http2 = httpx is not None
+        if self.http2:
+            self.client = httpx.Client(http2=True, follow_redirects=True, limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections))
+        else:
+            import requests
+            import requests.adapters
+            self.client = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=max_connections)
+            self.client.mount('https://', adapter)
+            self.client.mount('http://', adapter)
+
+    def send(self, method, uri, body, headers, timeout):
+        """
+        Returns:
+            (status, headers with lower-case names, decoded body bytes)
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if self.http2:
+            response = self.client.request(method, uri, content=body, headers=headers, timeout=timeout)
+        else:
+            response = self.client.request(method, uri, data=body, headers=headers, timeout=timeout)
+        return response.status_code, {k.lower(): v for k, v in response.headers.items()}, response.content
+
+    @contextlib.contextmanager
+    def stream(self, method, uri, headers, timeout, chunk_size=STREAM_CHUNK):
+        """
+        Like send() for a body-less request, but the body is read as it's consumed.
+
+        Yields:
+            (status, headers with lower-case names, iterator of decoded body chunks)
+        """
+        if self.http2:
+            with self.client.stream(method, uri, headers=headers, timeout=timeout) as response:
+                yield (response.status_code, {k.lower(): v for k, v in response.headers.items()},
+                       response.iter_bytes(chunk_size))
+        else:
+            response = self.client.request(method, uri, headers=headers, timeout=timeout, stream=True)
+            try:
+                yield (response.status_code, {k.lower(): v for k, v in response.headers.items()},
+                       response.iter_content(chunk_size))
+            finally:
+                response.close()
+
+
+_transport_lock = threading.Lock()
+_transport = None
+
+
+def get_transport():
+    """The shared PooledTransport, created on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = PooledTransport()
+        return _transport
+
+
+class RequestHttp:
+    """
+    httplib2.Http stand-in for one (api, user), sending over the shared pool:
+    waits on the quota limiter before each request, retries throttled/transient
+    responses with backoff, always asks for gzip, and logs requests to REQUEST_LOG.
+    Thread-safe, so one service object serves every thread.
+    """
+
+    def __init__(self, api=None, user_email=None):
+        self.timeout = socket.getdefaulttimeout() or DEFAULT_HTTP_TIMEOUT_SEC
+        # Attributes google_auth_httplib2.AuthorizedHttp proxies to httplib2
+        self.follow_redirects = True
+        self.redirect_codes = {300, 301, 302, 303, 307}
+        self.connections = {}
+        self.api = api
+        self.limiter = get_limiter(api, user_email) if api else None
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        headers = dict(headers or {})
+        headers.setdefault('accept-encoding', 'gzip, deflate')
+        cost = request_cost(self.api, method, uri, body) if self.limiter else 0
+        idempotent = is_idempotent(method, uri, body)
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire(cost)
+            start = time.perf_counter()
+            status, response_headers, content = get_transport().send(method, uri, body, headers, self.timeout)
+            # Same shape httplib2 gives: body already decoded, original encoding kept aside
+            encoding = response_headers.pop('content-encoding', None)
+            if encoding:
+                response_headers['-content-encoding'] = encoding
+                response_headers['content-length'] = str(len(content))
+            response = httplib2.Response({**response_headers, 'status': str(status)})
+            if REQUEST_LOG.enabled:
+                REQUEST_LOG.record(method, uri, status, (time.perf_counter() - start) * 1000,
+                                   len(content), encoding)
+            if attempt >= MAX_RETRIES or not is_retryable(status, content, idempotent):
+                return response, content
+            delay = backoff_delay(attempt, response.get('retry-after'))
+            REQUEST_LOG.count_retry(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    @contextlib.contextmanager
+    def stream(self, uri, method='GET', headers=None):
+        """
+        request() for a large body-less request: same pacing, retries and
+        logging, but the body is read in chunks as the caller consumes it.
+
+        Yields:
+            (httplib2.Response, iterator of decoded body chunks)
+        """
+        headers = dict(headers or {})
+        headers.setdefault('accept-encoding', 'gzip, deflate')
+        cost = request_cost(self.api, method, uri) if self.limiter else 0
+        idempotent = is_idempotent(method, uri)
+        attempt = 0
+        while True:
+            if self.limiter:
+                self.limiter.acquire(cost)
+            start = time.perf_counter()
+            with get_transport().stream(method, uri, headers, self.timeout) as (status, response_headers, chunks):
+                encoding = response_headers.pop('content-encoding', None)
+                if encoding:
+                    response_headers['-content-encoding'] = encoding
+                    response_headers.pop('content-length', None)
+                response = httplib2.Response({**response_headers, 'status': str(status)})
+                if status >= 300:
+                    # Error bodies are small: read them, to retry or report like request() does
+                    chunks = [b''.join(chunks)]
+                if status < 300 or attempt >= MAX_RETRIES or not is_retryable(status, chunks[0], idempotent):
+                    received = []
+                    try:
+                        yield response, _counted(chunks, received)
+                    finally:
+                        if REQUEST_LOG.enabled:
+                            REQUEST_LOG.record(method, uri, status, (time.perf_counter() - start) * 1000,
+                                               sum(received), encoding)
+                    return
+            if REQUEST_LOG.enabled:
+                REQUEST_LOG.record(method, uri, status, (time.perf_counter() - start) * 1000,
+                                   len(chunks[0]), encoding)
+            delay = backoff_delay(attempt, response.get('retry-after'))
+            REQUEST_LOG.count_retry(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        # The pool outlives any one service
+        pass
+
+
+def _counted(chunks, sizes):
+    for chunk in chunks:
+        sizes.append(len(chunk))
+        yield chunk
+
+
+@contextlib.contextmanager
+def open_stream(request):
+    """
+    Send a googleapiclient HttpRequest and stream its response body, instead
+    of execute() reading it into memory. Same credentials, quota pacing,
+    retries and request log as execute().
+
+    Args:
+        request: HttpRequest from a get_service() service (body-less, e.g. a GET)
+
+    Yields:
+        Iterator of decoded body chunks
+    Raises:
+        HttpError for an error response
+    """
+    authorized = request.http
+    headers = dict(request.headers)
+    authorized.credentials.before_request(google_auth_httplib2.Request(authorized.http),
+                                          request.method, request.uri, headers)
+    with authorized.http.stream(request.uri, request.method, headers) as (response, chunks):
+        if response.status >= 300:
+            raise HttpError(response, b''.join(chunks), uri=request.uri)
+        yield chunks
+
+
+def _token_key(subject, scopes):
+    return f"{subject} {' '.join(sorted(scopes))}"
+
+
+def _load_token_cache():
+    try:
+        with open(TOKEN_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_token(key, token, expiry):
+    """Write a token to the cache file (0600, atomic replace, expired entries dropped)."""
+    expires_at = expiry.replace(tzinfo=timezone.utc).timestamp()
+    with _token_lock:
+        now = time.time()
+        cache = {k: v for k, v in _load_token_cache().items() if v.get('expiry', 0) > now}
+        cache[key] = {'token': token, 'expiry': expires_at}
+        os.makedirs(os.path.dirname(TOKEN_CACHE_FILE), exist_ok=True)
+        tmp_path = f"{TOKEN_CACHE_FILE}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, TOKEN_CACHE_FILE)
+
+
+class CachedCredentials(service_account.Credentials):
+    """Service account credentials that save every refreshed token to TOKEN_CACHE_FILE."""
+
+    def refresh(self, request):
+        super().refresh(request)
+        try:
+            _save_token(_token_key(self._subject, self._scopes or []), self.token, self.expiry)
+        except OSError:
+            pass  # the cache is an optimization; the fresh token is still usable
+
+
+@functools.lru_cache(maxsize=1)
+def _service_account_info():
+    with open(SERVICE_ACCOUNT_FILE) as f:
+        return json.load(f)
+
+
 def get_credentials(user_email, scopes=None):
     """
     Get delegated credentials for a specific user.
@@ -53,23 +563,80 @@ def get_credentials(user_email, scopes=None):
             "See skills/google-workspace/README.md for setup instructions."
         )
     
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=scopes)
-    return credentials.with_subject(user_email)
+    credentials = CachedCredentials.from_service_account_info(
+        _service_account_info(), scopes=scopes).with_subject(user_email)
+    
+    # Reuse a token from an earlier run if it isn't about to expire
+    cached = _load_token_cache().get(_token_key(user_email, scopes))
+    if cached and cached.get('expiry', 0) - time.time() > TOKEN_REFRESH_MARGIN:
+        credentials.token = cached['token']
+        # google-auth compares expiry as naive UTC
+        credentials.expiry = datetime.fromtimestamp(cached['expiry'], timezone.utc).replace(tzinfo=None)
+    return credentials
+
+
+@functools.lru_cache(maxsize=None)
+def get_discovery_document(api, version):
+    """
+    Discovery document pinned by the installed googleapiclient, parsed once per process.
+    
+    Raises:
+        ValueError: If the library doesn't bundle this API version
+    """
+    document = get_static_doc(api, version)
+    if document is None:
+        raise ValueError(f"No bundled discovery document for {api} {version}")
+    return json.loads(document)
+
+
+def get_service(api, version, user_email, scopes):
+    """
+    Get an API service for a user, built once per process and shared by all threads.
+    
+    Args:
+        api: API name (e.g. 'gmail')
+        version: API version (e.g. 'v1')
+        user_email: Email address to impersonate
+        scopes: OAuth scopes for the credentials
+    
+    Returns:
+        API service object
+    """
+    root = os.environ.get(API_ROOT_ENV)
+    key = (api, version, user_email, tuple(scopes), root)
+    service = _services.get(key)
+    if service is None:
+        document = get_discovery_document(api, version)
+        if root:
+            credentials = AnonymousCredentials()
+            document = dict(document, rootUrl=root.rstrip('/') + '/')
+        else:
+            # Credentials (and their token) are shared by every service for this user
+            with _credentials_lock:
+                credentials_key = (user_email, tuple(scopes))
+                credentials = _credentials.get(credentials_key)
+                if credentials is None:
+                    credentials = _credentials[credentials_key] = get_credentials(user_email, scopes)
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=RequestHttp(api, user_email))
+        built = build_from_document(document, http=http)
+        # Two threads may race to build the same service; both then use the first
+        with _services_lock:
+            service = _services.setdefault(key, built)
+    return service
 
 
-def get_gmail_service(user_email):
+def get_gmail_service(user_email, scopes=None):
     """
     Get Gmail API service for a specific user.
     
     Args:
         user_email: Email address to impersonate
+        scopes: OAuth scopes (default: GMAIL_SCOPES)
     
     Returns:
         Gmail API service object
     """
-    credentials = get_credentials(user_email, GMAIL_SCOPES)
-    return build('gmail', 'v1', credentials=credentials)
+    return get_service('gmail', 'v1', user_email, scopes or GMAIL_SCOPES)
 
 
 def get_drive_service(user_email):
@@ -82,8 +649,7 @@ def get_drive_service(user_email):
     Returns:
         Drive API service object
     """
-    credentials = get_credentials(user_email, DRIVE_SCOPES)
-    return build('drive', 'v3', credentials=credentials)
+    return get_service('drive', 'v3', user_email, DRIVE_SCOPES)
 
 
 def get_docs_service(user_email):
@@ -96,6 +662,5 @@ def get_docs_service(user_email):
     Returns:
         Docs API service object
     """
-    credentials = get_credentials(user_email, DOCS_SCOPES)
-    return build('docs', 'v1', credentials=credentials)
+    return get_service('docs', 'v1', user_email, DOCS_SCOPES)
 
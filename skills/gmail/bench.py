@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Google Workspace skills. No network or service account needed.
+
+Usage:
+    bench.py startup [--runs 5]
+    bench.py api [--count 200] [--workers 8] [--latency-ms 20] [--fault-rate 0] [--quota]
+
+startup: process import time for gmail.py, and the cost of getting a service
+object three ways - googleapiclient's build() (what every call used to do),
+the first get_service() call (pinned discovery doc, parsed once), and later
+get_service() calls (memoized per api/user).
+
+api: throughput and latency of list, get (Gmail), read (Drive) and read-doc
+(Docs) against mock_server.py, run in its own process with the given latency
+and 429 rate. Each operation runs three ways - one call at a time (what a CLI
+invocation does; list uses batched metadata), a thread pool over the shared
+services (list: parallel date shards), and async_client.py with every call in
+flight at once (skipped with a note when httpx isn't installed). Quotas are
+lifted unless --quota is given, so the numbers show the clients rather than
+the token buckets. Async modes time the API calls and JSON decoding only, not
+the CLIs' result formatting.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIVE_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'google-drive')
+sys.path.insert(0, SCRIPT_DIR)
+
+APIS = [('gmail', 'v1'), ('drive', 'v3'), ('docs', 'v1')]
+API_OPS = ['list', 'get', 'read', 'read-doc']
+BENCH_USER = 'bench@example.com'
+
+
+def _timed(fn, runs):
+    """Median wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 4)
+
+
+def bench_startup(runs=5):
+    """Import time and service construction cost per API."""
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+    import auth
+
+    # Stand-in credentials so no key file or token exchange is involved
+    auth.get_credentials = lambda user_email, scopes=None: AnonymousCredentials()
+
+    import_ms = _timed(lambda: subprocess.run(
+        [sys.executable, '-c', 'import gmail'], cwd=SCRIPT_DIR, check=True), runs)
+
+    services = {}
+    for api, version in APIS:
+        build_ms = _timed(lambda: build(api, version, credentials=AnonymousCredentials(),
+                                        static_discovery=True), runs)
+        auth.get_discovery_document.cache_clear()
+        start = time.perf_counter()
+        auth.get_service(api, version, 'bench@example.com', [])
+        first_ms = (time.perf_counter() - start) * 1000
+        # Memo hits are too fast for one sample; time a loop instead
+        loops = 10000
+        start = time.perf_counter()
+        for _ in range(loops):
+            auth.get_service(api, version, 'bench@example.com', [])
+        cached_us = (time.perf_counter() - start) / loops * 1e6
+        services[api] = {
+            'buildMs': build_ms,
+            'firstGetServiceMs': round(first_ms, 4),
+            'cachedGetServiceUs': round(cached_us, 4),
+        }
+
+    return {'runs': runs, 'importGmailMs': import_ms, 'services': services}
+
+
+def _call_ms(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+async def _acall_ms(coro_fn, *args):
+    start = time.perf_counter()
+    await coro_fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def _server_stats(url):
+    from urllib.request import urlopen
+    from mock_server import STATS_PATH
+    with urlopen(url.rstrip('/') + STATS_PATH) as response:
+        return json.loads(response.read())
+
+
+def _measure(url, run):
+    """
+    Run one benchmark mode.
+
+    Args:
+        url: The mock server, for its request counters
+        run: Callable returning per-call latencies in milliseconds
+
+    Returns:
+        Dict with calls, HTTP requests and API calls seen by the server,
+        retries, total time, rate and p50/p95 latency
+    """
+    from auth import REQUEST_LOG
+    before, retries = _server_stats(url), REQUEST_LOG.retries
+    start = time.perf_counter()
+    latencies = sorted(run())
+    total = time.perf_counter() - start
+    after = _server_stats(url)
+    return {
+        'calls': len(latencies),
+        'httpRequests': after['requests'] - before['requests'],
+        'apiCalls': after['calls'] - before['calls'],
+        'retries': REQUEST_LOG.retries - retries,
+        'totalMs': round(total * 1000, 1),
+        'callsPerSec': round(len(latencies) / total, 1),
+        'p50Ms': round(latencies[len(latencies) // 2], 2),
+        'p95Ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+    }
+
+
+def _has_httpx():
+    """Whether the async mode can run: it measures async_client.py on httpx, not its threaded fallback."""
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _modes(url, items, sync_fn, async_fn, workers, with_async=True):
+    """sync / threads / async results for one operation over items."""
+
+    async def run_async():
+        from async_client import AsyncGoogleClient
+
+        async with AsyncGoogleClient() as client:
+            return await asyncio.gather(*(_acall_ms(async_fn, client, item) for item in items))
+
+    def run_threads():
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda item: _call_ms(sync_fn, item), items))
+
+    results = {
+        'sync': _measure(url, lambda: [_call_ms(sync_fn, item) for item in items]),
+        'threads': _measure(url, run_threads),
+    }
+    if with_async:
+        results['async'] = _measure(url, lambda: asyncio.run(run_async()))
+    return results
+
+
+def bench_api(ops=API_OPS, messages=2000, files=100, count=200, workers=8, latency_ms=20,
+              fault_rate=0.0, quota=False, seed=1):
+    """list/get/read/read-doc throughput and latency per client mode, against the mock server."""
+    import auth
+    from mock_server import GOOGLE_DOC_MIME, Dataset
+
+    with_async = _has_httpx()
+    if not with_async:
+        print('httpx is not installed: skipping the async mode (pip install "httpx[http2]")', file=sys.stderr)
+    if not quota:
+        for api in list(auth.QUOTA_RATES):
+            auth.QUOTA_RATES[api] = (1e9, 1e9)
+    # Its own process, so serving doesn't compete with the clients for the GIL
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPT_DIR, 'mock_server.py'), '--port', '0', '--messages', str(messages),
+         '--files', str(files), '--latency-ms', str(latency_ms), '--fault-rate', str(fault_rate), '--seed', str(seed)],
+        stdout=subprocess.PIPE, text=True)
+    url = json.loads(server.stdout.readline())['url']
+    os.environ[auth.API_ROOT_ENV] = url
+    # Same seed, same data: only used to pick IDs
+    dataset = Dataset(messages, files, seed=seed)
+    sys.path.insert(1, DRIVE_DIR)
+    import gmail
+    import drive
+
+    oldest = int(dataset.messages[dataset.order[-1]]['internalDate']) // 1000
+    query = f'after:{oldest}'
+    message_ids = dataset.order[:count]
+    readable = [i for i in dataset.file_order
+                if dataset.files[i]['mimeType'] in drive.EXPORT_FORMATS
+                or dataset.files[i]['mimeType'].startswith('text/')]
+    docs = [i for i in dataset.file_order if dataset.files[i]['mimeType'] == GOOGLE_DOC_MIME]
+    read_ids = [readable[n % len(readable)] for n in range(count)]
+    doc_ids = [docs[n % len(docs)] for n in range(count)]
+
+    async def async_list(client):
+        stubs = [stub async for stub in client.iter_message_ids(BENCH_USER, query, messages)]
+        return await asyncio.gather(*(client.get_message(
+            BENCH_USER, stub['id'], format='metadata', metadata_headers=gmail.METADATA_HEADERS,
+            fields=gmail.METADATA_FIELDS) for stub in stubs))
+
+    async def async_get(client, message_id):
+        gmail.parse_message(await client.get_message(BENCH_USER, message_id, fields=gmail.FULL_FIELDS))
+
+    async def async_read(client, file_id):
+        meta = await client.get_file(BENCH_USER, file_id)
+        export = drive.EXPORT_FORMATS.get(meta['mimeType'])
+        if export:
+            await client.export_file(BENCH_USER, file_id, export)
+        else:
+            await client.get_media(BENCH_USER, file_id)
+
+    async def async_read_doc(client, file_id):
+        await asyncio.gather(client.get_document(BENCH_USER, file_id, fields=drive.DOC_TEXT_FIELDS),
+                             client.get_file(BENCH_USER, file_id, fields='id, name, modifiedTime, webViewLink'))
+
+    def run_async_list():
+        from async_client import AsyncGoogleClient
+
+        async def run():
+            async with AsyncGoogleClient() as client:
+                start = time.perf_counter()
+                await async_list(client)
+                return [(time.perf_counter() - start) * 1000]
+        return asyncio.run(run())
+
+    results = {}
+    try:
+        if 'list' in ops:
+            # One call listing the whole mailbox; latency is that call's wall time
+            results['list'] = {
+                'sync': _measure(url, lambda: [_call_ms(gmail.list_messages, BENCH_USER, query, messages)]),
+                'threads': _measure(url, lambda: [_call_ms(
+                    lambda: gmail.list_messages(BENCH_USER, query, messages, workers=workers))]),
+            }
+            if with_async:
+                results['list']['async'] = _measure(url, run_async_list)
+        if 'get' in ops:
+            results['get'] = _modes(url, message_ids,
+                                    lambda i: gmail.get_message(BENCH_USER, i, use_cache=False),
+                                    async_get, workers, with_async)
+        if 'read' in ops:
+            results['read'] = _modes(url, read_ids, lambda i: drive.read_file(BENCH_USER, i),
+                                     async_read, workers, with_async)
+        if 'read-doc' in ops:
+            results['read-doc'] = _modes(url, doc_ids, lambda i: drive.read_google_doc(BENCH_USER, i),
+                                         async_read_doc, workers, with_async)
+        faults = _server_stats(url)['faults']
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'messages': messages, 'files': files, 'count': count, 'workers': workers, 'latencyMs': latency_ms,
+        'faultRate': fault_rate, 'quota': quota, 'faults': faults, 'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Google Workspace skills benchmarks')
+    subparsers = parser.add_subparsers(dest='command', help='Benchmark to run')
+
+    startup_parser = subparsers.add_parser('startup', help='Import time and service construction')
+    startup_parser.add_argument('--runs', type=int, default=5, help='Samples per measurement (default: 5)')
+
+    api_parser = subparsers.add_parser('api', help='list/get/read/read-doc against the local mock server')
+    api_parser.add_argument('--ops', default=','.join(API_OPS),
+                            help=f"Comma-separated operations (default: {','.join(API_OPS)})")
+    api_parser.add_argument('--messages', type=int, default=2000, help='Mailbox size; list reads all of it (default: 2000)')
+    api_parser.add_argument('--files', type=int, default=100, help='Drive size (default: 100)')
+    api_parser.add_argument('--count', type=int, default=200, help='Calls per get/read/read-doc mode (default: 200)')
+    api_parser.add_argument('--workers', type=int, default=8, help='Threads for the threads mode (default: 8)')
+    api_parser.add_argument('--latency-ms', type=float, default=20, help='Server latency per request (default: 20)')
+    api_parser.add_argument('--fault-rate', type=float, default=0, help='Fraction of requests answered 429 (default: 0)')
+    api_parser.add_argument('--quota', action='store_true', help='Keep the real per-user quota pacing')
+    api_parser.add_argument('--seed', type=int, default=1, help='Seed for data and faults (default: 1)')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    if args.command == 'startup':
+        print(json.dumps(bench_startup(args.runs), indent=2))
+    elif args.command == 'api':
+        ops = [op.strip() for op in args.ops.split(',') if op.strip()]
+        unknown = set(ops) - set(API_OPS)
+        if unknown:
+            print(json.dumps({'error': f"Unknown operations: {', '.join(sorted(unknown))}"}), file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(bench_api(ops, args.messages, args.files, args.count, args.workers, args.latency_ms,
+                                   args.fault_rate, args.quota, args.seed), indent=2))
+
+
+if __name__ == '__main__':
+    main()
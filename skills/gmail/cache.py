@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of fetched Gmail messages for `get`.
+
+A message's content never changes after delivery (only its labels do), so
+`get` keeps what it downloads: the format='full' resource, zlib-compressed,
+and the decoded `get` result once the whole body has been read. A repeat read
+is then one cheap format='minimal' call for fresh labels. One database per
+mailbox under user/skills-data/gmail/cache/, kept under MAX_CACHE_BYTES by
+evicting the least recently read messages.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+from storage import private_dir, private_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'gmail', 'cache')
+
+# Per mailbox. Eviction trims to EVICT_TO of this, so it doesn't run on every put.
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+EVICT_TO = 0.9
+
+# `get` fields that depend on the requested window or change over time
+VOLATILE_FIELDS = ('offsetChars', 'returnedChars', 'truncated', 'labels')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    raw BLOB,
+    parsed TEXT,
+    size INTEGER,
+    accessed REAL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_accessed ON messages(accessed);
+"""
+
+
+def cache_path(user_email):
+    """Database path for a mailbox."""
+    safe = re.sub(r'[^A-Za-z0-9@._-]', '_', user_email)
+    return os.path.join(CACHE_DIR, f'{safe}.sqlite')
+
+
+class MessageCache:
+    """A mailbox's message cache. Use MessageCache.open(); one per thread."""
+
+    def __init__(self, path, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    @classmethod
+    def open(cls, user_email, max_bytes=MAX_CACHE_BYTES):
+        """Open the cache for a mailbox, creating it (owner-only) if needed."""
+        private_dir(CACHE_DIR)
+        return cls(private_file(cache_path(user_email)), max_bytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, message_id):
+        """
+        A cached message, marking it recently used.
+
+        Returns:
+            (raw, parsed) - the format='full' resource and the decoded `get`
+            result without window/label fields (None until the whole body has
+            been decoded once) - or None if the message isn't cached
+        """
+        row = self.conn.execute("SELECT raw, parsed FROM messages WHERE id = ?", (message_id,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE messages SET accessed = ? WHERE id = ?", (time.time(), message_id))
+        raw = json.loads(zlib.decompress(row[0]))
+        return raw, json.loads(row[1]) if row[1] is not None else None
+
+    def missing(self, message_ids):
+        """The IDs (in order) that aren't cached yet."""
+        cached = set()
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            cached.update(row[0] for row in self.conn.execute(
+                f"SELECT id FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return [message_id for message_id in message_ids if message_id not in cached]
+
+    def put(self, message, parsed=None):
+        """
+        Cache a format='full' message resource, and its decoded result if complete.
+
+        Args:
+            message: Resource from messages.get(format='full')
+            parsed: parse_message() output for the whole body (offset 0, not truncated)
+        """
+        raw = zlib.compress(json.dumps(message, separators=(',', ':')).encode())
+        parsed_json = self._parsed_json(parsed)
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO messages (id, raw, parsed, size, accessed) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    raw = excluded.raw,
+                    parsed = COALESCE(excluded.parsed, messages.parsed),
+                    size = length(excluded.raw) + length(COALESCE(excluded.parsed, messages.parsed, '')),
+                    accessed = excluded.accessed
+            """, (message['id'], raw, parsed_json, len(raw) + len(parsed_json or ''), time.time()))
+        self.evict()
+
+    def set_parsed(self, message_id, parsed):
+        """Add the decoded result to an already cached message."""
+        parsed_json = self._parsed_json(parsed)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE messages SET parsed = ?, size = length(raw) + ? WHERE id = ?",
+                (parsed_json, len(parsed_json), message_id))
+        self.evict()
+
+    def delete(self, message_id):
+        """Drop a message (e.g. deleted from the mailbox)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+
+    def size(self):
+        """Bytes of cached content."""
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0]
+
+    def evict(self):
+        """
+        Drop least recently read messages until under EVICT_TO of max_bytes.
+
+        Returns:
+            Number of messages evicted
+        """
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        target = total - int(self.max_bytes * EVICT_TO)
+        doomed, freed = [], 0
+        for message_id, size in self.conn.execute("SELECT id, size FROM messages ORDER BY accessed"):
+            if freed >= target:
+                break
+            doomed.append((message_id,))
+            freed += size
+        with self.conn:
+            self.conn.executemany("DELETE FROM messages WHERE id = ?", doomed)
+        return len(doomed)
+
+    @staticmethod
+    def _parsed_json(parsed):
+        if parsed is None:
+            return None
+        return json.dumps({k: v for k, v in parsed.items() if k not in VOLATILE_FIELDS})
@@ -1,22 +1,196 @@
 #!/usr/bin/env python3
 """
 Gmail API wrapper using service account with domain-wide delegation.
-Supports reading emails and creating drafts.
+Supports reading emails and creating drafts, plus a local mirror (see mirror.py).
 """
 import os
 import sys
 import json
 import argparse
+import atexit
 import base64
+import re
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.mime.text import MIMEText
 from googleapiclient.errors import HttpError
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from auth import get_gmail_service
+from auth import (GMAIL_MODIFY_SCOPES, MAX_RETRIES, REQUEST_LOG, backoff_delay, get_gmail_service,
+                  is_idempotent, is_retryable, open_stream)
+from mirror import Mirror, parse_date
+from cache import MessageCache
+from mime import collapse_thread, find_body_part, iter_part_text, read_window, walk_parts, window_text
+import attachments
 
+# messages.get costs 5 quota units and the per-user limit is 250 units/second,
+# so 50 calls is the largest batch that doesn't trip rateLimitExceeded.
+METADATA_BATCH_SIZE = 50
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date']
+# messages.list returns at most 500 stubs per page
+LIST_PAGE_SIZE = 500
+# fields= projections: only what the output uses comes over the wire
+LIST_FIELDS = 'messages(id,threadId),nextPageToken'
+METADATA_FIELDS = 'id,threadId,snippet,internalDate,payload/headers'
+FULL_FIELDS = 'id,threadId,labelIds,snippet,internalDate,payload'
+THREAD_FIELDS = f'id,historyId,messages({FULL_FIELDS})'
+HISTORY_FIELDS = ('history(messagesAdded/message/id,messagesDeleted/message/id,'
+                  'labelsAdded/message(id,labelIds),labelsRemoved/message(id,labelIds)),historyId,nextPageToken')
+LABEL_FIELDS = 'labels(id,name)'
+DRAFT_FIELDS = 'id,message(id,threadId)'
+# Date-sharded parallel listing: workers and shards per worker by default.
+# Each worker lists and hydrates its own shard; four stay under the per-user quota.
+PARALLEL_WORKERS = 4
+SHARDS_PER_WORKER = 4
+DATE_TERM_RE = re.compile(r'(?<!\S)(after|before):(\S+)', re.IGNORECASE)
+# Mailboxes searched at once by --users/--users-file. Quota is per user, so
+# mailboxes don't slow each other down; this only bounds threads and sockets.
+FANOUT_WORKERS = 8
+FANOUT_COMMANDS = ('list', 'search-local')
+# list --prefetch with no count: bodies of this many top results are cached
+PREFETCH_COUNT = 10
+# batchModify takes at most 1000 IDs per call; modify stops after MODIFY_MAX_MESSAGES
+# matches unless --max-messages says otherwise
+MODIFY_BATCH_SIZE = 1000
+MODIFY_MAX_MESSAGES = 100000
+SYSTEM_LABELS = {'INBOX', 'UNREAD', 'STARRED', 'IMPORTANT', 'SPAM', 'TRASH',
+                 'CATEGORY_PERSONAL', 'CATEGORY_SOCIAL', 'CATEGORY_PROMOTIONS', 'CATEGORY_UPDATES', 'CATEGORY_FORUMS'}
+# drafts.create costs 10 quota units, so 25 per batch stays under 250 units/second
+DRAFT_BATCH_SIZE = 25
+DRAFT_WORKERS = 4
+# Parallel attachment downloads per message
+ATTACHMENT_WORKERS = 4
+# First sync of a mailbox stops after this many (newest) messages
+SYNC_MAX_MESSAGES = 2000
+# list/get only read a mirror synced at most this many seconds ago
+MIRROR_MAX_AGE = 3600
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
 
-def list_messages(user_email, query=None, max_results=10):
+
+def message_summary(message):
+    """Summary fields for a message fetched with format='metadata'."""
+    headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
+    return {
+        'id': message['id'],
+        'threadId': message['threadId'],
+        'snippet': message.get('snippet', ''),
+        'from': headers.get('From', ''),
+        'to': headers.get('To', ''),
+        'subject': headers.get('Subject', ''),
+        'date': headers.get('Date', ''),
+        'internalDate': message.get('internalDate', '')
+    }
+
+
+def batch_get_messages(service, message_ids, **params):
+    """
+    Run messages.get for many IDs using batch HTTP requests.
+    
+    Args:
+        service: Gmail API service
+        message_ids: Message IDs to fetch
+        **params: Extra messages.get parameters (format, metadataHeaders, ...)
+    
+    Returns:
+        One entry per ID, in order: the message dict, or the exception if it
+        still failed after retrying throttled/transient errors.
+    """
+    return execute_batch(
+        service,
+        lambda i: service.users().messages().get(userId='me', id=message_ids[i], **params),
+        len(message_ids)
+    )
+
+
+def execute_batch(service, make_request, count, batch_size=METADATA_BATCH_SIZE):
+    """
+    Run `count` API calls as batch HTTP requests of batch_size.
+    
+    Args:
+        service: API service
+        make_request: Callable(index) → HttpRequest (called again on retry)
+        count: Number of calls
+        batch_size: Calls per batch (keep calls x quota cost under the per-user rate)
+    
+    Returns:
+        One entry per index, in order: the response, or the exception if it
+        still failed after retrying throttled/transient errors.
+    """
+    responses = {}
+    idempotent = {}
+
+    def callback(request_id, response, exception):
+        responses[int(request_id)] = exception if exception is not None else response
+
+    def run_batches(indexes):
+        for start in range(0, len(indexes), batch_size):
+            batch = service.new_batch_http_request(callback=callback)
+            for i in indexes[start:start + batch_size]:
+                request = make_request(i)
+                idempotent[i] = is_idempotent(request.method, request.uri)
+                batch.add(request, request_id=str(i))
+            batch.execute()
+
+    run_batches(list(range(count)))
+
+    # The batch itself is retried by the transport; throttled/transient parts
+    # are retried here, with the same backoff (5xx only for idempotent calls)
+    for attempt in range(MAX_RETRIES):
+        retry = [i for i, r in sorted(responses.items())
+                 if isinstance(r, HttpError) and is_retryable(r.resp.status, r.content, idempotent[i])]
+        if not retry:
+            break
+        delay = backoff_delay(attempt, responses[retry[0]].resp.get('retry-after'))
+        REQUEST_LOG.count_retry(delay)
+        time.sleep(delay)
+        run_batches(retry)
+
+    return [responses.get(i, Exception('No response in batch')) for i in range(count)]
+
+
+def batch_error(error):
+    """Error text for a failed call inside a batch."""
+    if isinstance(error, HttpError):
+        return f"Gmail API error: {error.resp.status} - {error.content.decode(errors='replace')}"
+    return str(error)
+
+
+def fetch_metadata(service, messages):
+    """
+    Fetch metadata for listed messages using batch HTTP requests.
+    
+    Args:
+        service: Gmail API service
+        messages: Message stubs from messages.list ({'id', 'threadId'})
+    
+    Returns:
+        Summaries in the same order as `messages`. A message that still fails
+        after retries comes back as {'id', 'threadId', 'error'}.
+    """
+    responses = batch_get_messages(
+        service,
+        [stub['id'] for stub in messages],
+        format='metadata',
+        metadataHeaders=METADATA_HEADERS,
+        fields=METADATA_FIELDS
+    )
+    message_list = []
+    for stub, response in zip(messages, responses):
+        if isinstance(response, Exception):
+            message_list.append({
+                'id': stub['id'],
+                'threadId': stub.get('threadId', ''),
+                'error': batch_error(response)
+            })
+        else:
+            message_list.append(message_summary(response))
+    return message_list
+
+
+def list_messages(user_email, query=None, max_results=10, workers=None, shards=None, prefetch=0):
     """
     List messages for a user.
     
@@ -24,118 +198,742 @@ def list_messages(user_email, query=None, max_results=10):
         user_email: Email address to impersonate
         query: Gmail search query (e.g., "from:example@domain.com", "subject:test")
         max_results: Maximum number of results to return
+        workers: List date shards of the query's after:/before: window in
+            parallel on this many workers (None = one sequential pager)
+        shards: Number of date shards (default: workers * SHARDS_PER_WORKER)
+        prefetch: Cache the full bodies of this many top results in a
+            background process (see start_prefetch)
     
     Returns:
         List of message summaries with id, threadId, snippet
     """
     try:
-        service = get_gmail_service(user_email)
-        results = service.users().messages().list(
+        if workers:
+            result = list(iter_messages_parallel(user_email, query, max_results, workers, shards))
+        else:
+            result = list(iter_messages(user_email, query, max_results))
+        if prefetch:
+            start_prefetch(user_email, [m['id'] for m in result[:prefetch] if 'error' not in m])
+        return result
+    
+    except HttpError as error:
+        raise Exception(f"Gmail API error listing messages: {error.resp.status} - {error.content.decode()}")
+    except Exception as e:
+        raise Exception(f"Error listing messages: {str(e)}")
+
+
+def stream_messages(user_email, query=None, max_results=10, out=sys.stdout, workers=None, shards=None,
+                    prefetch=0):
+    """
+    Write message summaries as NDJSON while pages are still being fetched.
+    
+    Args:
+        user_email: Email address to impersonate
+        query: Gmail search query
+        max_results: Maximum number of results to return
+        out: Text stream to write to
+        workers, shards: Parallel date-sharded listing (see list_messages)
+        prefetch: Cache the full bodies of this many top results in the
+            background, starting as soon as they've been listed
+    
+    Returns:
+        Number of messages written
+    """
+    count = 0
+    top_ids = []
+    if workers:
+        messages = iter_messages_parallel(user_email, query, max_results, workers, shards)
+    else:
+        messages = iter_messages(user_email, query, max_results)
+    try:
+        for message in messages:
+            out.write(json.dumps(message) + '\n')
+            out.flush()
+            count += 1
+            if count <= prefetch and 'error' not in message:
+                top_ids.append(message['id'])
+            if count == prefetch:
+                start_prefetch(user_email, top_ids)
+        if 0 < count < prefetch:
+            start_prefetch(user_email, top_ids)
+        return count
+    
+    except HttpError as error:
+        raise Exception(f"Gmail API error listing messages: {error.resp.status} - {error.content.decode()}")
+    except Exception as e:
+        raise Exception(f"Error listing messages: {str(e)}")
+
+
+def iter_messages(user_email, query=None, max_results=10):
+    """
+    Yield message summaries across as many list pages as max_results needs.
+    
+    Metadata is fetched one batch (50 messages) at a time, so the first
+    results arrive after two round trips and memory stays bounded by a page.
+    """
+    service = get_gmail_service(user_email)
+    for page in iter_message_pages(user_email, query, max_results):
+        for start in range(0, len(page), METADATA_BATCH_SIZE):
+            yield from fetch_metadata(service, page[start:start + METADATA_BATCH_SIZE])
+
+
+def query_window(query):
+    """
+    The (after, before) epoch-second window of a query's after:/before: terms.
+    
+    Raises:
+        ValueError: If the query has no after: term (before: defaults to now)
+    """
+    after = before = None
+    for op, value in DATE_TERM_RE.findall(query or ''):
+        seconds = parse_date(value) // 1000
+        if op.lower() == 'after':
+            after = seconds
+        else:
+            before = seconds
+    if after is None:
+        raise ValueError("Parallel listing needs an after: date in the query (e.g. after:2020/01/01)")
+    return after, before if before is not None else int(time.time()) + 86400
+
+
+def shard_queries(query, shards):
+    """
+    Split a query's after:/before: window into `shards` queries, newest first.
+    
+    Shard bounds are epoch seconds (Gmail accepts them) and overlap by one
+    second so nothing falls between shards; duplicates are dropped on merge.
+    """
+    after, before = query_window(query)
+    base = DATE_TERM_RE.sub('', query).strip()
+    shards = max(1, min(shards, before - after))
+    step = (before - after) / shards
+    queries = []
+    for i in reversed(range(shards)):
+        start = int(after + i * step)
+        end = before if i == shards - 1 else int(after + (i + 1) * step)
+        queries.append(f"{base} after:{max(after, start - 1)} before:{end}".strip())
+    return queries
+
+
+def iter_messages_parallel(user_email, query, max_results=10, workers=PARALLEL_WORKERS, shards=None):
+    """
+    Yield summaries for a query by listing date shards concurrently.
+    
+    Shards are disjoint time ranges listed newest first, at most `workers` at
+    a time, and no further shard starts once the finished newer ones hold
+    max_results. Only the merged top max_results stubs are hydrated (in
+    batches on the same pool), so the quota spent stays close to a
+    sequential listing. Output starts as soon as the newest shard is done.
+    """
+    service = get_gmail_service(user_email)
+    
+    def list_shard(shard_query):
+        return [stub for page in iter_message_pages(user_email, shard_query, max_results) for stub in page]
+    
+    queries = iter(shard_queries(query, shards or workers * SHARDS_PER_WORKER))
+    seen, remaining = set(), max_results
+    listings = deque()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    
+    def start_listing():
+        shard_query = next(queries, None)
+        if shard_query is not None:
+            listings.append(pool.submit(list_shard, shard_query))
+    
+    try:
+        for _ in range(max(1, workers)):
+            start_listing()
+        while listings and remaining > 0:
+            stubs = [stub for stub in listings.popleft().result() if stub['id'] not in seen][:remaining]
+            seen.update(stub['id'] for stub in stubs)
+            remaining -= len(stubs)
+            if remaining > 0:
+                start_listing()
+            batches = [pool.submit(fetch_metadata, service, stubs[start:start + METADATA_BATCH_SIZE])
+                       for start in range(0, len(stubs), METADATA_BATCH_SIZE)]
+            summaries = [summary for batch in batches for summary in batch.result()]
+            summaries.sort(key=lambda m: int(m.get('internalDate') or 0), reverse=True)
+            yield from summaries
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_message_pages(user_email, query=None, max_results=10):
+    """
+    Yield pages of message stubs, following nextPageToken up to max_results.
+    
+    The next page is requested in the background as soon as the current one
+    arrives, so listing overlaps with the caller hydrating the current page.
+    """
+    def fetch(page_token, page_size):
+        # Runs on the prefetch thread
+        return get_gmail_service(user_email).users().messages().list(
             userId='me',
             q=query,
-            maxResults=max_results
+            maxResults=page_size,
+            pageToken=page_token,
+            fields=LIST_FIELDS
         ).execute()
+
+    remaining = max_results
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(fetch, None, min(remaining, LIST_PAGE_SIZE))
+        while pending is not None:
+            results = pending.result()
+            messages = results.get('messages', [])[:remaining]
+            remaining -= len(messages)
+            next_token = results.get('nextPageToken')
+            pending = None
+            if next_token and remaining > 0:
+                pending = pool.submit(fetch, next_token, min(remaining, LIST_PAGE_SIZE))
+            if messages:
+                yield messages
+
+
+def start_prefetch(user_email, message_ids):
+    """
+    Cache full message bodies in a detached `gmail.py prefetch` process.
+    
+    Returns right away, so `list` output isn't held up; the follow-up `get`
+    calls find the messages cached. Failures are ignored (get just fetches).
+    """
+    if not message_ids:
+        return
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--user', user_email, 'prefetch', *message_ids],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def prefetch_messages(user_email, message_ids):
+    """
+    Fetch format='full' messages into the message cache with batch requests.
+    
+    Args:
+        user_email: Email address to impersonate
+        message_ids: Message IDs; ones already cached are skipped
+    
+    Returns:
+        Dict with fetched, alreadyCached and failed counts
+    """
+    with MessageCache.open(user_email) as cache:
+        missing = cache.missing(list(dict.fromkeys(message_ids)))
+        fetched = failed = 0
+        if missing:
+            service = get_gmail_service(user_email)
+            for message in batch_get_messages(service, missing, format='full', fields=FULL_FIELDS):
+                if isinstance(message, Exception):
+                    failed += 1
+                    continue
+                # Raw only: bodies Gmail stores as attachments are fetched on the first get
+                cache.put(message)
+                fetched += 1
+    return {'fetched': fetched, 'alreadyCached': len(set(message_ids)) - len(missing), 'failed': failed}
+
+
+def get_message(user_email, message_id, max_chars=None, offset_chars=0, use_cache=True):
+    """
+    Get full message content.
+    
+    Args:
+        user_email: Email address to impersonate
+        message_id: Gmail message ID
+        max_chars: Maximum body characters to return (None = all). Decoding
+            stops once they're read, so huge messages stay cheap.
+        offset_chars: Body character offset to start reading from (default 0)
+        use_cache: Read/fill the on-disk message cache (see cache.py). A cached
+            message costs one format='minimal' call for its current labels.
+    
+    Returns:
+        Full message object with body, headers, attachments info
+    """
+    try:
+        service = get_gmail_service(user_email)
+        fetch_attachment = attachment_fetcher(service, message_id)
         
-        messages = results.get('messages', [])
-        if not messages:
-            return []
-        
-        # Get full message details
-        message_list = []
-        for msg in messages:
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['From', 'To', 'Subject', 'Date']
-            ).execute()
-            
-            headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
+        if not use_cache:
+            message = service.users().messages().get(userId='me', id=message_id, format='full', fields=FULL_FIELDS).execute()
+            return parse_message(message, max_chars, offset_chars, fetch_attachment)
+        
+        with MessageCache.open(user_email) as cache:
+            cached = cache.get(message_id)
+            if cached is None:
+                message = service.users().messages().get(userId='me', id=message_id, format='full', fields=FULL_FIELDS).execute()
+                result = parse_message(message, max_chars, offset_chars, fetch_attachment)
+                complete = offset_chars == 0 and not result['truncated']
+                cache.put(message, result if complete else None)
+                return result
             
-            message_list.append({
-                'id': message['id'],
-                'threadId': message['threadId'],
-                'snippet': message.get('snippet', ''),
-                'from': headers.get('From', ''),
-                'to': headers.get('To', ''),
-                'subject': headers.get('Subject', ''),
-                'date': headers.get('Date', ''),
-                'internalDate': message.get('internalDate', '')
-            })
+            message, parsed = cached
+            try:
+                labels = service.users().messages().get(
+                    userId='me', id=message_id, format='minimal', fields='labelIds'
+                ).execute().get('labelIds', [])
+            except HttpError as error:
+                if error.resp.status == 404:
+                    cache.delete(message_id)
+                raise
+            if parsed is not None:
+                return dict(window_result(parsed, offset_chars, max_chars), labels=labels)
+            result = parse_message(message, max_chars, offset_chars, fetch_attachment)
+            if offset_chars == 0 and not result['truncated']:
+                cache.set_parsed(message_id, result)
+            return dict(result, labels=labels)
+    
+    except HttpError as error:
+        raise Exception(f"Gmail API error getting message: {error.resp.status} - {error.content.decode()}")
+    except Exception as e:
+        raise Exception(f"Error getting message: {str(e)}")
+
+
+def attachment_fetcher(service, message_id):
+    """The parse_message() fetch_attachment callable for a message."""
+    def fetch_attachment(attachment_id):
+        return service.users().messages().attachments().get(
+            userId='me',
+            messageId=message_id,
+            id=attachment_id,
+            fields='data'
+        ).execute()['data']
+    return fetch_attachment
+
+
+def parse_message(message, max_chars=None, offset_chars=0, fetch_attachment=None):
+    """
+    Flatten a format='full' message into the `get` output.
+    
+    Args:
+        message: Message resource from messages.get
+        max_chars: Maximum body characters to return (None = all)
+        offset_chars: Body character offset to start from
+        fetch_attachment: Callable(attachment_id) → data, for bodies Gmail
+            doesn't return inline
+    
+    Returns:
+        Dict with headers, body text and labels. totalChars is null when
+        max_chars stopped decoding before the end of the body.
+    """
+    # Extract headers
+    payload = message.get('payload', {})
+    headers = {h['name']: h['value'] for h in payload.get('headers', [])}
+    
+    # Best text part anywhere in the MIME tree, decoded only as far as needed
+    body_part = find_body_part(payload)
+    body_text, total_chars, truncated = '', 0, False
+    if body_part is not None:
+        body_text, total_chars, truncated = read_window(
+            iter_part_text(body_part, fetch_attachment), offset_chars, max_chars)
+    
+    result = {
+        'id': message['id'],
+        'threadId': message['threadId'],
+        'snippet': message.get('snippet', ''),
+        'from': headers.get('From', ''),
+        'to': headers.get('To', ''),
+        'cc': headers.get('Cc', ''),
+        'bcc': headers.get('Bcc', ''),
+        'subject': headers.get('Subject', ''),
+        'date': headers.get('Date', ''),
+        'internalDate': message.get('internalDate', ''),
+        'body': body_text,
+        'bodyMimeType': body_part.get('mimeType', '') if body_part else '',
+        'totalChars': total_chars,
+        'offsetChars': offset_chars,
+        'returnedChars': len(body_text),
+        'truncated': truncated,
+        'labels': message.get('labelIds', [])
+    }
+    
+    return result
+
+
+def window_result(result, offset_chars=0, max_chars=None):
+    """A `get` result with its full body narrowed to the requested window."""
+    body, total_chars, truncated = window_text(result['body'], offset_chars, max_chars)
+    return dict(result, body=body, totalChars=total_chars, offsetChars=offset_chars,
+                returnedChars=len(body), truncated=truncated)
+
+
+def get_thread(user_email, thread_id, collapse=True):
+    """
+    Get a whole conversation in one request.
+    
+    Args:
+        user_email: Email address to impersonate
+        thread_id: Gmail thread ID
+        collapse: Reduce each message to what it adds (drop quoted history,
+            reply headers, signatures and lines repeated from earlier messages)
+    
+    Returns:
+        Thread dict with per-message headers and body, oldest first
+    """
+    try:
+        service = get_gmail_service(user_email)
+        thread = service.users().threads().get(
+            userId='me',
+            id=thread_id,
+            format='full',
+            fields=THREAD_FIELDS
+        ).execute()
+        
+        parsed = [parse_message(message, fetch_attachment=attachment_fetcher(service, message['id']))
+                  for message in thread.get('messages', [])]
+        bodies = [message['body'] for message in parsed]
+        original_chars = sum(len(body) for body in bodies)
+        collapsed = collapse_thread(bodies) if collapse else [(body, 0) for body in bodies]
+        
+        messages = [{
+            'id': message['id'],
+            'from': message['from'],
+            'to': message['to'],
+            'cc': message['cc'],
+            'subject': message['subject'],
+            'date': message['date'],
+            'internalDate': message['internalDate'],
+            'labels': message['labels'],
+            'body': body,
+            'removedLines': removed_lines
+        } for message, (body, removed_lines) in zip(parsed, collapsed)]
         
-        return message_list
+        return {
+            'id': thread['id'],
+            'historyId': thread.get('historyId', ''),
+            'messageCount': len(messages),
+            'originalChars': original_chars,
+            'returnedChars': sum(len(message['body']) for message in messages),
+            'messages': messages
+        }
     
     except HttpError as error:
-        raise Exception(f"Gmail API error listing messages: {error.resp.status} - {error.content.decode()}")
+        raise Exception(f"Gmail API error getting thread: {error.resp.status} - {error.content.decode()}")
     except Exception as e:
-        raise Exception(f"Error listing messages: {str(e)}")
+        raise Exception(f"Error getting thread: {str(e)}")
 
 
-def get_message(user_email, message_id):
+def list_attachments(user_email, message_id, download=False, names=None, output_dir=None,
+                     workers=ATTACHMENT_WORKERS):
     """
-    Get full message content.
+    List a message's attachments, optionally downloading them.
+    
+    Downloads go to the content-addressed store in skills-data (see
+    attachments.py) and run in parallel; a part already stored for this
+    message is not fetched again.
     
     Args:
         user_email: Email address to impersonate
         message_id: Gmail message ID
+        download: Fetch and store the attachments
+        names: Only these filenames (None = all)
+        output_dir: Also copy downloaded files here under their original names
+        workers: Parallel downloads
     
     Returns:
-        Full message object with body, headers, attachments info
+        One dict per attachment (filename, mimeType, size, partId; plus
+        sha256, path, cached when downloaded, or error)
     """
     try:
         service = get_gmail_service(user_email)
         message = service.users().messages().get(
             userId='me',
             id=message_id,
-            format='full'
+            format='full',
+            fields='payload'
         ).execute()
         
-        # Extract headers
-        headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
-        
-        # Extract body text
-        body_text = ''
-        payload = message.get('payload', {})
-        
-        if payload.get('body', {}).get('data'):
-            body_text = base64.urlsafe_b64decode(
-                payload['body']['data']
-            ).decode('utf-8', errors='ignore')
-        elif 'parts' in payload:
-            for part in payload['parts']:
-                if part.get('mimeType') == 'text/plain' and part.get('body', {}).get('data'):
-                    body_text = base64.urlsafe_b64decode(
-                        part['body']['data']
-                    ).decode('utf-8', errors='ignore')
-                    break
-                elif part.get('mimeType') == 'text/html' and part.get('body', {}).get('data'):
-                    # Fallback to HTML if plain text not available
-                    if not body_text:
-                        body_text = base64.urlsafe_b64decode(
-                            part['body']['data']
-                        ).decode('utf-8', errors='ignore')
-        
-        result = {
-            'id': message['id'],
-            'threadId': message['threadId'],
-            'snippet': message.get('snippet', ''),
-            'from': headers.get('From', ''),
-            'to': headers.get('To', ''),
-            'cc': headers.get('Cc', ''),
-            'bcc': headers.get('Bcc', ''),
-            'subject': headers.get('Subject', ''),
-            'date': headers.get('Date', ''),
-            'internalDate': message.get('internalDate', ''),
-            'body': body_text,
-            'labels': message.get('labelIds', [])
-        }
+        parts = [part for part in walk_parts(message.get('payload', {}))
+                 if part.get('filename') and (not names or part['filename'] in names)]
+        result = [{
+            'filename': part['filename'],
+            'mimeType': part.get('mimeType', ''),
+            'size': part.get('body', {}).get('size', 0),
+            'partId': part.get('partId', ''),
+        } for part in parts]
+        if not download:
+            return result
         
+        def fetch(part, entry):
+            try:
+                stored = attachments.lookup(message_id, entry['partId'])
+                if stored:
+                    sha256, path, _ = stored
+                    entry.update(sha256=sha256, path=path, cached=True)
+                else:
+                    body = part.get('body', {})
+                    if body.get('data'):
+                        sha256, path, size, existed = attachments.store_base64(body['data'])
+                    else:
+                        # Streamed: the base64 goes straight from the socket to the hasher and file
+                        request = service.users().messages().attachments().get(
+                            userId='me',
+                            messageId=message_id,
+                            id=body['attachmentId'],
+                            fields='data'
+                        )
+                        with open_stream(request) as chunks:
+                            sha256, path, size, existed = attachments.store_base64(
+                                attachments.json_string_chunks(chunks, 'data'))
+                    attachments.remember(message_id, entry['partId'], sha256, size)
+                    entry.update(sha256=sha256, path=path, size=size, cached=existed)
+                if output_dir:
+                    entry['savedAs'] = attachments.export_copy(entry['path'], output_dir, entry['filename'])
+            except HttpError as error:
+                entry['error'] = batch_error(error)
+            except Exception as e:
+                entry['error'] = str(e)
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(fetch, parts, result))
         return result
     
     except HttpError as error:
-        raise Exception(f"Gmail API error getting message: {error.resp.status} - {error.content.decode()}")
+        raise Exception(f"Gmail API error getting attachments: {error.resp.status} - {error.content.decode()}")
     except Exception as e:
-        raise Exception(f"Error getting message: {str(e)}")
+        raise Exception(f"Error getting attachments: {str(e)}")
+
+
+def sync_mirror(user_email, max_messages=SYNC_MAX_MESSAGES, query=None, full=False):
+    """
+    Bring the local mirror up to date.
+    
+    The first run (or --full, or when the saved historyId has expired) copies
+    the newest `max_messages` messages matching `query`. Later runs replay
+    users.history.list from the saved historyId: additions, deletions and
+    label changes only.
+    
+    Args:
+        user_email: Email address to impersonate
+        max_messages: Cap for a full sync
+        query: Gmail query limiting a full sync (e.g. "newer_than:1y")
+        full: Force a full sync
+    
+    Returns:
+        Sync summary (mode, counts, historyId)
+    """
+    start = time.perf_counter()
+    try:
+        service = get_gmail_service(user_email)
+        with Mirror.open(user_email) as mirror:
+            history_id = None if full else mirror.get_state('historyId')
+            summary = None
+            if history_id:
+                try:
+                    summary = _sync_incremental(service, mirror, history_id)
+                except HttpError as error:
+                    # Gmail keeps roughly a week of history; older IDs return 404
+                    if error.resp.status != 404:
+                        raise
+            if summary is None:
+                summary = _sync_full(user_email, service, mirror, max_messages, query)
+            elif mirror.get_state('coveredSince') is None:
+                # Mirror from before coverage was recorded: assume it was capped
+                mirror.set_coverage(mirror.get_state('fullSyncQuery', ''), capped=True)
+            mirror.set_state('syncedAt', int(time.time()))
+            mirror.commit()
+            summary['messages'] = mirror.count()
+            summary['durationMs'] = round((time.perf_counter() - start) * 1000)
+            return summary
+    
+    except HttpError as error:
+        raise Exception(f"Gmail API error syncing mirror: {error.resp.status} - {error.content.decode()}")
+    except Exception as e:
+        raise Exception(f"Error syncing mirror: {str(e)}")
+
+
+def _store_full_messages(service, mirror, message_ids):
+    """Fetch format='full' messages in batches and store them; returns (stored, errors)."""
+    stored, errors = 0, []
+    for start in range(0, len(message_ids), METADATA_BATCH_SIZE):
+        chunk = message_ids[start:start + METADATA_BATCH_SIZE]
+        for message_id, response in zip(chunk, batch_get_messages(service, chunk, format='full', fields=FULL_FIELDS)):
+            if isinstance(response, HttpError) and response.resp.status == 404:
+                continue  # deleted again before we got to it
+            if isinstance(response, Exception):
+                errors.append({'id': message_id, 'error': batch_error(response)})
+                continue
+            # Large bodies come as an attachmentId, not inline data
+            mirror.upsert(parse_message(response, fetch_attachment=attachment_fetcher(service, message_id)))
+            stored += 1
+    return stored, errors
+
+
+def _sync_full(user_email, service, mirror, max_messages, query):
+    # Take the historyId before listing so changes made during the copy are replayed next time
+    history_id = service.users().getProfile(userId='me', fields='historyId').execute()['historyId']
+    mirror.clear()
+    mirror.save_labels(service.users().labels().list(userId='me', fields=LABEL_FIELDS).execute().get('labels', []))
+    added, errors = 0, []
+    listed = 0
+    for page in iter_message_pages(user_email, query, max_messages):
+        listed += len(page)
+        stored, page_errors = _store_full_messages(service, mirror, [m['id'] for m in page])
+        added += stored
+        errors.extend(page_errors)
+        mirror.commit()
+    mirror.set_state('historyId', history_id)
+    mirror.set_state('fullSyncQuery', query or '')
+    mirror.set_state('fullSyncMax', max_messages)
+    mirror.set_coverage(query, capped=listed >= max_messages)
+    return {'mode': 'full', 'added': added, 'deleted': 0, 'labelsChanged': 0,
+            'historyId': history_id, 'errors': errors}
+
+
+def _sync_incremental(service, mirror, history_id):
+    added, deleted, labels = {}, set(), {}
+    page_token, latest = None, history_id
+    while True:
+        results = service.users().history().list(
+            userId='me',
+            startHistoryId=history_id,
+            historyTypes=HISTORY_TYPES,
+            pageToken=page_token,
+            fields=HISTORY_FIELDS
+        ).execute()
+        # Replay in order so an add followed by a delete nets out
+        for record in results.get('history', []):
+            for item in record.get('messagesAdded', []):
+                added[item['message']['id']] = True
+                deleted.discard(item['message']['id'])
+            for item in record.get('messagesDeleted', []):
+                added.pop(item['message']['id'], None)
+                labels.pop(item['message']['id'], None)
+                deleted.add(item['message']['id'])
+            for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                message = item['message']
+                if 'labelIds' in message and message['id'] not in deleted:
+                    labels[message['id']] = message['labelIds']
+        latest = results.get('historyId', latest)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+    deleted_count = sum(mirror.delete(message_id) for message_id in deleted)
+    stored, errors = _store_full_messages(service, mirror, list(added))
+    changed = sum(mirror.set_labels(message_id, label_ids)
+                  for message_id, label_ids in labels.items() if message_id not in added)
+    if added or labels:
+        mirror.save_labels(service.users().labels().list(userId='me', fields=LABEL_FIELDS).execute().get('labels', []))
+    mirror.set_state('historyId', latest)
+    return {'mode': 'incremental', 'added': stored, 'deleted': deleted_count, 'labelsChanged': changed,
+            'historyId': latest, 'errors': errors}
+
+
+def resolve_label_ids(service, labels):
+    """
+    Label IDs for label names or IDs (case-insensitive; system labels like
+    INBOX, UNREAD, STARRED are their own IDs).
+    
+    Raises:
+        ValueError: For a label the mailbox doesn't have
+    """
+    if not labels:
+        return []
+    by_name = {label.lower(): label for label in SYSTEM_LABELS}
+    if any(label.upper() not in SYSTEM_LABELS for label in labels):
+        user_labels = service.users().labels().list(userId='me', fields=LABEL_FIELDS).execute().get('labels', [])
+    else:
+        user_labels = []
+    for label in user_labels:
+        by_name[label['id'].lower()] = label['id']
+        by_name.setdefault(label['name'].lower(), label['id'])
+    unknown = [label for label in labels if label.lower() not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown label(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(by_name[label.lower()] for label in labels))
+
+
+def modify_messages(user_email, query, add_labels=None, remove_labels=None,
+                    max_messages=MODIFY_MAX_MESSAGES, dry_run=False):
+    """
+    Add/remove labels on every message matching a query, with batchModify.
+    
+    All matching IDs are listed first, then sent 1000 per batchModify call, so
+    50,000 messages take 100 list pages and 50 modify calls.
+    
+    Args:
+        user_email: Email address to impersonate
+        query: Gmail search query selecting the messages
+        add_labels: Label names/IDs to add
+        remove_labels: Label names/IDs to remove (e.g. INBOX to archive)
+        max_messages: Stop after this many matches
+        dry_run: Only count the matches
+    
+    Returns:
+        Dict with matched and modified counts and the label IDs applied
+    """
+    try:
+        service = get_gmail_service(user_email, GMAIL_MODIFY_SCOPES)
+        add_ids = resolve_label_ids(service, add_labels)
+        remove_ids = resolve_label_ids(service, remove_labels)
+        if not (add_ids or remove_ids):
+            raise ValueError("Nothing to change: give labels to add or remove")
+        body = {'addLabelIds': add_ids, 'removeLabelIds': remove_ids}
+        
+        def apply(ids):
+            service.users().messages().batchModify(userId='me', body=dict(body, ids=ids)).execute()
+        
+        # Collect every match before changing any: modifying while paging shifts
+        # the query's results under the page tokens and skips messages
+        ids = [stub['id'] for page in iter_message_pages(user_email, query, max_messages) for stub in page]
+        modified = 0
+        if not dry_run:
+            for start in range(0, len(ids), MODIFY_BATCH_SIZE):
+                chunk = ids[start:start + MODIFY_BATCH_SIZE]
+                apply(chunk)
+                modified += len(chunk)
+        
+        return {
+            'matched': len(ids),
+            'modified': modified,
+            'addLabelIds': add_ids,
+            'removeLabelIds': remove_ids,
+            'dryRun': dry_run,
+        }
+    
+    except HttpError as error:
+        raise Exception(f"Gmail API error modifying messages: {error.resp.status} - {error.content.decode()}")
+    except Exception as e:
+        raise Exception(f"Error modifying messages: {str(e)}")
+
+
+def load_users(users=None, users_file=None):
+    """
+    Mailboxes from a comma-separated list and/or a file (one per line, # comments).
+    
+    Returns:
+        Email addresses in order, without duplicates
+    """
+    entries = (users or '').split(',')
+    if users_file:
+        with open(users_file) as f:
+            entries += [line.split('#', 1)[0] for line in f]
+    result = []
+    for entry in entries:
+        entry = entry.strip()
+        if entry and entry not in result:
+            result.append(entry)
+    if not result:
+        raise ValueError("No mailboxes given")
+    return result
+
+
+def fan_out(users, fn, workers=FANOUT_WORKERS):
+    """
+    Run fn(user) for many mailboxes on a bounded thread pool.
+    
+    Services, delegated credentials (and their cached tokens) and the pooled
+    connections are shared across threads by auth.get_service().
+    
+    Yields:
+        (user, result, error) as each mailbox finishes; error is None on success
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(users)))) as pool:
+        futures = {pool.submit(fn, user): user for user in users}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
 
 
 def create_draft(user_email, to, subject, body):
@@ -153,14 +951,7 @@ def create_draft(user_email, to, subject, body):
     """
     try:
         service = get_gmail_service(user_email)
-        
-        # Create message
-        message = MIMEText(body)
-        message['to'] = to
-        message['subject'] = subject
-        
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+        raw_message = build_raw_message(to, subject, body)
         
         # Create draft
         draft = service.users().drafts().create(
@@ -169,7 +960,8 @@ def create_draft(user_email, to, subject, body):
                 'message': {
                     'raw': raw_message
                 }
-            }
+            },
+            fields=DRAFT_FIELDS
         ).execute()
         
         return {
@@ -188,9 +980,119 @@ def create_draft(user_email, to, subject, body):
         raise Exception(f"Error creating draft: {str(e)}")
 
 
+def build_raw_message(to, subject, body, cc=None, bcc=None):
+    """A plain-text MIME message, base64url-encoded for the API's `raw` field."""
+    message = MIMEText(body)
+    message['to'] = to
+    if cc:
+        message['cc'] = cc
+    if bcc:
+        message['bcc'] = bcc
+    message['subject'] = subject
+    return base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+
+
+def _draft_spec(line):
+    """Parse one drafts.jsonl line → dict with to, subject, body (+ cc, bcc, id)."""
+    spec = json.loads(line)
+    if not isinstance(spec, dict):
+        raise ValueError("Expected a JSON object")
+    missing = [key for key in ('to', 'subject', 'body') if not spec.get(key)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    return spec
+
+
+def _build_draft(line):
+    spec = _draft_spec(line)
+    return spec, build_raw_message(spec['to'], spec['subject'], spec['body'], spec.get('cc'), spec.get('bcc'))
+
+
+def _safe_build(line):
+    """_build_draft() for the pool: (spec, raw, None) or (spec_or_None, None, error)."""
+    try:
+        return (*_build_draft(line), None)
+    except Exception as e:
+        spec = None
+        try:
+            spec = json.loads(line)
+        except ValueError:
+            pass
+        return spec, None, e
+
+
+def create_drafts(user_email, lines, out=None, workers=DRAFT_WORKERS):
+    """
+    Create a draft per JSONL line ({"to", "subject", "body", "cc"?, "bcc"?, "id"?}).
+    
+    MIME messages are built on a worker pool while earlier ones upload;
+    drafts.create calls go out DRAFT_BATCH_SIZE per batch request.
+    
+    Writes one NDJSON result per non-blank input line, in order:
+    {"line", "id"?, "ok": true, "draft": {...}} or {"line", "id"?, "ok": false, "error"}
+    
+    Returns:
+        Dict with created and failed counts
+    """
+    out = out or sys.stdout
+    service = get_gmail_service(user_email)
+    numbered = [(n, line) for n, line in enumerate(lines, 1) if line.strip()]
+    created = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        built = pool.map(lambda item: _safe_build(item[1]), numbered)
+        for start in range(0, len(numbered), DRAFT_BATCH_SIZE):
+            chunk = [(n, *next(built)) for n, _ in numbered[start:start + DRAFT_BATCH_SIZE]]
+            uploads = [(spec, raw) for _, spec, raw, error in chunk if error is None]
+            responses = iter(execute_batch(
+                service,
+                lambda i: service.users().drafts().create(
+                    userId='me', body={'message': {'raw': uploads[i][1]}}, fields=DRAFT_FIELDS),
+                len(uploads),
+                DRAFT_BATCH_SIZE
+            ))
+            for n, spec, raw, error in chunk:
+                response = next(responses) if error is None else error
+                line = {'line': n}
+                if isinstance(spec, dict) and spec.get('id') is not None:
+                    line['id'] = spec['id']
+                if isinstance(response, Exception):
+                    failed += 1
+                    line.update(ok=False, error=batch_error(response))
+                else:
+                    created += 1
+                    line.update(ok=True, draft={
+                        'id': response['id'],
+                        'message': {
+                            'id': response['message']['id'],
+                            'threadId': response['message'].get('threadId', ''),
+                            'to': spec['to'],
+                            'subject': spec['subject']
+                        }
+                    })
+                out.write(json.dumps(line) + '\n')
+            out.flush()
+    return {'created': created, 'failed': failed}
+
+
+def print_request_report():
+    """Profile report, or rate-limit counters if anything was retried or throttled."""
+    if REQUEST_LOG.enabled:
+        print(json.dumps({'_profile': REQUEST_LOG.report()}, indent=2), file=sys.stderr)
+        return
+    rate = REQUEST_LOG.rate_report()
+    if rate['retries'] or rate['throttled']:
+        print(json.dumps({'_rateLimit': rate}), file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Gmail API wrapper using service account')
-    parser.add_argument('--user', required=True, help='User email to impersonate (e.g., user@example.com)')
+    users_group = parser.add_mutually_exclusive_group(required=True)
+    users_group.add_argument('--user', help='User email to impersonate (e.g., user@example.com)')
+    users_group.add_argument('--users', help=f'Comma-separated mailboxes to search concurrently ({", ".join(FANOUT_COMMANDS)} only)')
+    users_group.add_argument('--users-file', help='File with one mailbox per line, like --users')
+    parser.add_argument('--user-workers', type=int, default=FANOUT_WORKERS, help=f'Mailboxes searched at once with --users (default: {FANOUT_WORKERS})')
+    parser.add_argument('--no-mirror', action='store_true', help='Always query the API, even if a local mirror exists')
+    parser.add_argument('--profile', action='store_true', help='Report each API request\'s time and response size on stderr')
     
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
     
@@ -198,16 +1100,65 @@ def main():
     list_parser = subparsers.add_parser('list', help='List messages')
     list_parser.add_argument('--query', help='Gmail search query (e.g., "from:example@domain.com")')
     list_parser.add_argument('--max-results', type=int, default=10, help='Maximum number of results (default: 10)')
+    list_parser.add_argument('--stream', action='store_true', help='Write one JSON object per line as results arrive (NDJSON)')
+    list_parser.add_argument('--parallel', type=int, metavar='WORKERS', help='List date shards of the query\'s after:/before: window on this many workers')
+    list_parser.add_argument('--prefetch', type=int, nargs='?', const=PREFETCH_COUNT, default=0, metavar='N',
+                             help=f'Cache the bodies of the top N results in the background for fast get (default N: {PREFETCH_COUNT})')
+    list_parser.add_argument('--shards', type=int, help=f'Number of date shards for --parallel (default: workers x {SHARDS_PER_WORKER})')
     
     # Get message command
     get_parser = subparsers.add_parser('get', help='Get full message content')
     get_parser.add_argument('--message-id', required=True, help='Gmail message ID')
+    get_parser.add_argument('--max-chars', type=int, help='Maximum body characters to return (for large messages)')
+    get_parser.add_argument('--offset', type=int, default=0, help='Body character offset to start reading from')
+    get_parser.add_argument('--no-cache', action='store_true', help='Fetch from the API without reading or filling the message cache')
+    
+    # Prefetch command (what list --prefetch runs in the background)
+    prefetch_parser = subparsers.add_parser('prefetch', help='Fetch messages into the message cache')
+    prefetch_parser.add_argument('message_ids', nargs='+', help='Gmail message IDs')
+    
+    # Bulk label changes command
+    modify_parser = subparsers.add_parser('modify', help='Add/remove labels on all messages matching a query')
+    modify_parser.add_argument('--query', required=True, help='Gmail search query selecting the messages')
+    modify_parser.add_argument('--add-labels', help='Comma-separated label names or IDs to add')
+    modify_parser.add_argument('--remove-labels', help='Comma-separated label names or IDs to remove')
+    modify_parser.add_argument('--archive', action='store_true', help='Remove from the inbox (same as --remove-labels INBOX)')
+    modify_parser.add_argument('--mark-read', action='store_true', help='Mark as read (remove UNREAD)')
+    modify_parser.add_argument('--mark-unread', action='store_true', help='Mark as unread (add UNREAD)')
+    modify_parser.add_argument('--max-messages', type=int, default=MODIFY_MAX_MESSAGES, help=f'Stop after this many matches (default: {MODIFY_MAX_MESSAGES})')
+    modify_parser.add_argument('--dry-run', action='store_true', help='Only count the matching messages')
     
     # Create draft command
     draft_parser = subparsers.add_parser('draft', help='Create a draft email')
-    draft_parser.add_argument('--to', required=True, help='Recipient email address')
-    draft_parser.add_argument('--subject', required=True, help='Email subject')
-    draft_parser.add_argument('--body', required=True, help='Email body (plain text)')
+    draft_parser.add_argument('--to', help='Recipient email address')
+    draft_parser.add_argument('--subject', help='Email subject')
+    draft_parser.add_argument('--body', help='Email body (plain text)')
+    draft_parser.add_argument('--from-file', metavar='JSONL', help='Create one draft per line ({"to", "subject", "body", "cc"?, "bcc"?, "id"?}); "-" reads stdin')
+    draft_parser.add_argument('--workers', type=int, default=DRAFT_WORKERS, help=f'Threads building MIME messages for --from-file (default: {DRAFT_WORKERS})')
+    
+    # Get thread command
+    thread_parser = subparsers.add_parser('thread', help='Get a whole conversation (quoted text collapsed)')
+    thread_parser.add_argument('thread_id', help='Gmail thread ID (threadId from list/get)')
+    thread_parser.add_argument('--full', action='store_true', help='Keep quoted history and signatures')
+    
+    # Attachments command
+    attachments_parser = subparsers.add_parser('attachments', help='List or download a message\'s attachments')
+    attachments_parser.add_argument('message_id', help='Gmail message ID')
+    attachments_parser.add_argument('--download', action='store_true', help='Download to the content-addressed store in skills-data')
+    attachments_parser.add_argument('--name', action='append', help='Only this filename (repeatable)')
+    attachments_parser.add_argument('--output-dir', help='Also copy downloads here under their original names (implies --download)')
+    attachments_parser.add_argument('--workers', type=int, default=ATTACHMENT_WORKERS, help=f'Parallel downloads (default: {ATTACHMENT_WORKERS})')
+    
+    # Sync local mirror command
+    sync_parser = subparsers.add_parser('sync', help='Sync the local mirror (full first time, then incremental)')
+    sync_parser.add_argument('--max-messages', type=int, default=SYNC_MAX_MESSAGES, help=f'Messages to copy on a full sync (default: {SYNC_MAX_MESSAGES})')
+    sync_parser.add_argument('--query', help='Limit a full sync to messages matching this query (e.g., "newer_than:1y")')
+    sync_parser.add_argument('--full', action='store_true', help='Discard the mirror and do a full sync')
+    
+    # Offline full-text search command
+    search_local_parser = subparsers.add_parser('search-local', help='Ranked full-text search over the local mirror')
+    search_local_parser.add_argument('query', help='Words/phrases plus from:, to:, subject:, label:, after:, before: ...')
+    search_local_parser.add_argument('--max-results', type=int, default=20, help='Maximum number of results (default: 20)')
     
     args = parser.parse_args()
     
@@ -215,22 +1166,146 @@ def main():
         parser.print_help()
         sys.exit(1)
     
+    if args.profile:
+        REQUEST_LOG.enabled = True
+    # Per-request sizes and times (or, without profiling, retry/throttle
+    # counters if there were any) go to stderr, so stdout stays plain JSON
+    atexit.register(print_request_report)
+    
+    if args.user is None:
+        run_fan_out(args)
+        return
+    
+    mirror = None
+    if args.command in ('list', 'get') and not args.no_mirror:
+        mirror = Mirror.open_existing(args.user, MIRROR_MAX_AGE)
+    
     try:
         if args.command == 'list':
-            result = list_messages(args.user, args.query, args.max_results)
-            print(json.dumps(result, indent=2))
+            # Served from the mirror only when it's exact (supported query, synced window)
+            result = mirror.list_messages(args.query, args.max_results) if mirror else None
+            if result is not None and args.stream:
+                for message in result:
+                    print(json.dumps(message))
+            elif result is not None:
+                print(json.dumps(result, indent=2))
+            elif args.stream:
+                stream_messages(args.user, args.query, args.max_results, workers=args.parallel, shards=args.shards,
+                                prefetch=args.prefetch)
+            else:
+                result = list_messages(args.user, args.query, args.max_results, args.parallel, args.shards,
+                                       args.prefetch)
+                print(json.dumps(result, indent=2))
         
         elif args.command == 'get':
-            result = get_message(args.user, args.message_id)
+            result = mirror.get_message(args.message_id) if mirror else None
+            if result is not None:
+                result = window_result(result, args.offset, args.max_chars)
+            else:
+                result = get_message(args.user, args.message_id, args.max_chars, args.offset, not args.no_cache)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'prefetch':
+            result = prefetch_messages(args.user, args.message_ids)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'thread':
+            result = get_thread(args.user, args.thread_id, collapse=not args.full)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'attachments':
+            result = list_attachments(args.user, args.message_id, args.download or bool(args.output_dir),
+                                      args.name, args.output_dir, args.workers)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'search-local':
+            mirror = Mirror.open_existing(args.user)
+            if mirror is None:
+                raise Exception(f"No local mirror for {args.user}; run 'sync' first")
+            result = mirror.search(args.query, args.max_results)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'sync':
+            result = sync_mirror(args.user, args.max_messages, args.query, args.full)
+            print(json.dumps(result, indent=2))
+        
+        elif args.command == 'modify':
+            add_labels = [label.strip() for label in (args.add_labels or '').split(',') if label.strip()]
+            remove_labels = [label.strip() for label in (args.remove_labels or '').split(',') if label.strip()]
+            if args.archive:
+                remove_labels.append('INBOX')
+            if args.mark_read:
+                remove_labels.append('UNREAD')
+            if args.mark_unread:
+                add_labels.append('UNREAD')
+            result = modify_messages(args.user, args.query, add_labels, remove_labels,
+                                     args.max_messages, args.dry_run)
             print(json.dumps(result, indent=2))
         
+        elif args.command == 'draft' and args.from_file:
+            if args.from_file == '-':
+                summary = create_drafts(args.user, sys.stdin.read().splitlines(), workers=args.workers)
+            else:
+                with open(args.from_file) as f:
+                    summary = create_drafts(args.user, f.read().splitlines(), workers=args.workers)
+            if summary['created'] == 0 and summary['failed']:
+                sys.exit(1)
+        
         elif args.command == 'draft':
+            if not (args.to and args.subject and args.body):
+                parser.error("draft needs --to, --subject and --body (or --from-file)")
             result = create_draft(args.user, args.to, args.subject, args.body)
             print(json.dumps(result, indent=2))
     
     except Exception as e:
         print(json.dumps({'error': str(e)}, indent=2), file=sys.stderr)
         sys.exit(1)
+    finally:
+        if mirror is not None:
+            mirror.close()
+
+
+def run_fan_out(args):
+    """
+    Run list/search-local for every --users mailbox, writing one NDJSON line
+    per mailbox as it finishes: {"user", "count", "messages"} or {"user", "error"}.
+    Exits 1 only if every mailbox failed.
+    """
+    try:
+        if args.command not in FANOUT_COMMANDS:
+            raise ValueError(f"--users only works with: {', '.join(FANOUT_COMMANDS)}")
+        users = load_users(args.users, args.users_file)
+    except Exception as e:
+        print(json.dumps({'error': str(e)}, indent=2), file=sys.stderr)
+        sys.exit(1)
+    
+    def run(user):
+        if args.command == 'search-local':
+            mirror = Mirror.open_existing(user)
+            if mirror is None:
+                raise Exception(f"No local mirror for {user}; run 'sync' first")
+            with mirror:
+                return mirror.search(args.query, args.max_results)
+        mirror = None if args.no_mirror else Mirror.open_existing(user, MIRROR_MAX_AGE)
+        try:
+            result = mirror.list_messages(args.query, args.max_results) if mirror else None
+        finally:
+            if mirror is not None:
+                mirror.close()
+        if result is None:
+            result = list_messages(user, args.query, args.max_results, args.parallel, args.shards)
+        return result
+    
+    failed = 0
+    for user, messages, error in fan_out(users, run, args.user_workers):
+        if error is not None:
+            failed += 1
+            line = {'user': user, 'error': str(error)}
+        else:
+            line = {'user': user, 'count': len(messages), 'messages': messages}
+        print(json.dumps(line), flush=True)
+    if failed == len(users):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+MIME body extraction for Gmail messages.
+
+Walks the whole `payload` tree (multipart/alternative inside multipart/mixed,
+forwarded messages, ...) to pick the best text part, then decodes it in chunks:
+base64url → bytes → text (part's charset) → plain text (HTML converted on the
+fly). Reading stops as soon as the requested window is filled, so a 5 MB
+newsletter read with --max-chars 2000 only decodes the start of it.
+"""
+import base64
+import codecs
+import re
+from html.parser import HTMLParser
+
+# base64 characters decoded per step (multiple of 4, so chunks decode on their own)
+DECODE_CHUNK = 64 * 1024
+
+# Tags whose text is never shown, tags that start a new line, and the
+# subset of those that also leave a blank line
+HIDDEN_TAGS = {'script', 'style', 'head', 'title', 'noscript', 'template'}
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'tr', 'li', 'ul', 'ol', 'table', 'section', 'article', 'header', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'hr',
+}
+PARAGRAPH_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'table', 'hr'}
+
+WHITESPACE_RE = re.compile(r"[ \t\r\f\v\xa0]+")
+
+
+def header_value(part, name):
+    """First value of a header in a payload part ('' if absent)."""
+    for header in part.get('headers', []):
+        if header['name'].lower() == name.lower():
+            return header['value']
+    return ''
+
+
+def part_charset(part):
+    """Charset from the part's Content-Type, falling back to UTF-8."""
+    match = re.search(r'charset\s*=\s*"?([^";\s]+)', header_value(part, 'Content-Type'), re.IGNORECASE)
+    charset = match.group(1) if match else 'utf-8'
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = 'utf-8'
+    return charset
+
+
+def is_attachment(part):
+    """True for parts meant as files rather than message text."""
+    return bool(part.get('filename')) or header_value(part, 'Content-Disposition').lower().startswith('attachment')
+
+
+def walk_parts(part):
+    """Yield every leaf part depth-first, in document order."""
+    children = part.get('parts')
+    if children:
+        for child in children:
+            yield from walk_parts(child)
+    else:
+        yield part
+
+
+def find_body_part(payload):
+    """
+    The part that best represents the message text.
+
+    The first inline text/plain part wins; otherwise the first inline text/html.
+    Depth-first order means the main body beats text in forwarded/attached messages.
+    """
+    html = None
+    for part in walk_parts(payload):
+        mime_type = part.get('mimeType', '').lower()
+        if is_attachment(part) or mime_type not in ('text/plain', 'text/html'):
+            continue
+        body = part.get('body', {})
+        if not (body.get('data') or body.get('attachmentId')):
+            continue
+        if mime_type == 'text/plain':
+            return part
+        if html is None:
+            html = part
+    return html
+
+
+class HtmlToText(HTMLParser):
+    """Incremental HTML → text: feed() chunks, drain() what's been converted so far."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._out = []
+        self._hidden = 0
+        # Start as if after a paragraph, so leading whitespace/newlines are dropped
+        self._last = '\n'
+        self._newlines = 2
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HIDDEN_TAGS:
+            self._hidden += 1
+        elif tag in BLOCK_TAGS:
+            self._newline(2 if tag in PARAGRAPH_TAGS else 1)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._newline(2 if tag in PARAGRAPH_TAGS else 1)
+
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS:
+            self._hidden = max(0, self._hidden - 1)
+        elif tag in BLOCK_TAGS:
+            self._newline(2 if tag in PARAGRAPH_TAGS else 1)
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        text = WHITESPACE_RE.sub(' ', data.replace('\n', ' '))
+        if self._last in ' \n':
+            text = text.lstrip(' ')
+        if text:
+            self._out.append(text)
+            self._last = text[-1]
+            self._newlines = 0
+
+    def _newline(self, limit):
+        # limit 1: end the line; limit 2: also leave (at most) one blank line
+        while self._newlines < limit:
+            if self._last == ' ' and self._out:
+                self._out[-1] = self._out[-1].rstrip(' ')
+            self._out.append('\n')
+            self._last = '\n'
+            self._newlines += 1
+
+    def drain(self, final=False):
+        """Text converted so far. Trailing newlines are held back until more text follows."""
+        text = ''.join(self._out)
+        body = text.rstrip('\n')
+        self._out = [] if final else [text[len(body):]]
+        return body
+
+
+def iter_part_text(part, fetch_attachment=None):
+    """
+    Yield the decoded text of a body part in chunks.
+
+    Args:
+        part: Payload part from find_body_part()
+        fetch_attachment: Callable(attachment_id) → base64url data, for bodies
+            Gmail stores separately (large text parts have no inline data)
+    """
+    body = part.get('body', {})
+    data = body.get('data')
+    if not data and body.get('attachmentId') and fetch_attachment:
+        data = fetch_attachment(body['attachmentId'])
+    if not data:
+        return
+
+    decoder = codecs.getincrementaldecoder(part_charset(part))(errors='replace')
+    html = HtmlToText() if part.get('mimeType', '').lower() == 'text/html' else None
+    for start in range(0, len(data), DECODE_CHUNK):
+        chunk = data[start:start + DECODE_CHUNK]
+        if start + DECODE_CHUNK >= len(data):
+            chunk += '=' * (-len(chunk) % 4)  # Gmail drops padding
+        text = decoder.decode(base64.urlsafe_b64decode(chunk))
+        if html is not None:
+            html.feed(text)
+            text = html.drain()
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if html is not None:
+        html.feed(text)
+        html.close()
+        text = html.drain(final=True)
+    if text:
+        yield text
+
+
+def read_window(chunks, offset_chars=0, max_chars=None):
+    """
+    Take [offset_chars, offset_chars + max_chars) from a stream of text chunks.
+
+    Stops pulling chunks once the window is full (plus one character, to know
+    whether there is more).
+
+    Returns:
+        (text, total_chars, truncated). total_chars is None when reading
+        stopped early and the full length is unknown.
+    """
+    pieces, seen, taken = [], 0, 0
+    for chunk in chunks:
+        start = max(0, offset_chars - seen)
+        seen += len(chunk)
+        if start >= len(chunk):
+            continue
+        piece = chunk[start:]
+        if max_chars is not None and taken + len(piece) > max_chars:
+            pieces.append(piece[:max_chars - taken])
+            return ''.join(pieces), None, True
+        pieces.append(piece)
+        taken += len(piece)
+    return ''.join(pieces), seen, False
+
+
+def window_text(text, offset_chars=0, max_chars=None):
+    """read_window() for text already in memory; total_chars is always known."""
+    content = text[offset_chars:] if offset_chars > 0 else text
+    truncated = max_chars is not None and len(content) > max_chars
+    if truncated:
+        content = content[:max_chars]
+    return content, len(text), truncated
+
+
+# --- Quoted text ---------------------------------------------------------------
+# Replies repeat the whole conversation below them. collapse_thread() keeps only
+# what each message adds: quote markers, reply headers and signatures cut the
+# rest, and lines already seen earlier in the thread are dropped by hash (which
+# also catches quotes that lost their '>' in HTML-to-text conversion).
+# Forwarded messages are not cut: they're often the only copy of that text in
+# the thread, and when they aren't, the line-hash dedupe removes the repeat.
+
+# Everything from one of these lines down is history or signature
+CUT_LINE_RES = [
+    re.compile(r'^On .{0,200}(wrote|écrit|schrieb|escribió):\s*$', re.IGNORECASE),
+    re.compile(r'^-{2,}\s*Original Message\s*-{2,}', re.IGNORECASE),
+    re.compile(r'^_{10,}\s*$'),
+    re.compile(r'^From:\s.+$'),  # Outlook reply header (see _is_reply_header)
+    re.compile(r'^-- ?$'),  # signature delimiter
+    re.compile(r'^Sent from my \w+', re.IGNORECASE),
+    re.compile(r'^Get Outlook for ', re.IGNORECASE),
+]
+# "On Tue, ... <someone@x.com>" often wraps before "wrote:"
+WROTE_CONTINUATION_RE = re.compile(r'^.{0,200}(wrote|écrit|schrieb|escribió):\s*$', re.IGNORECASE)
+# Seen-before lines shorter than this are only dropped inside a run of seen lines
+# ("Thanks," and "Hi all" legitimately repeat)
+MIN_DEDUPE_CHARS = 30
+
+
+def _line_key(line):
+    return hash(' '.join(line.split()).lower())
+
+
+def _is_reply_header(lines, i, kept):
+    """
+    An Outlook reply header ("From:" then "Sent:" within a few lines) after some text.
+
+    Forward headers ("From:" / "Date:" / "Subject:") don't count, and neither
+    does a "From:" line the message starts with.
+    """
+    if not any(line.strip() for line in kept):
+        return False
+    return any(line.strip().lower().startswith('sent:') for line in lines[i + 1:i + 5])
+
+
+def strip_quoted(text):
+    """
+    Cut a message body at the first quote/reply-header/signature marker and drop '>' lines.
+
+    Returns:
+        (kept_lines, removed_lines)
+    """
+    lines = text.splitlines()
+    kept, removed = [], []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith('>'):
+            removed.append(stripped.lstrip('> '))
+            continue
+        cut = any(regex.match(stripped) for regex in CUT_LINE_RES) and (
+            not stripped.lower().startswith('from:') or _is_reply_header(lines, i, kept))
+        # "On Tue, Jan 2, 2024 at 10:00 AM Jane Doe <jane@x.com>" + "wrote:" on the next line
+        cut = cut or (stripped.lower().startswith('on ') and i + 1 < len(lines)
+                      and WROTE_CONTINUATION_RE.match(lines[i + 1].strip()) is not None)
+        if cut:
+            removed.extend(lines[i:])
+            break
+        kept.append(line.rstrip())
+    return kept, removed
+
+
+def collapse_thread(bodies):
+    """
+    Reduce each message body to the content it adds to the thread.
+
+    Args:
+        bodies: Message bodies in thread order (oldest first)
+
+    Returns:
+        List of (text, removed_line_count), one per body
+    """
+    seen = set()
+    results = []
+    for body in bodies:
+        lines, removed = strip_quoted(body)
+        keys = [_line_key(line) if line.strip() else None for line in lines]
+        repeat = [key is not None and key in seen for key in keys]
+        kept = []
+        for i, line in enumerate(lines):
+            if repeat[i]:
+                in_run = (i > 0 and repeat[i - 1]) or (i + 1 < len(lines) and repeat[i + 1])
+                if len(line.strip()) >= MIN_DEDUPE_CHARS or in_run:
+                    continue
+            if not line.strip() and kept and not kept[-1].strip():
+                continue  # one blank line at a time
+            kept.append(line)
+        # Signatures cut here count as seen, so a later copy without '-- ' is dropped too
+        seen.update(key for key in keys if key is not None)
+        seen.update(_line_key(line) for line in removed if line.strip())
+        text = '\n'.join(kept).strip()
+        original = body.count('\n') + 1 if body else 0
+        results.append((text, max(0, original - len(text.splitlines()))))
+    return results
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Local SQLite mirror of a Gmail mailbox.
+
+`gmail.py sync` fills it (bounded full sync, then incremental via the History
+API); `list` and `get` read from it when it exists, unless --no-mirror is given.
+`search-local` ranks matches with BM25 over an FTS5 index of subject, from,
+to, snippet and body. One database per mailbox under user/skills-data/gmail/mirror/,
+readable only by its owner (see storage.py).
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from storage import private_dir, private_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+MIRROR_DIR = os.path.join(PROJECT_ROOT, 'user', 'skills-data', 'gmail', 'mirror')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT,
+    internal_date INTEGER,
+    snippet TEXT,
+    from_addr TEXT,
+    to_addr TEXT,
+    cc TEXT,
+    bcc TEXT,
+    subject TEXT,
+    date TEXT,
+    body TEXT,
+    labels TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_date ON messages(internal_date DESC);
+CREATE TABLE IF NOT EXISTS message_labels (
+    label_id TEXT,
+    message_id TEXT,
+    PRIMARY KEY (label_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_message_labels_message ON message_labels(message_id);
+CREATE TABLE IF NOT EXISTS labels (
+    id TEXT PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# External-content FTS5 index kept in step with `messages` by triggers.
+# Upserts use ON CONFLICT DO UPDATE (not INSERT OR REPLACE): REPLACE's implicit
+# delete doesn't fire triggers unless recursive_triggers is on.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, from_addr, to_addr, snippet, body,
+    content='messages', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, subject, from_addr, to_addr, snippet, body)
+    VALUES (new.rowid, new.subject, new.from_addr, new.to_addr, new.snippet, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, from_addr, to_addr, snippet, body)
+    VALUES ('delete', old.rowid, old.subject, old.from_addr, old.to_addr, old.snippet, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_update
+AFTER UPDATE OF subject, from_addr, to_addr, snippet, body ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, subject, from_addr, to_addr, snippet, body)
+    VALUES ('delete', old.rowid, old.subject, old.from_addr, old.to_addr, old.snippet, old.body);
+    INSERT INTO messages_fts (rowid, subject, from_addr, to_addr, snippet, body)
+    VALUES (new.rowid, new.subject, new.from_addr, new.to_addr, new.snippet, new.body);
+END;
+"""
+
+# BM25 column weights: subject, from, to, snippet, body
+BM25_WEIGHTS = (10.0, 5.0, 3.0, 2.0, 1.0)
+
+# Summary columns in `list` output order
+SUMMARY_COLUMNS = "m.id, m.thread_id, m.snippet, m.from_addr, m.to_addr, m.subject, m.date, m.internal_date"
+# Operators answered by the FTS index (column filters)
+FTS_COLUMNS = {'from': 'from_addr', 'to': 'to_addr', 'subject': 'subject'}
+
+# in:<name> → label ID
+IN_LABELS = {
+    'inbox': 'INBOX', 'sent': 'SENT', 'trash': 'TRASH', 'spam': 'SPAM',
+    'drafts': 'DRAFT', 'draft': 'DRAFT', 'starred': 'STARRED', 'important': 'IMPORTANT',
+    'unread': 'UNREAD', 'chats': 'CHAT',
+}
+IS_LABELS = {'unread': 'UNREAD', 'starred': 'STARRED', 'important': 'IMPORTANT'}
+
+# Search tokens: optional '-', optional 'operator:', then a quoted phrase or a word
+TOKEN_RE = re.compile(r'(-?)(?:([a-z_]+):)?("[^"]*"|\S+)', re.IGNORECASE)
+RELATIVE_UNITS = {'d': 86400, 'm': 30 * 86400, 'y': 365 * 86400}
+
+
+def mirror_path(user_email):
+    """Database path for a mailbox."""
+    safe = re.sub(r'[^A-Za-z0-9@._-]', '_', user_email)
+    return os.path.join(MIRROR_DIR, f'{safe}.sqlite')
+
+
+def parse_date(value):
+    """after:/before: value (YYYY/MM/DD, YYYY-MM-DD or epoch seconds) → epoch ms."""
+    if value.isdigit():
+        return int(value) * 1000
+    for fmt in ('%Y/%m/%d', '%Y-%m-%d', '%Y/%m', '%Y'):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            continue
+    raise ValueError(f"Unsupported date: {value}")
+
+
+def fts_phrase(value):
+    """Quote a term for an FTS5 MATCH expression (keeps a trailing * as a prefix query)."""
+    prefix = value.endswith('*')
+    phrase = '"' + value.rstrip('*').replace('"', '""') + '"'
+    return phrase + '*' if prefix else phrase
+
+
+def compile_query(query):
+    """
+    Translate a Gmail search query into SQL over the mirror.
+
+    Supports bare words and quoted phrases, from:, to:, cc:, subject:, label:,
+    in:, is:, after:, before:, newer_than:, older_than: and '-' negation.
+    Words, phrases, from:, to: and subject: become an FTS5 MATCH expression;
+    the rest become indexed column filters.
+
+    Returns:
+        (where_sql, params, match), or None if the query uses anything else
+        (OR, braces, has:, ...) and must go to the API. `match` is the FTS5
+        expression, or None when the query has no text terms.
+    """
+    clauses, params = [], []
+    positive, negative = [], []
+    include_hidden = False
+    for negate, op, value in TOKEN_RE.findall(query or ''):
+        op = op.lower()
+        value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+        if not op and value.upper() in ('OR', 'AND') or value.startswith(('(', '{')):
+            return None
+        if not value.strip('*'):
+            continue
+
+        if not op or op in FTS_COLUMNS:
+            term = fts_phrase(value)
+            if op:
+                term = f"{FTS_COLUMNS[op]} : {term}"
+            (negative if negate else positive).append(term)
+            continue
+        if op == 'cc':
+            clause, args = "m.cc LIKE ?", [f'%{value}%']
+        elif op in ('label', 'in', 'is'):
+            name = value.lower()
+            if op == 'in' and name == 'anywhere':
+                include_hidden = True
+                continue
+            if op == 'is':
+                if name == 'read':
+                    negate = '' if negate else '-'
+                    name = 'unread'
+                if name not in IS_LABELS:
+                    return None
+                label = IS_LABELS[name]
+            else:
+                label = IN_LABELS.get(name, value) if op == 'in' else value
+            if label.upper() in ('SPAM', 'TRASH'):
+                include_hidden = True
+            # Name → ID on the small labels table, then the (label_id, message_id) key
+            clause = """m.id IN (
+                SELECT message_id FROM message_labels
+                WHERE label_id = upper(?) OR label_id IN (
+                    SELECT id FROM labels
+                    WHERE id = ? OR lower(replace(name, ' ', '-')) = lower(replace(?, ' ', '-'))
+                )
+            )"""
+            args = [label, label, label]
+        elif op in ('after', 'before'):
+            try:
+                ms = parse_date(value)
+            except ValueError:
+                return None
+            clause = "m.internal_date >= ?" if op == 'after' else "m.internal_date < ?"
+            args = [ms]
+        elif op in ('newer_than', 'older_than'):
+            match = re.fullmatch(r'(\d+)([dmy])', value.lower())
+            if not match:
+                return None
+            cutoff = int((time.time() - int(match.group(1)) * RELATIVE_UNITS[match.group(2)]) * 1000)
+            clause = "m.internal_date >= ?" if op == 'newer_than' else "m.internal_date < ?"
+            args = [cutoff]
+        else:
+            return None
+
+        clauses.append(f"NOT {clause}" if negate else clause)
+        params.extend(args)
+
+    # Like Gmail, spam and trash only show up when asked for
+    if not include_hidden:
+        clauses.append("""NOT EXISTS (
+            SELECT 1 FROM message_labels ml
+            WHERE ml.message_id = m.id AND ml.label_id IN ('SPAM', 'TRASH')
+        )""")
+
+    # FTS5's NOT is binary ("a NOT b"), so negative-only text goes in a subquery
+    match = " AND ".join(positive) + "".join(f" NOT {term}" for term in negative) if positive else None
+    if negative and not positive:
+        clauses.append("m.rowid NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+        params.append(" OR ".join(negative))
+    return " AND ".join(clauses), params, match
+
+
+def date_floor(query):
+    """
+    The earliest internalDate (epoch ms) a query can match, from its
+    after:/newer_than: terms (0 if it has none).
+
+    Returns:
+        (floor, only_dates) - only_dates is True when the query has no other terms
+    """
+    floor, only_dates = 0, True
+    for negate, op, value in TOKEN_RE.findall(query or ''):
+        op = op.lower()
+        if not negate and op == 'after':
+            try:
+                floor = max(floor, parse_date(value))
+                continue
+            except ValueError:
+                pass
+        elif not negate and op == 'newer_than':
+            match = re.fullmatch(r'(\d+)([dmy])', value.lower())
+            if match:
+                cutoff = int((time.time() - int(match.group(1)) * RELATIVE_UNITS[match.group(2)]) * 1000)
+                floor = max(floor, cutoff)
+                continue
+        only_dates = False
+    return floor, only_dates
+
+
+class Mirror:
+    """A mailbox's local store. Use Mirror.open() / Mirror.open_existing()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        has_fts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone() is not None
+        self.conn.executescript(FTS_SCHEMA)
+        if not has_fts:
+            # Mirror from before the index existed: build it from stored messages
+            self.conn.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+            self.conn.commit()
+
+    @classmethod
+    def open(cls, user_email):
+        """Open the mirror for a mailbox, creating it (owner-only) if needed."""
+        private_dir(MIRROR_DIR)
+        return cls(private_file(mirror_path(user_email)))
+
+    @classmethod
+    def open_existing(cls, user_email, max_age=None):
+        """
+        Open the mirror if a completed sync exists, else None.
+
+        Args:
+            user_email: Mailbox
+            max_age: Also None if the last sync is older than this many seconds
+        """
+        path = mirror_path(user_email)
+        if not os.path.exists(path):
+            return None
+        mirror = cls(path)
+        synced_at = int(mirror.get_state('syncedAt') or 0)
+        if mirror.get_state('historyId') is None or (max_age is not None and time.time() - synced_at > max_age):
+            mirror.close()
+            return None
+        return mirror
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # --- state ---------------------------------------------------------------
+
+    def get_state(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def commit(self):
+        self.conn.commit()
+
+    # --- writes --------------------------------------------------------------
+
+    def clear(self):
+        """Drop all messages and sync state (before a full sync)."""
+        self.conn.executescript("""
+            DELETE FROM messages; DELETE FROM message_labels; DELETE FROM state;
+            INSERT INTO messages_fts (messages_fts) VALUES ('delete-all');
+        """)
+
+    def save_labels(self, labels):
+        """Replace the label ID → name table (labels.list output)."""
+        self.conn.execute("DELETE FROM labels")
+        self.conn.executemany("INSERT INTO labels (id, name) VALUES (?, ?)",
+                              [(label['id'], label.get('name', '')) for label in labels])
+
+    def upsert(self, message):
+        """Store a parsed message (gmail.parse_message output)."""
+        self.conn.execute("""
+            INSERT INTO messages
+                (id, thread_id, internal_date, snippet, from_addr, to_addr, cc, bcc, subject, date, body, labels)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                thread_id = excluded.thread_id, internal_date = excluded.internal_date,
+                snippet = excluded.snippet, from_addr = excluded.from_addr, to_addr = excluded.to_addr,
+                cc = excluded.cc, bcc = excluded.bcc, subject = excluded.subject, date = excluded.date,
+                body = excluded.body, labels = excluded.labels
+        """, (
+            message['id'], message['threadId'], int(message.get('internalDate') or 0),
+            message.get('snippet', ''), message.get('from', ''), message.get('to', ''),
+            message.get('cc', ''), message.get('bcc', ''), message.get('subject', ''),
+            message.get('date', ''), message.get('body', ''), json.dumps(message.get('labels', [])),
+        ))
+        self._set_label_rows(message['id'], message.get('labels', []))
+
+    def set_labels(self, message_id, label_ids):
+        """Update a stored message's labels; returns False if it isn't mirrored."""
+        cursor = self.conn.execute("UPDATE messages SET labels = ? WHERE id = ?",
+                                   (json.dumps(label_ids), message_id))
+        if cursor.rowcount == 0:
+            return False
+        self._set_label_rows(message_id, label_ids)
+        return True
+
+    def delete(self, message_id):
+        """Remove a message; returns False if it wasn't mirrored."""
+        self.conn.execute("DELETE FROM message_labels WHERE message_id = ?", (message_id,))
+        return self.conn.execute("DELETE FROM messages WHERE id = ?", (message_id,)).rowcount > 0
+
+    def _set_label_rows(self, message_id, label_ids):
+        self.conn.execute("DELETE FROM message_labels WHERE message_id = ?", (message_id,))
+        self.conn.executemany("INSERT OR IGNORE INTO message_labels (label_id, message_id) VALUES (?, ?)",
+                              [(label_id, message_id) for label_id in label_ids])
+
+    # --- reads ---------------------------------------------------------------
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def oldest_date(self):
+        """internalDate (epoch ms) of the oldest stored message, or None if empty."""
+        return self.conn.execute("SELECT MIN(internal_date) FROM messages").fetchone()[0]
+
+    def set_coverage(self, sync_query, capped):
+        """
+        Record after a full sync from when on the mirror holds every message.
+
+        A sync limited only by after:/newer_than: (or not at all) holds all mail
+        since its date floor, or since its oldest message when max_messages cut
+        it short. Any other sync query copies an arbitrary subset: no coverage.
+        """
+        floor, only_dates = date_floor(sync_query)
+        if not only_dates:
+            self.conn.execute("DELETE FROM state WHERE key = 'coveredSince'")
+            return
+        self.set_state('coveredSince', (self.oldest_date() or 0) if capped else floor)
+
+    def covered_since(self):
+        """Epoch ms from which every message is mirrored, or None if unknown."""
+        value = self.get_state('coveredSince')
+        return int(value) if value is not None else None
+
+    def list_messages(self, query=None, max_results=10):
+        """
+        Newest-first summaries matching a Gmail query, same shape as gmail.list_messages().
+
+        Only answered locally when that's exact: either max_results matches were
+        found (everything newer than them is mirrored), or the query's date
+        floor lies inside the mirrored window.
+
+        Returns:
+            List of summaries, or None if the query must go to the API
+        """
+        covered_since = self.covered_since()
+        compiled = compile_query(query)
+        if compiled is None or covered_since is None:
+            return None
+        where, params, match = compiled
+        if match:
+            where = " AND ".join(filter(None, [where, "m.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)"]))
+            params = [*params, match]
+        rows = self.conn.execute(f"""
+            SELECT {SUMMARY_COLUMNS} FROM messages m
+            WHERE {where or '1'}
+            ORDER BY m.internal_date DESC
+            LIMIT ?
+        """, (*params, max_results))
+        results = [self._summary(row) for row in rows]
+        if len(results) < max_results and date_floor(query)[0] < covered_since:
+            return None  # older matches may exist beyond what was synced
+        return results
+
+    def search(self, query, max_results=20):
+        """
+        Full-text search, best matches first (BM25 over subject, from, to, snippet, body).
+
+        Queries without text terms (only label:/after:/...) come back newest first.
+
+        Returns:
+            Summaries with a 'score' (higher is better)
+
+        Raises:
+            ValueError: If the query uses operators the local index can't answer
+        """
+        compiled = compile_query(query)
+        if compiled is None:
+            raise ValueError(f"Query not supported by local search (use list --query for the API): {query}")
+        where, params, match = compiled
+        if not match:
+            return [dict(self._summary(row), score=0.0) for row in self.conn.execute(f"""
+                SELECT {SUMMARY_COLUMNS} FROM messages m
+                WHERE {where or '1'}
+                ORDER BY m.internal_date DESC
+                LIMIT ?
+            """, (*params, max_results))]
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        try:
+            rows = self.conn.execute(f"""
+                SELECT {SUMMARY_COLUMNS}, bm25(messages_fts, {weights}) AS rank
+                FROM messages_fts
+                JOIN messages m ON m.rowid = messages_fts.rowid
+                WHERE messages_fts MATCH ? AND {where or '1'}
+                ORDER BY rank
+                LIMIT ?
+            """, (match, *params, max_results)).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}")
+        # bm25() is lower-is-better; flip it so scores read naturally
+        return [dict(self._summary(row), score=round(-row[8], 4)) for row in rows]
+
+    @staticmethod
+    def _summary(row):
+        return {
+            'id': row[0],
+            'threadId': row[1],
+            'snippet': row[2],
+            'from': row[3],
+            'to': row[4],
+            'subject': row[5],
+            'date': row[6],
+            'internalDate': str(row[7]),
+        }
+
+    def get_message(self, message_id):
+        """A mirrored message in gmail.get_message() shape, or None."""
+        row = self.conn.execute("""
+            SELECT id, thread_id, snippet, from_addr, to_addr, cc, bcc, subject, date, internal_date, body, labels
+            FROM messages WHERE id = ?
+        """, (message_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'threadId': row[1],
+            'snippet': row[2],
+            'from': row[3],
+            'to': row[4],
+            'cc': row[5],
+            'bcc': row[6],
+            'subject': row[7],
+            'date': row[8],
+            'internalDate': str(row[9]),
+            'body': row[10],
+            'labels': json.loads(row[11] or '[]'),
+        }
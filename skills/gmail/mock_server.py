@@ -0,0 +1,588 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gmail, Drive and Docs REST endpoints the skills call.
+
+Serves a synthetic mailbox and drive (deterministic for a given --seed), with
+optional per-request latency and injected 429s, so gmail.py, drive.py and
+async_client.py can be exercised and benchmarked offline. Every user sees the
+same data; no auth is checked. fields= projections, gzip, keep-alive and Gmail
+batch requests behave like the real APIs.
+
+Usage:
+    mock_server.py [--port 8765] [--messages 2000] [--files 200] [--latency-ms 0] [--fault-rate 0]
+    GOOGLE_API_ROOT=http://127.0.0.1:8765/ gmail.py --user anyone@example.com list
+
+Point clients at it with GOOGLE_API_ROOT (see auth.py): services then use
+anonymous credentials, so no service account key is needed. --port 0 picks a
+free port; the first line printed is {"url": ...}. GET /_mock/stats returns
+request, call and fault counters.
+"""
+import argparse
+import base64
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+GOOGLE_DOC_MIME = 'application/vnd.google-apps.document'
+GOOGLE_SHEET_MIME = 'application/vnd.google-apps.spreadsheet'
+GOOGLE_SLIDE_MIME = 'application/vnd.google-apps.presentation'
+GOOGLE_FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+WORDS = ('quarterly budget meeting invoice report design review launch customer project deadline '
+         'travel offsite hiring roadmap contract renewal feedback update summary agenda notes draft '
+         'analytics pipeline migration security incident release planning').split()
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace', 'heidi']
+LABELS = [
+    {'id': 'INBOX', 'name': 'INBOX', 'type': 'system'},
+    {'id': 'UNREAD', 'name': 'UNREAD', 'type': 'system'},
+    {'id': 'STARRED', 'name': 'STARRED', 'type': 'system'},
+    {'id': 'SENT', 'name': 'SENT', 'type': 'system'},
+    {'id': 'Label_1', 'name': 'Receipts', 'type': 'user'},
+    {'id': 'Label_2', 'name': 'Work Stuff', 'type': 'user'},
+]
+# Text parts bigger than this come back as an attachmentId, as Gmail does for large bodies
+INLINE_BODY_LIMIT = 1024 * 1024
+# Responses at least this big are gzipped when the client accepts it
+GZIP_MIN_BYTES = 1024
+# Newest synthetic message; older ones are spaced an hour apart
+NEWEST_MS = 1767225600000  # 2026-01-01
+
+# Counters for benchmarks: {"requests", "calls", "faults"}
+STATS_PATH = '/_mock/stats'
+
+DATE_TERM_RE = re.compile(r'(after|before):(\S+)', re.IGNORECASE)
+BATCH_PART_RE = re.compile(r'^(GET|POST|PUT|PATCH|DELETE) (\S+) HTTP/1\.1\n(.*?)\n\n(.*)$', re.DOTALL)
+
+
+def b64(data):
+    """base64url without padding, as Gmail returns it."""
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def parse_fields(spec):
+    """
+    Parse a fields= mask ("a,b(c,d/e),f/g") into a tree {name: subtree or None}.
+    """
+    return _parse_fields(spec.replace(' ', ''), 0)[0]
+
+
+def _parse_fields(spec, pos):
+    tree = {}
+    while pos < len(spec):
+        match = re.match(r'[A-Za-z0-9_*]+', spec[pos:])
+        if not match:
+            break
+        path = [match.group(0)]
+        pos += match.end()
+        while pos < len(spec) and spec[pos] == '/':
+            match = re.match(r'[A-Za-z0-9_*]+', spec[pos + 1:])
+            path.append(match.group(0))
+            pos += 1 + match.end()
+        subtree = None
+        if pos < len(spec) and spec[pos] == '(':
+            subtree, pos = _parse_fields(spec, pos + 1)
+            pos += 1  # ')'
+        for name in reversed(path[1:]):
+            subtree = {name: subtree}
+        tree[path[0]] = _merge(tree[path[0]], subtree) if path[0] in tree else subtree
+        if pos < len(spec) and spec[pos] == ',':
+            pos += 1
+        elif pos < len(spec) and spec[pos] == ')':
+            break
+    return tree, pos
+
+
+def _merge(a, b):
+    if a is None or b is None:
+        return None
+    merged = dict(a)
+    for key, value in b.items():
+        merged[key] = _merge(merged.get(key), value) if key in merged else value
+    return merged
+
+
+def project(value, tree):
+    """Apply a parsed fields= mask to a response."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if '*' in tree:
+        return value
+    return {key: project(value[key], sub) for key, sub in tree.items() if key in value}
+
+
+class Dataset:
+    """Synthetic mailbox and drive."""
+
+    def __init__(self, messages=2000, files=200, body_chars=2000, file_chars=20000, seed=1,
+                 inline_limit=INLINE_BODY_LIMIT):
+        rng = random.Random(seed)
+        self.inline_limit = inline_limit
+        self.lock = threading.Lock()
+        self.messages = {}
+        self.order = []
+        self.threads = {}
+        self.attachments = {}
+        for i in range(messages):
+            message = self._message(rng, i, body_chars)
+            self.messages[message['id']] = message
+            self.order.append(message['id'])
+            self.threads.setdefault(message['threadId'], []).append(message['id'])
+        self.files = {}
+        self.file_order = []
+        for i in range(files):
+            item = self._file(rng, i, file_chars)
+            self.files[item['id']] = item
+            self.file_order.append(item['id'])
+        self.drafts = 0
+        self._documents = {}
+
+    def document(self, file_id):
+        """documents.get resource for a Google Doc (built on first use)."""
+        document = self._documents.get(file_id)
+        if document is None:
+            document = self._documents[file_id] = document_view(self.files[file_id])
+        return document
+
+    def _text(self, rng, chars):
+        words, size = [], 0
+        while size < chars:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        lines = [' '.join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        return '\n'.join(lines)[:chars]
+
+    def _message(self, rng, i, body_chars):
+        message_id = f'{0x18c0000000 + i:x}'
+        internal_date = NEWEST_MS - i * 3600 * 1000
+        sender, recipient = rng.sample(PEOPLE, 2)
+        subject = ' '.join(rng.choice(WORDS) for _ in range(4)).capitalize()
+        text = self._text(rng, body_chars)
+        date = datetime.fromtimestamp(internal_date / 1000, timezone.utc).strftime('%a, %d %b %Y %H:%M:%S +0000')
+        headers = [
+            {'name': 'From', 'value': f'{sender.title()} <{sender}@example.com>'},
+            {'name': 'To', 'value': f'{recipient}@example.com'},
+            {'name': 'Subject', 'value': subject},
+            {'name': 'Date', 'value': date},
+            {'name': 'Content-Type', 'value': 'multipart/mixed; boundary="b1"'},
+        ]
+        html = '<html><body>' + ''.join(f'<p>{line}</p>' for line in text.split('\n')) + '</body></html>'
+        alternative = {
+            'partId': '0', 'mimeType': 'multipart/alternative', 'filename': '', 'headers': [],
+            'body': {'size': 0},
+            'parts': [
+                {'partId': '0.0', 'mimeType': 'text/plain', 'filename': '',
+                 'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+                 'body': {'size': len(text), 'data': b64(text.encode())}},
+                {'partId': '0.1', 'mimeType': 'text/html', 'filename': '',
+                 'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="UTF-8"'}],
+                 'body': {'size': len(html), 'data': b64(html.encode())}},
+            ],
+        }
+        for part in alternative['parts']:
+            data = part['body']['data']
+            if len(data) > self.inline_limit:
+                attachment_id = f'body{i}-{part["partId"]}'
+                self.attachments[attachment_id] = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+                part['body'] = {'size': part['body']['size'], 'attachmentId': attachment_id}
+        parts = [alternative]
+        if i % 10 == 0:
+            attachment_id = f'att{i}'
+            data = rng.randbytes(20 * 1024)
+            self.attachments[attachment_id] = data
+            parts.append({
+                'partId': '1', 'mimeType': 'application/pdf', 'filename': f'report-{i}.pdf',
+                'headers': [{'name': 'Content-Disposition', 'value': f'attachment; filename="report-{i}.pdf"'}],
+                'body': {'size': len(data), 'attachmentId': attachment_id},
+            })
+        labels = ['INBOX'] + (['UNREAD'] if rng.random() < 0.3 else []) + (['Label_1'] if rng.random() < 0.1 else [])
+        return {
+            'id': message_id,
+            'threadId': f'{0x18c0000000 + i - i % 3:x}',
+            'labelIds': labels,
+            'snippet': text[:120].replace('\n', ' '),
+            'historyId': '1000',
+            'internalDate': str(internal_date),
+            'sizeEstimate': body_chars * 3,
+            'payload': {'partId': '', 'mimeType': 'multipart/mixed', 'filename': '', 'headers': headers,
+                        'body': {'size': 0}, 'parts': parts},
+        }
+
+    def _file(self, rng, i, file_chars):
+        kind = [GOOGLE_DOC_MIME, GOOGLE_DOC_MIME, GOOGLE_SHEET_MIME, 'text/plain', 'application/pdf',
+                GOOGLE_FOLDER_MIME, GOOGLE_SLIDE_MIME][i % 7]
+        name = f"{' '.join(rng.choice(WORDS) for _ in range(3)).title()} {i}"
+        modified = datetime.fromtimestamp(NEWEST_MS / 1000 - i * 86400, timezone.utc)
+        item = {
+            'id': f'file{i:05d}',
+            'name': name,
+            'mimeType': kind,
+            'modifiedTime': modified.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'createdTime': modified.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'parents': ['root'],
+            'webViewLink': f'https://docs.example.com/{i}',
+            'owners': [{'emailAddress': f'{rng.choice(PEOPLE)}@example.com'}],
+            'description': '',
+            '_text': '' if kind == GOOGLE_FOLDER_MIME else self._text(rng, file_chars),
+        }
+        if kind not in (GOOGLE_DOC_MIME, GOOGLE_SHEET_MIME, GOOGLE_SLIDE_MIME, GOOGLE_FOLDER_MIME):
+            item['size'] = str(len(item['_text']))
+        return item
+
+    # --- Queries ---------------------------------------------------------------
+
+    def search_messages(self, query):
+        """Message IDs, newest first, for the subset of Gmail search the mock understands."""
+        query = query or ''
+        after = before = None
+        for op, value in DATE_TERM_RE.findall(query):
+            ms = int(value) * 1000 if value.isdigit() else int(
+                datetime.strptime(value.replace('-', '/'), '%Y/%m/%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+            if op.lower() == 'after':
+                after = ms
+            else:
+                before = ms
+        words = [w.lower() for w in DATE_TERM_RE.sub('', query).split()]
+        result = []
+        for message_id in self.order:
+            message = self.messages[message_id]
+            date = int(message['internalDate'])
+            if (after is not None and date < after) or (before is not None and date >= before):
+                continue
+            if 'is:unread' in words and 'UNREAD' not in message['labelIds']:
+                continue
+            if 'in:inbox' in words and 'INBOX' not in message['labelIds']:
+                continue
+            senders = [w[5:] for w in words if w.startswith('from:')]
+            if senders and not any(s in json.dumps(message['payload']['headers'][0]).lower() for s in senders):
+                continue
+            result.append(message_id)
+        return result
+
+    def search_files(self, query):
+        query = query or ''
+        names = [n.lower() for n in re.findall(r"name contains '((?:[^'\\]|\\.)*)'", query)]
+        mime_types = re.findall(r"mimeType = '([^']*)'", query)
+        parents = re.findall(r"'([^']*)' in parents", query)
+        result = []
+        for file_id in self.file_order:
+            item = self.files[file_id]
+            if any(n.replace("\\'", "'") not in item['name'].lower() for n in names):
+                continue
+            if mime_types and item['mimeType'] not in mime_types:
+                continue
+            if parents and not set(parents) & set(item['parents']):
+                continue
+            result.append(file_id)
+        return result
+
+
+def message_view(message, fmt, metadata_headers=None):
+    """A message as messages.get returns it for the given format."""
+    if fmt == 'minimal':
+        return {k: message[k] for k in ('id', 'threadId', 'labelIds', 'snippet', 'historyId',
+                                        'internalDate', 'sizeEstimate')}
+    if fmt == 'metadata':
+        view = message_view(message, 'minimal')
+        wanted = {h.lower() for h in metadata_headers or []}
+        headers = [h for h in message['payload']['headers'] if not wanted or h['name'].lower() in wanted]
+        view['payload'] = {'partId': '', 'mimeType': message['payload']['mimeType'], 'headers': headers}
+        return view
+    return message
+
+
+def document_view(item):
+    """Docs API document for a Google Doc: one paragraph per line, a table every 50 lines."""
+    content = [{'sectionBreak': {'sectionStyle': {'columnSeparatorStyle': 'NONE'}}}]
+    for n, line in enumerate(item['_text'].split('\n')):
+        style = {'namedStyleType': 'NORMAL_TEXT', 'direction': 'LEFT_TO_RIGHT', 'lineSpacing': 115}
+        content.append({'paragraph': {'elements': [{'textRun': {
+            'content': line + '\n', 'textStyle': {'fontSize': {'magnitude': 11, 'unit': 'PT'}}}}],
+            'paragraphStyle': style}})
+        if n % 50 == 49:
+            cell = {'content': [{'paragraph': {'elements': [{'textRun': {'content': f'cell {n}\n'}}]}}]}
+            content.append({'table': {'rows': 1, 'columns': 2, 'tableRows': [{'tableCells': [cell, cell]}]}})
+    return {'documentId': item['id'], 'title': item['name'], 'body': {'content': content},
+            'documentStyle': {'pageSize': {'height': {'magnitude': 792}, 'width': {'magnitude': 612}}},
+            'revisionId': 'r1'}
+
+
+class MockGoogleServer:
+    """
+    The stand-in server. start() runs it on a background thread; url is the
+    GOOGLE_API_ROOT to use.
+    """
+
+    def __init__(self, dataset=None, port=0, latency_ms=0, jitter_ms=0, fault_rate=0.0, seed=1):
+        self.dataset = dataset or Dataset(seed=seed)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.fault_rate = fault_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self.calls = 0
+        self.faults = 0
+        self.httpd = _Server(('127.0.0.1', port), _handler(self))
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _fault(self):
+        with self.rng_lock:
+            self.calls += 1
+            hit = self.fault_rate and self.rng.random() < self.fault_rate
+            if hit:
+                self.faults += 1
+            return hit
+
+    def stats(self):
+        """HTTP requests, API calls (batch parts count one each) and injected 429s so far."""
+        with self.rng_lock:
+            return {'requests': self.requests, 'calls': self.calls, 'faults': self.faults}
+
+    def _delay(self):
+        with self.rng_lock:
+            self.requests += 1
+            delay = self.latency + (self.rng.random() * self.jitter if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+    # --- Routing ---------------------------------------------------------------
+
+    def dispatch(self, method, target, body):
+        """
+        Handle one REST call.
+
+        Returns:
+            (status, content_type, body bytes, extra headers)
+        """
+        url = urlsplit(target)
+        params = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path
+        if self._fault():
+            return _json(429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                                         'errors': [{'reason': 'rateLimitExceeded'}]}}, {'Retry-After': '0'})
+        try:
+            status, result = self._route(method, path, params, body)
+        except KeyError as e:
+            status, result = 404, {'error': {'code': 404, 'message': f'Not Found: {e}'}}
+        if isinstance(result, bytes):
+            return status, 'text/plain; charset=utf-8', result, {}
+        if result is None:
+            return status, 'application/json', b'', {}
+        if 'fields' in params and status < 400:
+            result = project(result, parse_fields(params['fields']))
+        return _json(status, result)
+
+    def _route(self, method, path, params, body):
+        data = self.dataset
+        match = re.match(r'^/gmail/v1/users/[^/]+/(.*)$', path)
+        if match:
+            rest = match.group(1)
+            if rest == 'messages' and method == 'GET':
+                ids = data.search_messages(params.get('q'))
+                start = int(params.get('pageToken', 0))
+                size = min(int(params.get('maxResults', 100)), 500)
+                page = {'messages': [{'id': i, 'threadId': data.messages[i]['threadId']}
+                                     for i in ids[start:start + size]],
+                        'resultSizeEstimate': len(ids)}
+                if start + size < len(ids):
+                    page['nextPageToken'] = str(start + size)
+                if not page['messages']:
+                    del page['messages']
+                return 200, page
+            if rest == 'messages/batchModify' and method == 'POST':
+                request = json.loads(body or b'{}')
+                with data.lock:
+                    for message_id in request.get('ids', []):
+                        labels = data.messages[message_id]['labelIds']
+                        labels[:] = [l for l in labels if l not in request.get('removeLabelIds', [])]
+                        labels += [l for l in request.get('addLabelIds', []) if l not in labels]
+                return 204, None
+            match = re.match(r'^messages/([^/]+)/attachments/([^/]+)$', rest)
+            if match:
+                raw = data.attachments[match.group(2)]
+                return 200, {'size': len(raw), 'data': b64(raw)}
+            match = re.match(r'^messages/([^/]+)$', rest)
+            if match and method == 'GET':
+                headers = params.get('metadataHeaders')
+                headers = [headers] if isinstance(headers, str) else headers
+                return 200, message_view(data.messages[match.group(1)], params.get('format', 'full'), headers)
+            match = re.match(r'^threads/([^/]+)$', rest)
+            if match:
+                ids = data.threads[match.group(1)]
+                return 200, {'id': match.group(1), 'historyId': '1000', 'messages': [
+                    message_view(data.messages[i], params.get('format', 'full')) for i in reversed(ids)]}
+            if rest == 'profile':
+                return 200, {'emailAddress': 'user@example.com', 'messagesTotal': len(data.messages),
+                             'threadsTotal': len(data.threads), 'historyId': '1000'}
+            if rest == 'labels':
+                return 200, {'labels': LABELS}
+            if rest == 'history':
+                return 200, {'historyId': '1000'}
+            if rest == 'drafts' and method == 'POST':
+                with data.lock:
+                    data.drafts += 1
+                    n = data.drafts
+                return 200, {'id': f'r-{n}', 'message': {'id': f'draft{n:x}', 'threadId': f'draft{n:x}',
+                                                         'labelIds': ['DRAFT']}}
+        match = re.match(r'^/drive/v3/files(?:/([^/]+))?(/export)?$', path)
+        if match:
+            file_id, export = match.groups()
+            if file_id is None:
+                ids = data.search_files(params.get('q'))
+                start = int(params.get('pageToken', 0))
+                size = int(params.get('pageSize', 100))
+                page = {'kind': 'drive#fileList', 'incompleteSearch': False,
+                        'files': [_file_view(data.files[i]) for i in ids[start:start + size]]}
+                if start + size < len(ids):
+                    page['nextPageToken'] = str(start + size)
+                return 200, page
+            item = data.files[file_id]
+            if export:
+                text = item['_text']
+                if item['mimeType'] == GOOGLE_SHEET_MIME:
+                    text = '\n'.join(','.join(line.split()[:6]) for line in text.split('\n'))
+                return 200, text.encode()
+            if params.get('alt') == 'media':
+                return 200, item['_text'].encode()
+            return 200, _file_view(item)
+        match = re.match(r'^/v1/documents/([^/]+)$', path)
+        if match:
+            item = data.files[match.group(1)]
+            if item['mimeType'] != GOOGLE_DOC_MIME:
+                return 400, {'error': {'code': 400, 'message': 'This operation is not supported for this document'}}
+            return 200, data.document(item['id'])
+        return 404, {'error': {'code': 404, 'message': f'No route for {method} {path}'}}
+
+    def dispatch_batch(self, content_type, body):
+        """Handle a multipart/mixed Gmail batch request; returns (content_type, body)."""
+        boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1)
+        text = body.decode('utf-8')
+        out_boundary = 'batch_mock_boundary'
+        out = []
+        for part in text.replace('\r\n', '\n').split('--' + boundary)[1:]:
+            if part.startswith('--'):
+                break
+            head, _, request = part.lstrip('\n').partition('\n\n')
+            content_id = re.search(r'Content-ID: <([^>]+)>', head, re.IGNORECASE)
+            method, target, _, sub_body = BATCH_PART_RE.match(request.strip('\n') + '\n\n').groups()
+            status, sub_type, sub_content, extra = self.dispatch(method, target, sub_body.strip().encode() or None)
+            extra_headers = ''.join(f'{k}: {v}\r\n' for k, v in extra.items())
+            out.append(
+                f'--{out_boundary}\r\nContent-Type: application/http\r\n'
+                f'Content-ID: <response-{content_id.group(1) if content_id else len(out)}>\r\n\r\n'
+                f'HTTP/1.1 {status} {_reason(status)}\r\nContent-Type: {sub_type}\r\n{extra_headers}\r\n'
+                f'{sub_content.decode("utf-8")}\r\n')
+        return f'multipart/mixed; boundary={out_boundary}', (''.join(out) + f'--{out_boundary}--').encode()
+
+
+def _file_view(item):
+    return {k: v for k, v in item.items() if not k.startswith('_')}
+
+
+def _json(status, result, headers=None):
+    return status, 'application/json; charset=UTF-8', json.dumps(result).encode(), headers or {}
+
+
+def _reason(status):
+    return {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found', 429: 'Too Many Requests'}.get(status, '')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Async clients open hundreds of connections at once; the default backlog of 5 drops SYNs
+    request_queue_size = 1024
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        disable_nagle_algorithm = True
+
+        def _handle(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            if self.path == STATS_PATH:
+                status, content_type, content, extra = _json(200, server.stats())
+            elif urlsplit(self.path).path.startswith('/batch'):
+                server._delay()
+                if server._fault():
+                    status, content_type, content, extra = _json(
+                        429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded'}}, {'Retry-After': '0'})
+                else:
+                    status, extra = 200, {}
+                    content_type, content = server.dispatch_batch(self.headers.get('Content-Type', ''), body)
+            else:
+                server._delay()
+                status, content_type, content, extra = server.dispatch(self.command, self.path, body)
+            encoding = None
+            if len(content) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                content, encoding = gzip.compress(content, 5), 'gzip'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            for name, value in extra.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Gmail, Drive and Docs APIs')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages in the mailbox (default: 2000)')
+    parser.add_argument('--files', type=int, default=200, help='Files in the drive (default: 200)')
+    parser.add_argument('--body-chars', type=int, default=2000, help='Characters per message body (default: 2000)')
+    parser.add_argument('--file-chars', type=int, default=20000, help='Characters per file/doc (default: 20000)')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every HTTP request')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random extra delay, up to this much')
+    parser.add_argument('--fault-rate', type=float, default=0, help='Fraction of calls answered with 429 (0-1)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic data and faults')
+    args = parser.parse_args()
+
+    dataset = Dataset(args.messages, args.files, args.body_chars, args.file_chars, args.seed)
+    server = MockGoogleServer(dataset, args.port, args.latency_ms, args.jitter_ms, args.fault_rate, args.seed)
+    print(json.dumps({'url': server.url, 'messages': args.messages, 'files': args.files}), flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
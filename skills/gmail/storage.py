@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Owner-only files for the Gmail skill's local data.
+
+The mirror, message cache and attachment store hold full message bodies, so
+like the token cache they are kept out of reach of other users: directories
+0700, files 0600. SQLite gives its -wal/-shm/-journal files the mode of the
+database file, so creating that file 0600 up front covers them too.
+"""
+import os
+
+
+def private_dir(path):
+    """Create a directory (and parents) only the owner can enter; tightens one that exists."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    os.chmod(path, 0o700)
+
+
+def private_file(path):
+    """Create an empty file only the owner can read if it's missing; tightens one that exists."""
+    os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)
+    return path
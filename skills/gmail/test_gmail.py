@@ -0,0 +1,1408 @@
+#!/usr/bin/env python3
+"""
+Tests for gmail.py and its helpers (mirror, mime, cache).
+
+Offline: API calls go to mock_server.py on a local port (GOOGLE_API_ROOT),
+and the mirror/cache live in a temporary directory.
+Usage: python test_gmail.py
+"""
+
+import base64
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+USER = "test@example.com"
+
+
+def b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def parsed_message(id: str, subject: str, sender: str, body: str, labels: list[str], date_ms: int) -> dict:
+    """A message in gmail.parse_message() shape, for Mirror.upsert()."""
+    return {
+        "id": id, "threadId": id, "snippet": body[:40], "from": sender, "to": "me@example.com",
+        "cc": "", "bcc": "", "subject": subject, "date": "", "internalDate": str(date_ms),
+        "body": body, "labels": labels,
+    }
+
+
+@contextmanager
+def mock_api(**dataset_args):
+    """Run mock_server.py with a synthetic mailbox; mirror, cache and attachments go to a temp dir."""
+    import attachments
+    import auth
+    import cache
+    import mirror
+    from mock_server import Dataset, MockGoogleServer
+
+    server = MockGoogleServer(Dataset(**dataset_args)).start()
+    old = (os.environ.get(auth.API_ROOT_ENV), cache.CACHE_DIR, mirror.MIRROR_DIR, attachments.ATTACHMENTS_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ[auth.API_ROOT_ENV] = server.url
+        cache.CACHE_DIR = os.path.join(tmp, "cache")
+        mirror.MIRROR_DIR = os.path.join(tmp, "mirror")
+        attachments.ATTACHMENTS_DIR = os.path.join(tmp, "attachments")
+        try:
+            yield server
+        finally:
+            server.stop()
+            if old[0] is None:
+                os.environ.pop(auth.API_ROOT_ENV, None)
+            else:
+                os.environ[auth.API_ROOT_ENV] = old[0]
+            cache.CACHE_DIR, mirror.MIRROR_DIR, attachments.ATTACHMENTS_DIR = old[1:]
+
+
+@contextmanager
+def no_quota(api="gmail", user=USER):
+    """Lift the (api, user) token bucket, for tests that make hundreds of calls."""
+    import auth
+
+    bucket = auth.get_limiter(api, user)
+    old = (bucket.rate, bucket.capacity)
+    bucket.rate = bucket.capacity = bucket.tokens = 1e9
+    try:
+        yield bucket
+    finally:
+        bucket.rate, bucket.capacity = old
+        bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+
+def test_mirror_queries():
+    """Test Gmail query → SQL translation, negation and spam/trash hiding."""
+    print("\n=== Mirror Query Test ===\n", flush=True)
+
+    from mirror import Mirror, compile_query, parse_date
+
+    mirror = Mirror(":memory:")
+    mirror.save_labels([{"id": "Label_1", "name": "Work Stuff"}])
+    jan, feb, mar = parse_date("2024/01/15"), parse_date("2024/02/15"), parse_date("2024/03/15")
+    for message in [
+        parsed_message("m1", "Budget review", "Alice <alice@example.com>", "quarterly budget numbers",
+                       ["INBOX", "UNREAD", "Label_1"], jan),
+        parsed_message("m2", "Lunch", "Bob <bob@example.com>", "tacos on friday", ["INBOX"], feb),
+        parsed_message("m3", "Budget spam", "Spammer <x@spam.example>", "cheap budget pills", ["SPAM"], mar),
+        parsed_message("m4", "Old invoice", "Alice <alice@example.com>", "invoice attached", ["TRASH"], mar),
+    ]:
+        mirror.upsert(message)
+    mirror.set_coverage("", capped=False)
+    mirror.commit()
+
+    def ids(query):
+        return [m["id"] for m in mirror.list_messages(query, max_results=10)]
+
+    print("1. TEST operator translation", flush=True)
+    assert ids("from:alice budget") == ["m1"]
+    assert ids("subject:lunch") == ["m2"]
+    assert ids("label:work-stuff") == ["m1"], "label: should match by name"
+    assert ids("label:Label_1") == ["m1"], "label: should match by ID"
+    assert ids("is:unread") == ["m1"]
+    assert ids("after:2024/02/01") == ["m2"]
+    assert ids("before:2024/02/01") == ["m1"]
+    assert ids('"tacos on"') == ["m2"]
+    print("    ✓ from:, subject:, label:, is:, after:, before: and phrases", flush=True)
+
+    print("\n2. TEST negation", flush=True)
+    assert ids("-from:alice") == ["m2"]
+    assert ids("is:read") == ["m2"], "is:read should be NOT UNREAD"
+    assert ids("-is:unread") == ["m2"]
+    assert ids("budget -review") == []
+    assert ids("-budget") == ["m2"], "negative-only text should work without a positive term"
+    print("    ✓ -operator, -word and is:read", flush=True)
+
+    print("\n3. TEST spam/trash hidden unless asked for", flush=True)
+    assert ids("budget") == ["m1"], "spam should be hidden"
+    assert ids("in:spam") == ["m3"]
+    assert ids("in:trash") == ["m4"]
+    assert ids("in:anywhere budget") == ["m3", "m1"]
+    print("    ✓ in:spam, in:trash and in:anywhere", flush=True)
+
+    print("\n4. TEST unsupported queries go to the API", flush=True)
+    for query in ["budget OR lunch", "has:attachment", "{a b}", "newer_than:3w"]:
+        assert compile_query(query) is None, f"{query!r} should not compile"
+        assert mirror.list_messages(query) is None
+    print("    ✓ OR, has:, braces and bad relative dates rejected", flush=True)
+
+    mirror.close()
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Mirror query test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_search_local():
+    """Test BM25-ranked search over the mirror and its query filters."""
+    print("\n=== Local Search Test ===\n", flush=True)
+
+    from mirror import Mirror, parse_date
+
+    mirror = Mirror(":memory:")
+    jan, feb, mar = parse_date("2024/01/15"), parse_date("2024/02/15"), parse_date("2024/03/15")
+    for message in [
+        parsed_message("m1", "Budget review", "Alice <alice@example.com>", "budget numbers for the budget owners",
+                       ["INBOX"], jan),
+        parsed_message("m2", "Lunch", "Bob <bob@example.com>", "tacos on friday, then a word about budget",
+                       ["INBOX"], feb),
+        parsed_message("m3", "Budget spam", "Spammer <x@spam.example>", "cheap budget pills", ["SPAM"], mar),
+    ] + [
+        # Messages without the term, so it has a positive IDF
+        parsed_message(f"f{i}", f"Update {i}", "Carol <carol@example.com>", "agenda travel notes", ["INBOX"], feb)
+        for i in range(8)
+    ]:
+        mirror.upsert(message)
+    mirror.commit()
+
+    def search(query):
+        return [(m["id"], m["score"]) for m in mirror.search(query, max_results=10)]
+
+    print("1. TEST BM25 ranking", flush=True)
+    results = search("budget")
+    assert [i for i, _ in results] == ["m1", "m2"], results
+    assert results[0][1] > results[1][1] > 0, "Scores should be positive, best first"
+    assert [i for i, _ in search('"then a word"')] == ["m2"]
+    assert [i for i, _ in search("taco*")] == ["m2"]
+    print(f"    ✓ Subject + repeated term ranks first ({results[0][1]} > {results[1][1]})", flush=True)
+
+    print("\n2. TEST operators filter the ranked results", flush=True)
+    assert [i for i, _ in search("budget from:bob")] == ["m2"]
+    assert [i for i, _ in search("budget -tacos")] == ["m1"]
+    assert [i for i, _ in search("in:spam budget")] == ["m3"]
+    assert len(search("label:inbox")) == 10, "Operator-only queries list newest first"
+    try:
+        mirror.search("budget OR lunch")
+        assert False, "OR should be rejected"
+    except ValueError:
+        pass
+    mirror.close()
+    print("    ✓ from:, -word and in:spam apply; unsupported queries raise", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Local search test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_mime():
+    """Test body part selection, windowed decoding and HTML → text."""
+    print("\n=== MIME Test ===\n", flush=True)
+
+    from mime import HtmlToText, find_body_part, iter_part_text, read_window, window_text
+
+    print("1. TEST nested multipart selection", flush=True)
+    plain = {"mimeType": "text/plain", "body": {"data": b64("plain body")}}
+    html = {"mimeType": "text/html", "body": {"data": b64("<p>html body</p>")}}
+    attached_text = {"mimeType": "text/plain", "filename": "notes.txt", "body": {"attachmentId": "a1"}}
+    forwarded = {"mimeType": "message/rfc822", "parts": [
+        {"mimeType": "text/plain", "body": {"data": b64("forwarded body")}}]}
+    payload = {"mimeType": "multipart/mixed", "parts": [
+        attached_text,
+        {"mimeType": "multipart/alternative", "parts": [html, plain]},
+        forwarded,
+    ]}
+    assert find_body_part(payload) is plain, "text/plain inside the alternative should win"
+    html_only = {"mimeType": "multipart/mixed", "parts": [attached_text, {"mimeType": "multipart/alternative",
+                                                                          "parts": [html]}]}
+    assert find_body_part(html_only) is html, "HTML is the fallback"
+    assert find_body_part({"mimeType": "multipart/mixed", "parts": [attached_text]}) is None
+    print("    ✓ Depth-first, attachments skipped, text/plain over text/html", flush=True)
+
+    print("\n2. TEST windowed reads", flush=True)
+    chunks = ["abcde", "fghij", "klmno"]
+    assert read_window(iter(chunks)) == ("abcdefghijklmno", 15, False)
+    assert read_window(iter(chunks), offset_chars=3, max_chars=4) == ("defg", None, True)
+    assert read_window(iter(chunks), offset_chars=12, max_chars=10) == ("mno", 15, False)
+    assert read_window(iter(chunks), offset_chars=20) == ("", 15, False)
+    pulled = []
+    def tracking():
+        for chunk in chunks:
+            pulled.append(chunk)
+            yield chunk
+    read_window(tracking(), max_chars=3)
+    assert pulled == ["abcde"], f"Read past the window: {pulled}"
+    assert window_text("abcdef", 2, 3) == ("cde", 6, True)
+    print("    ✓ Offsets, truncation and early stop", flush=True)
+
+    print("\n3. TEST decoding", flush=True)
+    latin = {"mimeType": "text/plain", "headers": [{"name": "Content-Type", "value": "text/plain; charset=iso-8859-1"}],
+             "body": {"data": base64.urlsafe_b64encode("café".encode("latin-1")).decode()}}
+    assert "".join(iter_part_text(latin)) == "café"
+    stored = {"mimeType": "text/plain", "body": {"attachmentId": "big"}}
+    assert "".join(iter_part_text(stored, lambda attachment_id: b64(f"fetched {attachment_id}"))) == "fetched big"
+    print("    ✓ Part charset honoured; attachment-stored bodies fetched", flush=True)
+
+    print("\n4. TEST HTML → text", flush=True)
+    converter = HtmlToText()
+    converter.feed("<html><head><style>p {color: red}</style></head><body><p>Hello   <b>world</b></p>"
+                   "<ul><li>one</li><li>two</li></ul><script>x()</script>&amp; done</body></html>")
+    converter.close()
+    assert converter.drain(final=True) == "Hello world\n\none\ntwo\n& done", converter
+    print("    ✓ Hidden tags dropped, blocks become lines, entities decoded", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ MIME test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_quoted_text():
+    """Test quote/reply-header/signature stripping and thread collapsing."""
+    print("\n=== Quoted Text Test ===\n", flush=True)
+
+    from mime import collapse_thread, strip_quoted
+
+    print("1. TEST strip_quoted", flush=True)
+    assert strip_quoted("Sounds good.\n> earlier text\n>> older") == (["Sounds good."], ["earlier text", "older"])
+    kept, removed = strip_quoted("Yes.\n\nOn Tue, Jan 2, 2024 at 10:00 AM Jane <jane@x.com> wrote:\nold")
+    assert kept == ["Yes.", ""] and removed[-1] == "old"
+    kept, _ = strip_quoted("Yes.\nOn Tue, Jan 2, 2024 at 10:00 AM Jane Doe <jane@x.com>\nwrote:\nold")
+    assert kept == ["Yes."], "Wrapped 'On ... wrote:' should cut"
+    assert strip_quoted("Thanks\n-- \nJane\nCEO")[0] == ["Thanks"]
+    kept, _ = strip_quoted("See below.\n\nFrom: Jane <jane@x.com>\nSent: Monday\nTo: me\nSubject: Re: x\n\nold")
+    assert kept == ["See below.", ""], "Outlook reply header should cut"
+    assert strip_quoted("From: Jane <jane@x.com>\nhello")[0] == ["From: Jane <jane@x.com>", "hello"]
+    print("    ✓ '>' quotes, 'On ... wrote:', signatures and Outlook reply headers", flush=True)
+
+    print("\n2. TEST forwarded content is kept", flush=True)
+    forward = ("FYI see below\n\n---------- Forwarded message ---------\nFrom: Vendor <v@x.com>\n"
+               "Subject: Invoice 42\n\nYour invoice total is 4,200 USD, due by the end of the month.")
+    [(text, _)] = collapse_thread([forward])
+    assert "4,200 USD" in text and "Vendor" in text, text
+    print("    ✓ Forward body survives when it's the only copy", flush=True)
+
+    print("\n3. TEST collapse_thread", flush=True)
+    original = "Your invoice total is 4,200 USD, due by the end of the month.\nThanks,\nVendor"
+    reply = ("Paid today.\n\nOn Mon, Jan 1, 2024 at 9:00 AM Vendor <v@x.com> wrote:\n"
+             "> Your invoice total is 4,200 USD, due by the end of the month.")
+    forwarded_again = ("Looping in finance.\n\n---------- Forwarded message ---------\n"
+                       "Your invoice total is 4,200 USD, due by the end of the month.")
+    results = collapse_thread([original, reply, forwarded_again])
+    assert results[0] == (original, 0)
+    assert results[1][0] == "Paid today." and results[1][1] == 3
+    assert "4,200" not in results[2][0] and results[2][0].startswith("Looping in finance."), results[2]
+    print("    ✓ Each message reduced to what it adds", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Quoted text test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_shard_queries():
+    """Test after:/before: window splitting for parallel listing."""
+    print("\n=== Shard Query Test ===\n", flush=True)
+
+    from gmail import query_window, shard_queries
+
+    print("1. TEST window parsing", flush=True)
+    assert query_window("from:x after:1000 before:2000") == (1000, 2000)
+    try:
+        query_window("from:x")
+        assert False, "Missing after: should raise"
+    except ValueError:
+        pass
+    print("    ✓ after:/before: read; after: required", flush=True)
+
+    print("\n2. TEST shards cover the window, newest first", flush=True)
+    queries = shard_queries("from:x after:1000 before:2000", 4)
+    assert queries == [
+        "from:x after:1749 before:2000",
+        "from:x after:1499 before:1750",
+        "from:x after:1249 before:1500",
+        "from:x after:1000 before:1250",
+    ], queries
+    assert shard_queries("after:1000 before:1003", 10) == [
+        "after:1001 before:1003", "after:1000 before:1002", "after:1000 before:1001"]
+    print("    ✓ One-second overlap, no more shards than seconds", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Shard query test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_retry_policy():
+    """Test which failed calls are retried: 5xx only when repeating is harmless."""
+    print("\n=== Retry Policy Test ===\n", flush=True)
+
+    from auth import is_idempotent, is_retryable
+
+    root = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+    print("1. TEST idempotent requests", flush=True)
+    assert is_idempotent("GET", f"{root}/messages/abc")
+    assert is_idempotent("POST", f"{root}/messages/batchModify")
+    assert is_idempotent("POST", f"{root}/messages/abc/trash")
+    assert not is_idempotent("POST", f"{root}/drafts")
+    assert not is_idempotent("POST", f"{root}/messages/send")
+    gets = b"GET /gmail/v1/users/me/messages/a HTTP/1.1\r\n\r\nGET /gmail/v1/users/me/messages/b HTTP/1.1\r\n"
+    drafts = b"POST /gmail/v1/users/me/drafts HTTP/1.1\r\n"
+    assert is_idempotent("POST", "https://gmail.googleapis.com/batch/gmail/v1", gets)
+    assert not is_idempotent("POST", "https://gmail.googleapis.com/batch/gmail/v1", gets + drafts)
+    print("    ✓ Reads and label changes; not drafts.create, send, or a batch holding them", flush=True)
+
+    print("\n2. TEST 5xx retried only when idempotent", flush=True)
+    assert is_retryable(503) and not is_retryable(503, idempotent=False)
+    assert is_retryable(429, idempotent=False)
+    assert is_retryable(403, b'{"reason": "userRateLimitExceeded"}', idempotent=False)
+    assert not is_retryable(403, b'{"reason": "forbidden"}')
+    print("    ✓ Throttling always retried; a 5xx draft is never sent twice", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Retry policy test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_parallel_list():
+    """Test date-sharded listing: same results as sequential, bounded requests."""
+    print("\n=== Parallel List Test ===\n", flush=True)
+
+    with mock_api(messages=300, files=0, body_chars=100) as server:
+        import gmail
+
+        dates = [int(server.dataset.messages[i]["internalDate"]) // 1000 for i in server.dataset.order]
+        query = f"after:{dates[-1] - 1} before:{dates[0] + 1}"
+
+        print("1. TEST same messages in the same order", flush=True)
+        sequential = gmail.list_messages(USER, query, 150)
+        parallel = gmail.list_messages(USER, query, 150, workers=4)
+        assert [m["id"] for m in parallel] == [m["id"] for m in sequential] == server.dataset.order[:150]
+        print("    ✓ 150 newest, merged across shards", flush=True)
+
+        print("\n2. TEST small lists don't hydrate every shard", flush=True)
+        before = server.stats()
+        assert len(gmail.list_messages(USER, query, 20, workers=4)) == 20
+        after = server.stats()
+        requests, calls = after["requests"] - before["requests"], after["calls"] - before["calls"]
+        # A few shard listings plus exactly 20 gets, not every shard's full list
+        assert requests <= 8 and calls <= 8 + 20, (requests, calls)
+        print(f"    ✓ {requests} HTTP requests, {calls} API calls", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Parallel list test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_cache_eviction():
+    """Test the message cache: round trip, missing IDs and LRU eviction."""
+    print("\n=== Message Cache Test ===\n", flush=True)
+
+    import time
+    from cache import MessageCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def message(i):
+            # Random-ish body so zlib can't shrink entries to nothing
+            return {"id": f"m{i}", "payload": {"body": {"data": base64.b64encode(os.urandom(3000)).decode()}}}
+
+        with MessageCache(os.path.join(tmp, "cache.sqlite"), max_bytes=20000) as cache:
+            print("1. TEST round trip", flush=True)
+            cache.put(message(0), parsed={"body": "hello", "labels": ["INBOX"], "truncated": False})
+            raw, parsed = cache.get("m0")
+            assert raw["id"] == "m0" and parsed == {"body": "hello"}, "Volatile fields should not be stored"
+            assert cache.missing(["m0", "m1"]) == ["m1"]
+            print("    ✓ Raw and parsed stored; window/label fields dropped", flush=True)
+
+            print("\n2. TEST least recently read evicted first", flush=True)
+            for i in range(1, 4):
+                time.sleep(0.01)
+                cache.put(message(i))
+            time.sleep(0.01)
+            assert cache.get("m0") is not None  # now the most recently read
+            for i in range(4, 8):
+                time.sleep(0.01)
+                cache.put(message(i))
+            assert cache.size() <= 20000
+            assert cache.get("m0") is not None, "Recently read entry was evicted"
+            assert cache.get("m1") is None, "Oldest unread entry should go first"
+            assert cache.get("m7") is not None
+            print(f"    ✓ Kept under max_bytes ({cache.size()} bytes)", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Message cache test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_list_pages():
+    """Test list against mock_server.py: pages followed, metadata batched."""
+    print("\n=== List Pages Test ===\n", flush=True)
+
+    with mock_api(messages=600, files=0, body_chars=100) as server, no_quota():
+        import gmail
+
+        print("1. TEST list follows pages and hydrates metadata", flush=True)
+        before = server.stats()
+        messages = gmail.list_messages(USER, max_results=550)
+        after = server.stats()
+        assert [m["id"] for m in messages] == server.dataset.order[:550]
+        assert messages[0]["subject"] and messages[0]["from"]
+        # 2 list pages (500 + 50) + 11 batches of 50 gets
+        assert after["requests"] - before["requests"] == 2 + 11, after
+        print(f"    ✓ {len(messages)} summaries, newest first, in 13 HTTP requests", flush=True)
+
+        print("\n2. TEST streamed pages", flush=True)
+        streamed = [m["id"] for m in gmail.iter_messages(USER, None, 120)]
+        assert streamed == server.dataset.order[:120]
+        print("    ✓ iter_messages yields the same order", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ List pages test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_cached_get():
+    """Test get against mock_server.py: body decoded once, then read from the cache."""
+    print("\n=== Cached Get Test ===\n", flush=True)
+
+    with mock_api(messages=20, files=0) as server:
+        import gmail
+
+        print("1. TEST get decodes the body and caches it", flush=True)
+        message_id = server.dataset.order[0]
+        first = gmail.get_message(USER, message_id, max_chars=50)
+        assert first["bodyMimeType"] == "text/plain" and first["returnedChars"] == 50 and first["truncated"]
+        calls = server.stats()["calls"]
+        again = gmail.get_message(USER, message_id, max_chars=50)
+        assert again["body"] == first["body"] and again["labels"] == first["labels"]
+        assert server.stats()["calls"] == calls + 1, "Cached get should be one minimal call"
+        import cache
+        path = cache.cache_path(USER)
+        assert os.stat(cache.CACHE_DIR).st_mode & 0o777 == 0o700
+        assert all(os.stat(p).st_mode & 0o777 == 0o600 for p in [path, path + "-wal", path + "-shm"]
+                   if os.path.exists(p)), "Cache files should be owner-only"
+        print("    ✓ Body windowed; repeat read served from an owner-only cache", flush=True)
+
+        print("\n2. TEST later windows come from the cached body", flush=True)
+        second = gmail.get_message(USER, message_id, max_chars=50, offset_chars=50)
+        assert second["body"] and second["body"] != first["body"]
+        assert server.stats()["calls"] == calls + 2
+        print("    ✓ offset_chars reads the next window without a full fetch", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Cached get test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_thread():
+    """Test thread against mock_server.py: every message, quoted text collapsed."""
+    print("\n=== Thread Test ===\n", flush=True)
+
+    with mock_api(messages=120, files=0) as server:
+        import gmail
+
+        print("1. TEST thread lists its messages oldest first", flush=True)
+        threads = server.dataset.threads
+        thread_id = max(threads, key=lambda t: len(threads[t]))
+        thread = gmail.get_thread(USER, thread_id)
+        assert thread["messageCount"] == len(threads[thread_id]) > 1, thread["messageCount"]
+        assert sorted(m["id"] for m in thread["messages"]) == sorted(threads[thread_id])
+        dates = [int(m["internalDate"]) for m in thread["messages"]]
+        assert dates == sorted(dates)
+        print(f"    ✓ {thread['messageCount']} messages", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Thread test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_modify_many_pages():
+    """Test modify across several list pages and batchModify chunks."""
+    print("\n=== Bulk Modify Test ===\n", flush=True)
+
+    with mock_api(messages=1200, files=0, body_chars=100) as server:
+        import gmail
+
+        print("1. TEST dry run only counts", flush=True)
+        result = gmail.modify_messages(USER, "in:inbox", remove_labels=["INBOX"], dry_run=True)
+        assert result["matched"] == 1200 and result["modified"] == 0, result
+        print("    ✓ 1200 matched, nothing changed", flush=True)
+
+        print("\n2. TEST archive more than a page", flush=True)
+        result = gmail.modify_messages(USER, "in:inbox", remove_labels=["INBOX"])
+        assert result["matched"] == 1200 and result["modified"] == 1200, result
+        left = [m for m in server.dataset.messages.values() if "INBOX" in m["labelIds"]]
+        assert not left, f"{len(left)} messages left in the inbox"
+        assert gmail.modify_messages(USER, "in:inbox", remove_labels=["INBOX"])["matched"] == 0
+        print("    ✓ Every match archived (3 list pages, 2 batchModify calls)", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Bulk modify test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_mirror_coverage():
+    """Test that list only uses a bounded mirror when the answer is complete."""
+    print("\n=== Mirror Coverage Test ===\n", flush=True)
+
+    with mock_api(messages=150, files=0, body_chars=100) as server:
+        import gmail
+        from mirror import Mirror
+
+        summary = gmail.sync_mirror(USER, max_messages=50)
+        assert summary["mode"] == "full" and summary["messages"] == 50, summary
+        import mirror as mirror_module
+        path = mirror_module.mirror_path(USER)
+        assert os.stat(mirror_module.MIRROR_DIR).st_mode & 0o777 == 0o700
+        assert all(os.stat(p).st_mode & 0o777 == 0o600 for p in [path, path + "-wal", path + "-journal"]
+                   if os.path.exists(p)), "Mirror files should be owner-only"
+        order = server.dataset.order
+        oldest_ms = int(server.dataset.messages[order[49]]["internalDate"])
+
+        with Mirror.open_existing(USER, gmail.MIRROR_MAX_AGE) as mirror:
+            print("1. TEST bounded mirror", flush=True)
+            assert mirror.covered_since() == oldest_ms
+            assert [m["id"] for m in mirror.list_messages(None, 30)] == order[:30]
+            assert mirror.list_messages(None, 100) is None, "100 can't be filled from 50 mirrored messages"
+            before = int(server.dataset.messages[order[100]]["internalDate"]) // 1000
+            assert mirror.list_messages(f"before:{before}", 10) is None, "Window older than the mirror"
+            after = int(server.dataset.messages[order[20]]["internalDate"]) // 1000
+            assert len(mirror.list_messages(f"after:{after}", 50)) == 21, "Window inside the mirror"
+            print("    ✓ Served only when the synced window holds every match", flush=True)
+
+        print("\n2. TEST unbounded mirror answers everything", flush=True)
+        summary = gmail.sync_mirror(USER, max_messages=1000, full=True)
+        with Mirror.open_existing(USER) as mirror:
+            assert mirror.covered_since() == 0
+            assert len(mirror.list_messages(None, 500)) == 150
+            assert mirror.list_messages("before:1000", 10) == []
+        print("    ✓ Whole mailbox mirrored: short answers are exact", flush=True)
+
+        print("\n3. TEST non-date sync query and stale mirrors", flush=True)
+        gmail.sync_mirror(USER, max_messages=1000, query="is:unread", full=True)
+        with Mirror.open_existing(USER) as mirror:
+            assert mirror.covered_since() is None and mirror.list_messages(None, 5) is None
+            mirror.set_state("syncedAt", 0)
+            mirror.commit()
+        assert Mirror.open_existing(USER, gmail.MIRROR_MAX_AGE) is None
+        print("    ✓ Arbitrary subsets and old syncs go to the API", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Mirror coverage test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_large_bodies():
+    """Test bodies Gmail returns as an attachmentId instead of inline data."""
+    print("\n=== Large Body Test ===\n", flush=True)
+
+    with mock_api(messages=6, files=0, body_chars=3000, inline_limit=1000) as server:
+        import gmail
+        from mirror import Mirror
+
+        message_id = server.dataset.order[0]
+        assert "attachmentId" in server.dataset.messages[message_id]["payload"]["parts"][0]["parts"][0]["body"]
+
+        print("1. TEST get fetches the body", flush=True)
+        assert len(gmail.get_message(USER, message_id, use_cache=False)["body"]) == 3000
+        print("    ✓ Body fetched via attachments.get", flush=True)
+
+        print("\n2. TEST sync stores and indexes the body", flush=True)
+        gmail.sync_mirror(USER)
+        with Mirror.open_existing(USER) as mirror:
+            assert len(mirror.get_message(message_id)["body"]) == 3000
+            word = server.dataset.messages[message_id]["snippet"].split()[0]
+            assert mirror.search(word, 10), "Body not indexed"
+        print("    ✓ Mirror holds the full body", flush=True)
+
+        print("\n3. TEST thread fetches the bodies", flush=True)
+        thread = gmail.get_thread(USER, server.dataset.messages[message_id]["threadId"], collapse=False)
+        sizes = [server.dataset.messages[m["id"]]["payload"]["parts"][0]["parts"][0]["body"]["size"]
+                 for m in thread["messages"]]
+        assert [len(m["body"]) for m in thread["messages"]] == sizes
+        print(f"    ✓ {thread['messageCount']} full bodies", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Large body test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_attachments():
+    """Test streamed attachment downloads and the content-addressed store."""
+    print("\n=== Attachments Test ===\n", flush=True)
+
+    import hashlib
+
+    with mock_api(messages=20, files=0) as server:
+        import attachments
+        import gmail
+
+        first, second = server.dataset.order[0], server.dataset.order[10]
+        raw = os.urandom(1024 * 1024)
+        # Two messages carrying the same file
+        server.dataset.attachments["att0"] = server.dataset.attachments["att10"] = raw
+        sha256 = hashlib.sha256(raw).hexdigest()
+
+        print("1. TEST list without downloading", flush=True)
+        listed = gmail.list_attachments(USER, first)
+        assert [(a["filename"], a["partId"]) for a in listed] == [("report-0.pdf", "1")]
+        assert "sha256" not in listed[0]
+        print("    ✓ Filename and partId, nothing fetched", flush=True)
+
+        print("\n2. TEST download streams the body to the store", flush=True)
+        pieces = []
+        json_string_chunks = attachments.json_string_chunks
+
+        def counting(chunks, key):
+            for piece in json_string_chunks(chunks, key):
+                pieces.append(len(piece))
+                yield piece
+        attachments.json_string_chunks = counting
+        try:
+            entry, = gmail.list_attachments(USER, first, download=True)
+        finally:
+            attachments.json_string_chunks = json_string_chunks
+        assert "error" not in entry, entry
+        assert entry["sha256"] == sha256 and entry["size"] == len(raw) and entry["cached"] is False
+        assert entry["path"] == attachments.blob_path(sha256)
+        with open(entry["path"], "rb") as f:
+            assert f.read() == raw
+        assert len(pieces) > 1 and max(pieces) < len(raw), pieces
+        index = os.path.join(attachments.ATTACHMENTS_DIR, "index.sqlite")
+        for directory in (attachments.ATTACHMENTS_DIR, os.path.dirname(entry["path"])):
+            assert os.stat(directory).st_mode & 0o777 == 0o700
+        assert all(os.stat(p).st_mode & 0o777 == 0o600 for p in [entry["path"], index, index + "-journal"]
+                   if os.path.exists(p)), "Attachment files should be owner-only"
+        print(f"    ✓ 1 MB decoded from {len(pieces)} streamed pieces into an owner-only store", flush=True)
+
+        print("\n3. TEST second download of the same message", flush=True)
+        calls = server.stats()["calls"]
+        entry, = gmail.list_attachments(USER, first, download=True)
+        assert entry["sha256"] == sha256 and entry["cached"] is True
+        assert server.stats()["calls"] == calls + 1, "Attachment fetched again"
+        print("    ✓ cached: True, only the message itself was fetched", flush=True)
+
+        print("\n4. TEST same file from another message", flush=True)
+        entry, = gmail.list_attachments(USER, second, download=True)
+        assert entry["sha256"] == sha256 and entry["cached"] is True
+        assert entry["path"] == attachments.blob_path(sha256)
+        blobs = [name for name in os.listdir(os.path.dirname(entry["path"])) if not name.startswith(".")]
+        assert blobs == [sha256], blobs
+        print("    ✓ Fetched, but stored once under its sha256", flush=True)
+
+        print("\n5. TEST short inline data and odd piece boundaries", flush=True)
+        for data in (b"x", b"ab", os.urandom(1000)):
+            text = base64.urlsafe_b64encode(data).decode().rstrip("=")
+            pieces = [text[i:i + 7] for i in range(0, len(text), 7)]
+            assert attachments.store_base64(text)[0] == hashlib.sha256(data).hexdigest()
+            assert attachments.store_base64(pieces)[0] == hashlib.sha256(data).hexdigest()
+        body = [b'{"size": 3, "da', b'ta" :  "YW', b'Jj"}']
+        assert b"".join(attachments.json_string_chunks(body, "data")) == b"YWJj"
+        print("    ✓ Unpadded, split and inline base64 decode the same", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Attachments test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_async_client():
+    """Test async_client against the mock: in-flight limit, retries, pagination; with and without httpx."""
+    print("\n=== Async Client Test ===\n", flush=True)
+
+    import asyncio
+
+    import async_client
+    from async_client import AsyncGoogleClient
+    from googleapiclient.errors import HttpError
+
+    class FailingPool:
+        """Sends each request, then answers 503 for the paths in `fail` (once each)."""
+
+        def __init__(self, pool, fail):
+            self.pool, self.fail, self.in_flight, self.peak = pool, set(fail), 0, 0
+
+        async def request(self, method, url, headers, body=None):
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                response = await self.pool.request(method, url, headers, body)
+            finally:
+                self.in_flight -= 1
+            path = url.split("?")[0].split("/users/me/")[-1]
+            if path in self.fail:
+                self.fail.discard(path)
+                return 503, {"retry-after": "0"}, b'{"error": {"code": 503}}'
+            return response
+
+        async def close(self):
+            await self.pool.close()
+
+    async def run(server, fail=()):
+        async with AsyncGoogleClient(max_in_flight=4) as client:
+            client._pool = pool = FailingPool(client._pool, fail)
+            ids = server.dataset.order[:20]
+            messages = await asyncio.gather(*(client.get_message(USER, i, format="minimal") for i in ids))
+            assert [m["id"] for m in messages] == ids
+            stubs = [stub async for stub in client.iter_message_ids(USER, max_results=1100)]
+            try:
+                await client.create_draft(USER, b64("To: a@example.com\r\n\r\nHi"))
+                draft_error = None
+            except HttpError as error:
+                draft_error = error.resp.status
+            return pool.peak, [stub["id"] for stub in stubs], draft_error
+
+    modes = [("httpx", async_client.httpx)] if async_client.httpx else []
+    modes.append(("threads", None))
+    for mode, httpx in modes:
+        with mock_api(messages=1200, files=0, body_chars=100) as server, no_quota():
+            old = async_client.httpx
+            async_client.httpx = httpx
+            try:
+                print(f"{mode}: TEST in-flight limit and pagination", flush=True)
+                server.latency = 0.02
+                peak, ids, draft_error = asyncio.run(run(server))
+                server.latency = 0
+                assert type(async_client.open_pool()).__name__ == ("HttpxPool" if httpx else "ThreadedPool")
+                assert peak == 4, f"{peak} requests in flight, limit 4"
+                assert ids == server.dataset.order[:1100] and draft_error is None
+                print("    ✓ At most 4 in flight; 1100 IDs over 3 pages in order", flush=True)
+
+                print(f"{mode}: TEST 429s retried", flush=True)
+                server.fault_rate = 0.1
+                asyncio.run(run(server))
+                server.fault_rate = 0
+                assert server.stats()["faults"] > 0
+                print(f"    ✓ {server.stats()['faults']} throttled calls retried", flush=True)
+
+                print(f"{mode}: TEST 5xx retried for reads, not for drafts.create", flush=True)
+                drafts = server.dataset.drafts
+                get_path = f"messages/{server.dataset.order[0]}"
+                _, _, draft_error = asyncio.run(run(server, fail=[get_path, "drafts"]))
+                assert draft_error == 503, "drafts.create must surface the 503"
+                assert server.dataset.drafts == drafts + 1, "drafts.create was sent twice"
+                print("    ✓ GET succeeded on retry; the draft was sent once and the error raised", flush=True)
+            finally:
+                async_client.httpx = old
+    if not async_client.httpx:
+        print("    (httpx not installed: HttpxPool skipped)", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Async client test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+@contextmanager
+def service_account(tmp):
+    """A throwaway service account key and token cache under tmp."""
+    import auth
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    info = {"type": "service_account", "client_email": "bot@example.iam.gserviceaccount.com",
+            "private_key": pem, "private_key_id": "1", "token_uri": "https://oauth2.example.com/token"}
+    old = (auth.SERVICE_ACCOUNT_FILE, auth.TOKEN_CACHE_FILE)
+    auth.SERVICE_ACCOUNT_FILE = os.path.join(tmp, "key.json")
+    auth.TOKEN_CACHE_FILE = os.path.join(tmp, "cache", "token-cache.json")
+    with open(auth.SERVICE_ACCOUNT_FILE, "w") as f:
+        json.dump(info, f)
+    auth._service_account_info.cache_clear()
+    try:
+        yield
+    finally:
+        auth.SERVICE_ACCOUNT_FILE, auth.TOKEN_CACHE_FILE = old
+        auth._service_account_info.cache_clear()
+
+
+def test_token_cache():
+    """Test the on-disk token cache: reuse, refresh near expiry, owner-only file."""
+    print("\n=== Token Cache Test ===\n", flush=True)
+
+    import time
+
+    import auth
+
+    scopes = auth.GMAIL_SCOPES
+    exchanges = []
+
+    def expiry_in(seconds):
+        """Naive UTC, as google-auth keeps it."""
+        return datetime.fromtimestamp(time.time() + seconds, timezone.utc).replace(tzinfo=None)
+
+    def token_endpoint(url, method="GET", body=None, headers=None, **kwargs):
+        """Stands in for the OAuth token exchange (google.auth.transport.Request)."""
+        exchanges.append(url)
+
+        class Response:
+            status = 200
+            data = json.dumps({"access_token": f"token-{len(exchanges)}", "expires_in": 3600}).encode()
+        return Response()
+
+    with tempfile.TemporaryDirectory() as tmp, service_account(tmp):
+        print("1. TEST no cached token: refresh exchanges and saves one", flush=True)
+        credentials = auth.get_credentials(USER, scopes)
+        assert not credentials.valid
+        credentials.refresh(token_endpoint)
+        assert credentials.token == "token-1" and len(exchanges) == 1
+        cache = auth._load_token_cache()
+        entry = cache[auth._token_key(USER, scopes)]
+        assert entry["token"] == "token-1" and abs(entry["expiry"] - (time.time() + 3600)) < 60
+        assert os.stat(auth.TOKEN_CACHE_FILE).st_mode & 0o777 == 0o600, "Token cache must be owner-only"
+        assert not [n for n in os.listdir(os.path.dirname(auth.TOKEN_CACHE_FILE)) if n.endswith(".tmp")]
+        print("    ✓ Saved 0600 with its expiry, no temp file left", flush=True)
+
+        print("\n2. TEST a later run reuses the cached token", flush=True)
+        again = auth.get_credentials(USER, list(reversed(scopes)))
+        assert again.valid and again.token == "token-1" and len(exchanges) == 1
+        assert auth.get_credentials("other@example.com", scopes).token is None
+        print("    ✓ Same user and scopes (any order): no token exchange; other users not", flush=True)
+
+        print("\n3. TEST a token about to expire is refreshed", flush=True)
+        key = auth._token_key(USER, scopes)
+        auth._save_token(key, "token-1", expiry_in(auth.TOKEN_REFRESH_MARGIN - 10))
+        stale = auth.get_credentials(USER, scopes)
+        assert stale.token is None and not stale.valid, "Token within the refresh margin was reused"
+        stale.refresh(token_endpoint)
+        assert auth._load_token_cache()[key]["token"] == "token-2"
+        assert auth.get_credentials(USER, scopes).token == "token-2"
+        print("    ✓ Within the margin: exchanged again and the cache updated", flush=True)
+
+        print("\n4. TEST expired entries are dropped on save", flush=True)
+        auth._save_token("old", "gone", expiry_in(-10))
+        auth._save_token(key, "token-2", expiry_in(3600))
+        assert "old" not in auth._load_token_cache()
+        print("    ✓ Only live tokens stay in the file", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Token cache test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_service_cache():
+    """Test get_service memoization: discovery and build() once per (api, user, scopes)."""
+    print("\n=== Service Cache Test ===\n", flush=True)
+
+    import auth
+
+    calls = {"discovery": 0, "build": 0, "credentials": 0}
+    originals = (auth.get_discovery_document, auth.build_from_document, auth.get_credentials)
+
+    def counted(name, fn):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return fn(*args, **kwargs)
+        return wrapper
+
+    auth.get_discovery_document = counted("discovery", originals[0])
+    auth.build_from_document = counted("build", originals[1])
+    auth.get_credentials = counted("credentials", originals[2])
+    try:
+        with tempfile.TemporaryDirectory() as tmp, service_account(tmp):
+            user = "service-cache@example.com"
+
+            print("1. TEST second call reuses the service", flush=True)
+            first = auth.get_service("gmail", "v1", user, auth.GMAIL_SCOPES)
+            assert calls == {"discovery": 1, "build": 1, "credentials": 1}, calls
+            assert auth.get_service("gmail", "v1", user, auth.GMAIL_SCOPES) is first
+            assert auth.get_gmail_service(user) is first
+            assert calls == {"discovery": 1, "build": 1, "credentials": 1}, calls
+            print("    ✓ No discovery, build() or credentials the second time", flush=True)
+
+            print("\n2. TEST other users, scopes and roots get their own", flush=True)
+            assert auth.get_service("gmail", "v1", "other-" + user, auth.GMAIL_SCOPES) is not first
+            assert auth.get_service("gmail", "v1", user, auth.GMAIL_MODIFY_SCOPES) is not first
+            assert calls["build"] == 3 and calls["credentials"] == 3, calls
+            with mock_api(messages=1, files=0):
+                assert auth.get_service("gmail", "v1", user, auth.GMAIL_SCOPES) is not first
+            assert calls["build"] == 4 and calls["credentials"] == 3, calls
+            print("    ✓ Keyed by user, scopes and API root", flush=True)
+
+            print("\n3. TEST the pinned discovery document is parsed once", flush=True)
+            originals[0].cache_clear()
+            document = originals[0]("gmail", "v1")
+            assert originals[0]("gmail", "v1") is document and originals[0].cache_info().hits == 1
+            assert document["rootUrl"] == "https://gmail.googleapis.com/"
+            print("    ✓ Bundled with googleapiclient, no network fetch", flush=True)
+    finally:
+        auth.get_discovery_document, auth.build_from_document, auth.get_credentials = originals
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Service cache test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+class FakeClock:
+    """Stands in for auth's `time` module: monotonic() only moves when sleep() is called."""
+
+    def __init__(self):
+        import time
+        self.real = time
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+def test_rate_limiter():
+    """Test quota costs per method and TokenBucket pacing, on a fake clock."""
+    print("\n=== Rate Limiter Test ===\n", flush=True)
+
+    import auth
+
+    root = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+    print("1. TEST per-method quota costs", flush=True)
+    cost = auth.request_cost
+    assert cost("gmail", "GET", f"{root}/messages?q=x") == cost("gmail", "GET", f"{root}/messages/a") == 5
+    assert cost("gmail", "POST", f"{root}/messages/batchModify") == 50
+    assert cost("gmail", "POST", f"{root}/messages/send") == 100
+    assert cost("gmail", "POST", f"{root}/drafts") == 10
+    assert cost("gmail", "GET", f"{root}/threads/t") == 10 and cost("gmail", "GET", f"{root}/history") == 2
+    assert cost("gmail", "GET", f"{root}/labels") == 1
+    assert cost("drive", "GET", "https://www.googleapis.com/drive/v3/files") == 1
+    batch = (b"GET /gmail/v1/users/me/messages/a HTTP/1.1\r\n\r\n"
+             b"GET /gmail/v1/users/me/threads/b HTTP/1.1\r\n\r\n"
+             b"POST /gmail/v1/users/me/drafts HTTP/1.1\r\n")
+    assert cost("gmail", "POST", "https://gmail.googleapis.com/batch/gmail/v1", batch) == 25
+    print("    ✓ GMAIL_COSTS per method; a batch costs the sum of its parts", flush=True)
+
+    clock = FakeClock()
+    auth.time = clock
+    try:
+        print("\n2. TEST a drained bucket blocks callers", flush=True)
+        bucket = auth.TokenBucket(rate=250, capacity=250)
+        assert bucket.acquire(250) == 0 and clock.sleeps == []
+        assert bucket.acquire(5) == 0.02 and clock.sleeps == [0.02]
+        clock.now += 10
+        assert bucket.acquire(250) == 0, "Refill must stop at capacity"
+        assert bucket.acquire(1) > 0
+        print("    ✓ Full burst free, then waits cost/rate; refill capped", flush=True)
+
+        print("\n3. TEST reserve queues callers in order", flush=True)
+        bucket = auth.TokenBucket(rate=100, capacity=100)
+        bucket.reserve(100)
+        assert [bucket.reserve(50) for _ in range(3)] == [0.5, 1.0, 1.5]
+        clock.now += 1.5
+        assert bucket.reserve(0) == 0
+        print("    ✓ Waits stack up instead of everyone waking at once", flush=True)
+
+        print("\n4. TEST API calls charge their cost to the (api, user) bucket", flush=True)
+        user = "limiter@example.com"
+        clock.sleeps.clear()
+        rate, capacity = auth.QUOTA_RATES["gmail"]
+        limiter = auth.get_limiter("gmail", user)
+        assert (limiter.rate, limiter.capacity) == (rate, capacity) and auth.get_limiter("gmail", user) is limiter
+        assert (auth.get_limiter("docs", user).rate, auth.get_limiter("docs", user).capacity) == auth.QUOTA_RATES["docs"]
+        with mock_api(messages=60, files=0, body_chars=50) as server:
+            import gmail
+            service = gmail.get_gmail_service(user)
+            ids = server.dataset.order
+            service.users().messages().get(userId="me", id=ids[0], format="minimal").execute()
+            assert limiter.tokens == capacity - 5
+            service.users().messages().batchModify(userId="me", body={"ids": ids[:2]}).execute()
+            assert limiter.tokens == capacity - 55
+            for message_id in ids[:39]:
+                service.users().messages().get(userId="me", id=message_id, format="minimal").execute()
+            assert limiter.tokens == 0 and clock.sleeps == []
+            service.users().messages().get(userId="me", id=ids[0], format="minimal").execute()
+            assert clock.sleeps == [5 / rate], clock.sleeps
+        print(f"    ✓ get 5, batchModify 50; the call after {capacity} units waited {5 / rate}s", flush=True)
+    finally:
+        auth.time = clock.real
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Rate limiter test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def run_cli(*argv):
+    """gmail.py main() with these arguments: (exit code, stdout)."""
+    import io
+    from contextlib import redirect_stdout
+
+    import gmail
+
+    old, sys.argv = sys.argv, ["gmail.py", *argv]
+    out = io.StringIO()
+    code = 0
+    try:
+        with redirect_stdout(out):
+            gmail.main()
+    except SystemExit as e:
+        code = e.code
+    finally:
+        sys.argv = old
+    return code, out.getvalue()
+
+
+def test_fan_out():
+    """Test --users fan-out: every mailbox answered, failures isolated, mirrors closed."""
+    print("\n=== Fan-out Test ===\n", flush=True)
+
+    with mock_api(messages=40, files=0, body_chars=100) as server, no_quota("gmail", "a@example.com"), \
+            no_quota("gmail", "b@example.com"), no_quota("gmail", "c@example.com"):
+        import gmail
+        from mirror import Mirror
+
+        users = ["a@example.com", "b@example.com", "c@example.com"]
+
+        print("1. TEST fan_out isolates failures", flush=True)
+
+        def run(user):
+            if user == "b@example.com":
+                raise RuntimeError("boom")
+            return [m["id"] for m in gmail.list_messages(user, None, 5)]
+        results = {user: (result, error) for user, result, error in gmail.fan_out(users, run, workers=3)}
+        assert sorted(results) == users
+        assert results["a@example.com"] == results["c@example.com"] == (server.dataset.order[:5], None)
+        assert results["b@example.com"][0] is None and str(results["b@example.com"][1]) == "boom"
+        print("    ✓ One mailbox failing doesn't stop the others", flush=True)
+
+        opened = []
+        open_existing = Mirror.open_existing.__func__
+
+        def tracking(cls, *args, **kwargs):
+            mirror = open_existing(cls, *args, **kwargs)
+            if mirror is not None:
+                opened.append(mirror)
+            return mirror
+        Mirror.open_existing = classmethod(tracking)
+        try:
+            print("\n2. TEST --users list goes to the API, one NDJSON line per mailbox", flush=True)
+            code, out = run_cli("--users", ",".join(users), "list", "--max-results", "3")
+            lines = {line["user"]: line for line in map(json.loads, out.splitlines())}
+            assert code == 0 and sorted(lines) == users
+            assert all(line["count"] == 3 and len(line["messages"]) == 3 for line in lines.values())
+            print("    ✓ 3 mailboxes, 3 messages each", flush=True)
+
+            print("\n3. TEST --users search-local: mirrors used and closed, missing ones reported", flush=True)
+            gmail.sync_mirror("a@example.com")
+            gmail.sync_mirror("b@example.com")
+            word = server.dataset.messages[server.dataset.order[0]]["snippet"].split()[0]
+            code, out = run_cli("--users", ",".join(users), "search-local", word)
+            lines = {line["user"]: line for line in map(json.loads, out.splitlines())}
+            assert code == 0 and lines["a@example.com"]["count"] > 0 and lines["b@example.com"]["count"] > 0
+            assert "No local mirror" in lines["c@example.com"]["error"]
+            code, out = run_cli("--users", ",".join(users), "list", "--max-results", "3")
+            assert code == 0 and len(out.splitlines()) == 3
+            code, _ = run_cli("--user", "a@example.com", "get", "--message-id", server.dataset.order[0])
+            assert code == 0
+            assert len(opened) == 5
+            for mirror in opened:
+                try:
+                    mirror.conn.execute("SELECT 1")
+                except Exception:
+                    continue
+                raise AssertionError("A mirror was left open")
+            print(f"    ✓ {len(opened)} mirrors opened by the CLI, all closed", flush=True)
+
+            print("\n4. TEST exit 1 only when every mailbox fails", flush=True)
+            code, out = run_cli("--users", "x@example.com,y@example.com", "search-local", word)
+            assert code == 1 and all("error" in json.loads(line) for line in out.splitlines())
+            print("    ✓ All failed: exit 1", flush=True)
+        finally:
+            Mirror.open_existing = classmethod(open_existing)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Fan-out test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_prefetch():
+    """Test prefetch into the message cache and the detached list --prefetch process."""
+    print("\n=== Prefetch Test ===\n", flush=True)
+
+    import io
+    import subprocess
+    from contextlib import redirect_stdout
+
+    with mock_api(messages=30, files=0, body_chars=200) as server:
+        import gmail
+
+        ids = server.dataset.order[:5]
+
+        print("1. TEST prefetch fills the cache with one batch", flush=True)
+        before = server.stats()
+        assert gmail.prefetch_messages(USER, ids) == {"fetched": 5, "alreadyCached": 0, "failed": 0}
+        assert server.stats()["requests"] == before["requests"] + 1
+        print("    ✓ 5 fetched in 1 HTTP request", flush=True)
+
+        print("\n2. TEST a second prefetch and a get find them cached", flush=True)
+        calls = server.stats()["calls"]
+        assert gmail.prefetch_messages(USER, ids + ids[:2]) == {"fetched": 0, "alreadyCached": 5, "failed": 0}
+        assert server.stats()["calls"] == calls, "Cached messages fetched again"
+        assert gmail.get_message(USER, ids[0])["id"] == ids[0]
+        assert server.stats()["calls"] == calls + 1, "get should only refresh labels"
+        code, out = run_cli("--user", USER, "prefetch", ids[0], "missing-id")
+        assert code == 0 and json.loads(out) == {"fetched": 0, "alreadyCached": 1, "failed": 1}
+        print("    ✓ alreadyCached: 5, duplicates ignored; get costs one labels call", flush=True)
+
+        print("\n3. TEST list --prefetch starts a detached process and returns", flush=True)
+        started = []
+
+        class Detached:
+            def __init__(self, argv, **kwargs):
+                started.append((argv, kwargs))
+
+            def wait(self, *args, **kwargs):
+                raise AssertionError("list must not wait for the prefetch process")
+            communicate = wait
+
+        popen, gmail.subprocess.Popen = gmail.subprocess.Popen, Detached
+        try:
+            result = gmail.list_messages(USER, None, 5, prefetch=3)
+            with redirect_stdout(io.StringIO()):
+                assert gmail.stream_messages(USER, None, 5, prefetch=2) == 5
+            gmail.start_prefetch(USER, [])
+        finally:
+            gmail.subprocess.Popen = popen
+        assert [m["id"] for m in result] == ids
+        (argv, kwargs), (stream_argv, _) = started
+        assert argv == [sys.executable, os.path.abspath(gmail.__file__), "--user", USER, "prefetch", *ids[:3]]
+        assert stream_argv[-3:] == ["prefetch", *ids[:2]]
+        assert kwargs["start_new_session"] is True
+        assert kwargs["stdin"] == kwargs["stdout"] == kwargs["stderr"] == subprocess.DEVNULL
+        print("    ✓ gmail.py --user USER prefetch <top ids>, detached, nothing for no ids", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Prefetch test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_create_drafts():
+    """Test drafts from JSONL: per-line results in order, bad lines reported, batched uploads."""
+    print("\n=== Create Drafts Test ===\n", flush=True)
+
+    import io
+
+    with mock_api(messages=1, files=0) as server:
+        import gmail
+
+        def spec(n, **extra):
+            return json.dumps({"to": f"r{n}@example.com", "subject": f"Subject {n}", "body": f"Body {n}", **extra})
+
+        lines = [
+            spec(1, id="first"),
+            "",
+            "   ",
+            "{not json",
+            json.dumps({"id": "no-body", "to": "x@example.com", "subject": "No body"}),
+            "[1, 2]",
+            *[spec(n, cc="cc@example.com") for n in range(7, 12)],
+        ]
+
+        print("1. TEST per-line records and summary", flush=True)
+        batch_size, gmail.DRAFT_BATCH_SIZE = gmail.DRAFT_BATCH_SIZE, 2
+        out = io.StringIO()
+        try:
+            before = server.stats()["requests"]
+            summary = gmail.create_drafts(USER, lines, out=out, workers=3)
+            requests = server.stats()["requests"] - before
+        finally:
+            gmail.DRAFT_BATCH_SIZE = batch_size
+        assert summary == {"created": 6, "failed": 3}, summary
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["line"] for r in records] == [1, 4, 5, 6, 7, 8, 9, 10, 11], "Blank lines skipped, order kept"
+        assert [r["ok"] for r in records] == [True, False, False, False] + [True] * 5
+        assert records[0]["id"] == "first" and records[0]["draft"]["message"]["to"] == "r1@example.com"
+        assert records[0]["draft"]["id"] and records[-1]["draft"]["message"]["subject"] == "Subject 11"
+        assert "id" not in records[1] and records[1]["error"]
+        assert records[2]["id"] == "no-body" and records[2]["error"] == "Missing body"
+        assert records[3]["error"] == "Expected a JSON object"
+        # Batches of 2 input lines: [1, 4] [5, 6] [7, 8] [9, 10] [11]; [5, 6] has nothing to upload
+        assert server.dataset.drafts == 6 and requests == 4, (server.dataset.drafts, requests)
+        print("    ✓ 6 created in 4 batch requests; malformed, missing-field and non-object lines failed", flush=True)
+
+        print("\n2. TEST draft --from-file exit status", flush=True)
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("\n".join(lines[:5]) + "\n")
+        try:
+            code, out = run_cli("--user", USER, "draft", "--from-file", f.name)
+            assert code == 0 and [json.loads(line)["ok"] for line in out.splitlines()] == [True, False, False]
+            with open(f.name, "w") as bad:
+                bad.write("{not json\n")
+            code, _ = run_cli("--user", USER, "draft", "--from-file", f.name)
+            assert code == 1
+        finally:
+            os.remove(f.name)
+        print("    ✓ Exit 0 when any draft was created, 1 when all failed", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Create drafts test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+def test_profile_report():
+    """Test --profile: requests counted per method on stderr, and no report without it."""
+    print("\n=== Profile Report Test ===\n", flush=True)
+
+    import subprocess
+
+    import auth
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    drive_py = os.path.join(os.path.dirname(here), "google-drive", "drive.py")
+    gmail_py = os.path.join(here, "gmail.py")
+
+    def run(script, *argv):
+        env = {k: v for k, v in os.environ.items() if k != "GOOGLE_PROFILE"}
+        done = subprocess.run([sys.executable, script, "--user", USER, *argv],
+                              capture_output=True, text=True, env=env, timeout=60)
+        assert done.returncode == 0, done.stderr
+        return done.stdout, done.stderr
+
+    print("1. TEST report totals per method", flush=True)
+    log = auth.RequestLog()
+    log.record("GET", "https://x/drive/v3/files?fields=files(id)", 200, 1.0, 100, "gzip")
+    log.record("GET", "https://x/drive/v3/files/a", 200, 1.0, 50, None)
+    log.record("POST", "https://x/batch/gmail/v1", 200, 1.0, 10, None)
+    report = log.report()
+    assert report["requests"] == 3 and report["responseBytes"] == 160
+    assert report["byMethod"] == {"GET": {"requests": 2, "responseBytes": 150},
+                                  "POST": {"requests": 1, "responseBytes": 10}}
+    assert report["calls"][0]["fields"] == "files(id)" and report["calls"][0]["gzip"] is True
+    print("    ✓ Requests and bytes per HTTP method", flush=True)
+
+    with mock_api(messages=10, files=10) as server:
+        from mock_server import GOOGLE_DOC_MIME
+
+        doc = next(i for i in server.dataset.file_order if server.dataset.files[i]["mimeType"] == GOOGLE_DOC_MIME)
+
+        print("\n2. TEST drive.py --profile prints the report at exit", flush=True)
+        out, err = run(drive_py, "--profile", "read-doc", "--file-id", doc)
+        assert json.loads(out)["content"] is not None
+        profile = json.loads(err)["_profile"]
+        assert profile["requests"] == 2 and profile["byMethod"]["GET"]["requests"] == 2
+        assert sorted(call["path"].split("/")[1] for call in profile["calls"]) == ["drive", "v1"]
+        out, err = run(gmail_py, "--profile", "list", "--max-results", "3")
+        assert len(json.loads(out)) == 3
+        profile = json.loads(err)["_profile"]
+        assert profile["byMethod"] == {
+            method: {"requests": sum(1 for c in profile["calls"] if c["method"] == method),
+                     "responseBytes": sum(c["bytes"] for c in profile["calls"] if c["method"] == method)}
+            for method in {c["method"] for c in profile["calls"]}}
+        print(f"    ✓ read-doc: 2 GETs; list: {profile['byMethod']}", flush=True)
+
+        print("\n3. TEST nothing on stderr without --profile", flush=True)
+        out, err = run(drive_py, "read-doc", "--file-id", doc)
+        assert json.loads(out)["content"] is not None and err == ""
+        out, err = run(gmail_py, "list", "--max-results", "3")
+        assert len(json.loads(out)) == 3 and err == ""
+        print("    ✓ stdout only, stderr empty", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Profile report test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+@contextmanager
+def without_httpx():
+    """Make `import httpx` fail, as when it isn't installed."""
+    saved = {name: sys.modules.get(name) for name in ("httpx", "h2")}
+    sys.modules.update(dict.fromkeys(saved))
+    try:
+        yield
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+def test_transport():
+    """Test PooledTransport and RequestHttp over requests and (when installed) httpx."""
+    print("\n=== Transport Test ===\n", flush=True)
+
+    import subprocess
+
+    import auth
+
+    try:
+        import httpx  # noqa: F401
+        import h2  # noqa: F401
+        branches = ["requests", "httpx"]
+    except ImportError:
+        branches = ["requests"]
+
+    with mock_api(messages=20, files=0, body_chars=2000) as server, no_quota():
+        message_id = server.dataset.order[0]
+        url = f"{server.url}gmail/v1/users/me/messages/{message_id}?format=full"
+        for branch in branches:
+            if branch == "requests":
+                with without_httpx():
+                    transport = auth.PooledTransport()
+            else:
+                transport = auth.PooledTransport()
+            assert transport.http2 == (branch == "httpx")
+
+            print(f"{branch}: TEST send decodes gzip and lower-cases headers", flush=True)
+            status, headers, content = transport.send("GET", url, None, {"accept-encoding": "gzip"}, 10)
+            assert status == 200 and headers["content-encoding"] == "gzip"
+            assert "Content-Type" not in headers and "json" in headers["content-type"]
+            assert json.loads(content)["id"] == message_id
+            with transport.stream("GET", url, {"accept-encoding": "gzip"}, 10) as (status, _, chunks):
+                assert status == 200 and b"".join(chunks) == content
+            print("    ✓ Same decoded body from send() and stream()", flush=True)
+
+            print(f"{branch}: TEST RequestHttp on it: httplib2 shape, retries", flush=True)
+            old, auth._transport = auth._transport, transport
+            try:
+                http = auth.RequestHttp("gmail", USER)
+                response, body = http.request(url)
+                assert response.status == 200 and response["-content-encoding"] == "gzip"
+                assert response["content-length"] == str(len(body)) and body == content
+                server.fault_rate, retries = 0.5, auth.REQUEST_LOG.retries
+                for _ in range(5):
+                    response, body = http.request(url)
+                    assert response.status == 200 and body == content
+                server.fault_rate = 0
+                assert auth.REQUEST_LOG.retries > retries, "429s should have been retried"
+            finally:
+                auth._transport = old
+            print(f"    ✓ 200 after {auth.REQUEST_LOG.retries - retries} retried 429s", flush=True)
+    if "httpx" not in branches:
+        print("    (httpx/h2 not installed: httpx branch skipped)", flush=True)
+
+    print("\nTEST google-drive/auth.py loads this module", flush=True)
+    drive_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "google-drive")
+    path = subprocess.run([sys.executable, "-c", "import auth; print(auth.__file__, auth.get_drive_service)"],
+                          cwd=drive_dir, capture_output=True, text=True, check=True).stdout.split()[0]
+    assert os.path.samefile(path, auth.__file__)
+    print("    ✓ One implementation for both skills", flush=True)
+
+    print("\n" + "=" * 40, flush=True)
+    print("✅ Transport test complete!", flush=True)
+    print("=" * 40 + "\n", flush=True)
+
+
+if __name__ == "__main__":
+    test_mirror_queries()
+    test_mirror_coverage()
+    test_search_local()
+    test_mime()
+    test_quoted_text()
+    test_thread()
+    test_shard_queries()
+    test_retry_policy()
+    test_parallel_list()
+    test_list_pages()
+    test_cache_eviction()
+    test_cached_get()
+    test_modify_many_pages()
+    test_large_bodies()
+    test_attachments()
+    test_async_client()
+    test_token_cache()
+    test_service_cache()
+    test_rate_limiter()
+    test_fan_out()
+    test_prefetch()
+    test_create_drafts()
+    test_profile_report()
+    test_transport()
+
+    print("\n" + "=" * 50, flush=True)
+    print("🎉 ALL TEST SUITES PASSED!", flush=True)
+    print("=" * 50 + "\n", flush=True)
@@ -7,13 +7,14 @@ import os
 import sys
 import json
 import argparse
+import atexit
 import io
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from auth import get_drive_service, get_docs_service
+from auth import REQUEST_LOG, get_drive_service, get_docs_service
 
 # MIME types for Google Workspace documents
 GOOGLE_DOC_MIME = 'application/vnd.google-apps.document'
@@ -28,6 +29,11 @@ EXPORT_FORMATS = {
     GOOGLE_SLIDE_MIME: 'text/plain', # Google Slides -> plain text
 }
 
+# Docs API fields read-doc uses: text runs and the containers they sit in
+# (not styles, lists, inline objects, ..., which are most of the response)
+DOC_TEXT_FIELDS = ('title,body/content(paragraph/elements/textRun/content,'
+                   'table/tableRows/tableCells/content,tableOfContents/content)')
+
 
 def list_files(user_email, folder_id=None, max_results=20, page_token=None):
     """
@@ -303,7 +309,7 @@ def read_google_doc(user_email, file_id, max_chars=None, start_index=0):
         drive_service = get_drive_service(user_email)
         
         # Get document from Docs API
-        doc = docs_service.documents().get(documentId=file_id).execute()
+        doc = docs_service.documents().get(documentId=file_id, fields=DOC_TEXT_FIELDS).execute()
         
         # Get file metadata from Drive for additional info
         file_meta = drive_service.files().get(
@@ -365,9 +371,20 @@ def read_google_doc(user_email, file_id, max_chars=None, start_index=0):
         raise Exception(f"Error reading document: {str(e)}")
 
 
+def print_request_report():
+    """Profile report, or rate-limit counters if anything was retried or throttled."""
+    if REQUEST_LOG.enabled:
+        print(json.dumps({'_profile': REQUEST_LOG.report()}, indent=2), file=sys.stderr)
+        return
+    rate = REQUEST_LOG.rate_report()
+    if rate['retries'] or rate['throttled']:
+        print(json.dumps({'_rateLimit': rate}), file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Google Drive API wrapper using service account')
     parser.add_argument('--user', required=True, help='User email to impersonate (e.g., user@example.com)')
+    parser.add_argument('--profile', action='store_true', help='Report each API request\'s time and response size on stderr')
     
     subparsers = parser.add_subparsers(dest='command', help='Command to execute')
     
@@ -405,6 +422,12 @@ def main():
         parser.print_help()
         sys.exit(1)
     
+    if args.profile:
+        REQUEST_LOG.enabled = True
+    # Per-request sizes and times (or, without profiling, retry/throttle
+    # counters if there were any) go to stderr, so stdout stays plain JSON
+    atexit.register(print_request_report)
+    
     try:
         if args.command == 'list':
             result = list_files(args.user, args.folder_id, args.max_results, args.page_token)